@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-17 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authorities', '0002_alter_authority_authority_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authority',
+            name='geohash',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=12),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 6.0.2 on 2026-10-17 20:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authorities', '0003_authority_geohash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authority',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -16,11 +16,13 @@ class Authority(models.Model):
 
     latitude = models.FloatField()
     longitude = models.FloatField()
+    geohash = models.CharField(max_length=12, default='', editable=False, db_index=True)
 
     phone = models.CharField(max_length=20)
     email = models.EmailField()
 
     state = models.CharField(max_length=100)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # Lets the nearest-row indexes spot edits
 
     def __str__(self):
         return f"{self.name} ({self.authority_type})"
\ No newline at end of file
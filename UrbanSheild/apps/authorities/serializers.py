@@ -5,4 +5,4 @@ from .models import Authority
 class AuthoritySerializer(serializers.ModelSerializer):
     class Meta:
         model = Authority
-        fields = '__all__'
\ No newline at end of file
+        exclude = ['geohash']
\ No newline at end of file
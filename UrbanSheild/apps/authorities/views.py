@@ -9,6 +9,7 @@ from apps.core.services.authority_service import (
     fetch_police_stations,
     fetch_fire_stations,
 )
+from apps.core.services.knn_index import authority_index
 
 
 class AuthorityViewSet(viewsets.ModelViewSet):
@@ -24,6 +25,30 @@ class AuthorityViewSet(viewsets.ModelViewSet):
 
         return queryset
 
+    @action(detail=False, methods=["get"])
+    def nearest(self, request):
+        try:
+            lat = float(request.query_params.get("lat"))
+            lon = float(request.query_params.get("lon"))
+            k = max(1, min(int(request.query_params.get("k", 1)), 50))
+        except (TypeError, ValueError):
+            return Response({"error": "lat, lon and optional integer k required"}, status=400)
+
+        filters = {}
+        authority_type = request.query_params.get("type")
+        if authority_type:
+            filters["authority_type"] = authority_type
+
+        return Response({
+            "results": [
+                {
+                    "authority": AuthoritySerializer(authority).data,
+                    "distance_km": round(authority.distance_km, 2),
+                }
+                for authority in authority_index.nearest(lat, lon, k, **filters)
+            ]
+        })
+
     @action(detail=False, methods=["get"])
     def fetch_police(self, request):
         return Response(fetch_police_stations())
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class DisastersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'apps.core'
\ No newline at end of file
+    name = 'apps.core'
+
+    def ready(self):
+        from apps.core import signals  # noqa: F401
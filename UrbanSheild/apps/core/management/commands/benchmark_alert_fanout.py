@@ -0,0 +1,131 @@
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.core.models import UserLocation, UserAlertPreference, DisasterAlert
+from apps.core.services.alert_service import DEFAULT_ALERT_PREFERENCES, fan_out_disaster
+from apps.core.utils import as_columns, geohash_encode, haversine_many
+from apps.disasters.models import Disaster
+
+
+# tracked users cluster around the larger towns, like real traffic does
+TOWNS = [
+    (30.3165, 78.0322),  # Dehradun
+    (29.9457, 78.1642),  # Haridwar
+    (29.2183, 79.5130),  # Haldwani
+    (30.0869, 78.2676),  # Rishikesh
+    (29.3803, 79.4636),  # Nainital
+]
+
+
+def expected_users(disaster):
+    """Users to alert, by checking every location against its preferences."""
+    prefs = {
+        p.user_id: p for p in UserAlertPreference.objects.all()
+    }
+    user_ids, lats, lons = as_columns(
+        UserLocation.objects.filter(is_active=True).values_list('user_id', 'latitude', 'longitude'), 3
+    )
+    distances = haversine_many(disaster.latitude, disaster.longitude, lats, lons)
+
+    expected = set()
+    for user_id, distance in zip(user_ids.astype(int).tolist(), distances.tolist()):
+        p = prefs.get(user_id)
+        radius, min_severity, types, enabled = (
+            (p.alert_radius_km, p.min_severity, p.disaster_types, p.alert_enabled) if p else
+            (DEFAULT_ALERT_PREFERENCES['alert_radius_km'], DEFAULT_ALERT_PREFERENCES['min_severity'],
+             DEFAULT_ALERT_PREFERENCES['disaster_types'], True)
+        )
+        if (enabled and distance <= radius and disaster.severity >= min_severity
+                and disaster.disaster_type in types):
+            expected.add(user_id)
+    return expected
+
+
+class Command(BaseCommand):
+    help = 'Time the alert fan-out of a new disaster to synthetic tracked users'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=100000,
+            help='Synthetic tracked users'
+        )
+        parser.add_argument(
+            '--disasters',
+            type=int,
+            default=5,
+            help='Disasters to fan out, one per town'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed for the synthetic users'
+        )
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        count = options['users']
+
+        # synthetic rows live in a transaction that is rolled back at the end
+        with transaction.atomic():
+            started = time.perf_counter()
+            first = (User.objects.order_by('-id').values_list('id', flat=True).first() or 0) + 1
+            User.objects.bulk_create(
+                [User(username=f'fanout-bench-{first + i}') for i in range(count)], batch_size=1000
+            )
+            users = list(
+                User.objects.filter(username__startswith='fanout-bench-').values_list('id', flat=True)
+            )
+
+            locations, prefs = [], []
+            for user_id in users:
+                town = random.choice(TOWNS)
+                lat, lon = random.gauss(town[0], 0.08), random.gauss(town[1], 0.08)
+                locations.append(UserLocation(
+                    user_id=user_id, latitude=lat, longitude=lon,
+                    geohash=geohash_encode(lat, lon), is_active=random.random() < 0.9,
+                ))
+                # a quarter keeps the defaults without a preferences row
+                if random.random() < 0.75:
+                    prefs.append(UserAlertPreference(
+                        user_id=user_id,
+                        alert_radius_km=random.choice([2, 5, 10, 20]),
+                        min_severity=random.randint(1, 8),
+                        disaster_types=random.sample(DEFAULT_ALERT_PREFERENCES['disaster_types'], 3),
+                        alert_enabled=random.random() < 0.95,
+                    ))
+            UserLocation.objects.bulk_create(locations, batch_size=1000)
+            UserAlertPreference.objects.bulk_create(prefs, batch_size=1000)
+            self.stdout.write(
+                f"👥 Seeded {count} tracked users in {time.perf_counter() - started:.1f}s\n"
+            )
+
+            self.stdout.write(f"{'disaster':<32} {'candidates':>10} {'alerted':>8} {'ms':>8}  check")
+            for town in TOWNS[:options['disasters']]:
+                # bulk_create skips the post_save fan-out, so it is timed alone
+                disaster = Disaster.objects.bulk_create([Disaster(
+                    disaster_type=random.choice(['flood', 'fire', 'earthquake']),
+                    latitude=town[0], longitude=town[1],
+                    geohash=geohash_encode(*town), severity=random.randint(5, 9),
+                )])[0]
+                stats = fan_out_disaster(disaster)
+
+                alerted = set(
+                    DisasterAlert.objects.filter(disaster=disaster).values_list('user_id', flat=True)
+                )
+                check = '✅' if alerted == expected_users(disaster) else '❌ mismatch'
+                label = f"{disaster.disaster_type} sev {disaster.severity} @ {town[0]:.2f},{town[1]:.2f}"
+                self.stdout.write(
+                    f"{label:<32} {stats['candidates']:>10} {stats['alerted']:>8} "
+                    f"{stats['elapsed_ms']:>8.1f}  {check}"
+                )
+
+            transaction.set_rollback(True)
+
+        self.stdout.write('\nSynthetic users and alerts were rolled back.')
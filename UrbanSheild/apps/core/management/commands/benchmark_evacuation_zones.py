@@ -0,0 +1,100 @@
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.core.management.commands.benchmark_alert_fanout import TOWNS
+from apps.core.models import UserLocation, EvacuationZone
+from apps.core.services.zone_service import build_zones, zone_edges
+from apps.core.utils import geohash_encode, haversine
+from apps.disasters.models import Disaster
+
+
+def expected_counts(disaster):
+    """Users per zone, by measuring every active location one at a time."""
+    edges = zone_edges(disaster.severity)
+    counts = [0] * (len(edges) - 1)
+    for lat, lon in UserLocation.objects.filter(is_active=True).values_list('latitude', 'longitude'):
+        distance = haversine(disaster.latitude, disaster.longitude, lat, lon)
+        for number in range(len(counts)):
+            last = number == len(counts) - 1
+            if edges[number] <= distance < edges[number + 1] or (last and distance == edges[-1]):
+                counts[number] += 1
+                break
+    return counts
+
+
+class Command(BaseCommand):
+    help = 'Time evacuation zone generation over synthetic tracked users'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=100000,
+            help='Synthetic tracked users'
+        )
+        parser.add_argument(
+            '--towns',
+            type=int,
+            default=1,
+            help='Towns the users are spread over, the disaster is at the first'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed for the synthetic users'
+        )
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        count = options['users']
+        towns = TOWNS[:max(1, options['towns'])]
+
+        # synthetic rows live in a transaction that is rolled back at the end
+        with transaction.atomic():
+            started = time.perf_counter()
+            first = (User.objects.order_by('-id').values_list('id', flat=True).first() or 0) + 1
+            User.objects.bulk_create(
+                [User(username=f'zones-bench-{first + i}') for i in range(count)], batch_size=1000
+            )
+            users = User.objects.filter(username__startswith='zones-bench-').values_list('id', flat=True)
+
+            locations = []
+            for user_id in users:
+                town = random.choice(towns)
+                lat, lon = random.gauss(town[0], 0.08), random.gauss(town[1], 0.08)
+                locations.append(UserLocation(
+                    user_id=user_id, latitude=lat, longitude=lon,
+                    geohash=geohash_encode(lat, lon), is_active=random.random() < 0.9,
+                ))
+            UserLocation.objects.bulk_create(locations, batch_size=1000)
+            self.stdout.write(
+                f"👥 Seeded {count} tracked users in {time.perf_counter() - started:.1f}s\n"
+            )
+
+            self.stdout.write(f"{'severity':>8} {'zones':>6} {'users':>8} {'ms':>8}  check")
+            for severity in (4, 7, 10):
+                # bulk_create skips the post_save zone job, so it is timed alone
+                disaster = Disaster.objects.bulk_create([Disaster(
+                    disaster_type='flood', latitude=towns[0][0], longitude=towns[0][1],
+                    geohash=geohash_encode(*towns[0]), severity=severity, status='critical',
+                )])[0]
+                stats = build_zones(disaster)
+
+                counts = list(
+                    EvacuationZone.objects.filter(disaster=disaster)
+                    .order_by('zone_number').values_list('estimated_users_affected', flat=True)
+                )
+                check = '✅' if counts == expected_counts(disaster) else '❌ mismatch'
+                self.stdout.write(
+                    f"{severity:>8} {stats['zones']:>6} {stats['users']:>8} "
+                    f"{stats['elapsed_ms']:>8.1f}  {check}"
+                )
+
+            transaction.set_rollback(True)
+
+        self.stdout.write('\nSynthetic users and zones were rolled back.')
@@ -0,0 +1,94 @@
+import random
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from apps.core.utils import UTTARAKHAND_BOUNDS, haversine, haversine_many, haversine_matrix
+
+
+def random_coords(count):
+    lats = [random.uniform(UTTARAKHAND_BOUNDS["min_lat"], UTTARAKHAND_BOUNDS["max_lat"]) for _ in range(count)]
+    lons = [random.uniform(UTTARAKHAND_BOUNDS["min_lon"], UTTARAKHAND_BOUNDS["max_lon"]) for _ in range(count)]
+    return lats, lons
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000, result
+
+
+class Command(BaseCommand):
+    help = 'Compare the scalar haversine loop with the NumPy one-to-many and many-to-many variants'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[1000, 10000, 100000],
+            help='Point counts to benchmark'
+        )
+        parser.add_argument(
+            '--sources',
+            type=int,
+            default=50,
+            help='Rows of the many-to-many matrix (e.g. shelters against traffic)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Runs per measurement; the fastest one is reported'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed for the synthetic points'
+        )
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        lat, lon = 30.32, 78.03
+        src_lats, src_lons = random_coords(options['sources'])
+
+        self.stdout.write(
+            f"{'points':>8} {'loop ms':>9} {'many ms':>9} {'speedup':>8} "
+            f"{'matrix loop ms':>15} {'matrix ms':>10} {'speedup':>8}"
+        )
+
+        for size in options['sizes']:
+            lats, lons = random_coords(size)
+
+            loop_ms, expected = best_of(options['repeat'], lambda: [
+                haversine(lat, lon, a, b) for a, b in zip(lats, lons)
+            ])
+            many_ms, found = best_of(options['repeat'], lambda: haversine_many(lat, lon, lats, lons))
+
+            if not np.allclose(expected, found, rtol=0, atol=1e-9):
+                self.stdout.write(self.style.ERROR(f"❌ one-to-many mismatch at {size} points"))
+                return
+
+            matrix_loop_ms, expected = best_of(1, lambda: [
+                [haversine(s_lat, s_lon, a, b) for a, b in zip(lats, lons)]
+                for s_lat, s_lon in zip(src_lats, src_lons)
+            ])
+            matrix_ms, found = best_of(
+                options['repeat'], lambda: haversine_matrix(src_lats, src_lons, lats, lons)
+            )
+
+            if not np.allclose(expected, found, rtol=0, atol=1e-9):
+                self.stdout.write(self.style.ERROR(f"❌ many-to-many mismatch at {size} points"))
+                return
+
+            self.stdout.write(
+                f"{size:>8} {loop_ms:>9.2f} {many_ms:>9.2f} {loop_ms / many_ms:>7.1f}x "
+                f"{matrix_loop_ms:>15.1f} {matrix_ms:>10.2f} {matrix_loop_ms / matrix_ms:>7.1f}x"
+            )
+
+        self.stdout.write(self.style.SUCCESS("✅ Vectorized distances match the scalar haversine"))
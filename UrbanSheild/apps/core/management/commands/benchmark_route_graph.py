@@ -0,0 +1,96 @@
+import math
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.core.utils import UTTARAKHAND_BOUNDS
+from apps.core.services.csr_graph import CSRGraph
+from apps.core.services.dijkstra_route_service import build_graph
+from apps.core.services.routing_graph import build_csr, node_columns
+
+
+def random_nodes(count, spread):
+    """Generate traffic-like nodes around the centre of Uttarakhand."""
+    mid_lat = (UTTARAKHAND_BOUNDS["min_lat"] + UTTARAKHAND_BOUNDS["max_lat"]) / 2
+    mid_lon = (UTTARAKHAND_BOUNDS["min_lon"] + UTTARAKHAND_BOUNDS["max_lon"]) / 2
+
+    nodes = []
+    for _ in range(count):
+        nodes.append({
+            "type": "traffic",
+            "coord": (
+                mid_lat + random.uniform(-spread, spread),
+                mid_lon + random.uniform(-spread, spread),
+            ),
+            "congestion": random.randint(1, 10),
+            "blocked": random.random() < 0.05,
+        })
+    return nodes
+
+
+def same_edges(row, expected):
+    """CSR ``row`` (ids from 1) has the dict graph's targets and weights.
+
+    NumPy may round the vectorized distances a unit in the last place
+    differently, so weights are compared to 1e-12.
+    """
+    return len(row) == len(expected) and all(
+        j - 1 == k and math.isclose(w, v, rel_tol=1e-12)
+        for (j, w), (k, v) in zip(row, expected)
+    )
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the CSR routing graph builder against the all-pairs builder'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[250, 500, 1000, 2000],
+            help='Node counts to benchmark'
+        )
+        parser.add_argument(
+            '--spread',
+            type=float,
+            default=1.65,
+            help='Half-width in degrees of the area nodes are scattered over'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed for the synthetic nodes'
+        )
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+
+        self.stdout.write(f"{'nodes':>8} {'edges':>10} {'brute (s)':>10} {'csr (s)':>10} {'speedup':>8}")
+
+        for size in options['sizes']:
+            nodes = random_nodes(size, options['spread'])
+
+            started = time.perf_counter()
+            expected = build_graph(nodes)
+            brute_time = time.perf_counter() - started
+
+            # the live graph keys its rows from 1, row 0 is a placeholder
+            columns = node_columns(dict(enumerate(nodes)))
+            started = time.perf_counter()
+            graph = CSRGraph(*build_csr(**columns))
+            csr_time = time.perf_counter() - started
+
+            if not all(same_edges(list(graph[i + 1]), expected[i]) for i in range(size)):
+                self.stdout.write(self.style.ERROR(f'Graph mismatch at {size} nodes'))
+                return
+
+            edges = sum(len(adj) for adj in expected.values())
+            self.stdout.write(
+                f"{size:>8} {edges:>10} {brute_time:>10.3f} {csr_time:>10.3f} "
+                f"{brute_time / csr_time if csr_time else 0:>7.1f}x"
+            )
+
+        self.stdout.write(self.style.SUCCESS('✅ CSR graph matches the all-pairs graph edge for edge'))
@@ -0,0 +1,92 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.core.utils import UTTARAKHAND_BOUNDS
+from apps.core.services.dijkstra_route_service import (
+    build_graph, dijkstra_with_path, astar_with_path,
+)
+from apps.core.management.commands.benchmark_route_graph import random_nodes
+
+
+def random_point():
+    return (
+        random.uniform(UTTARAKHAND_BOUNDS["min_lat"], UTTARAKHAND_BOUNDS["max_lat"]),
+        random.uniform(UTTARAKHAND_BOUNDS["min_lon"], UTTARAKHAND_BOUNDS["max_lon"]),
+    )
+
+
+class Command(BaseCommand):
+    help = 'Compare Dijkstra and A* settled-node counts and latency on synthetic graphs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[500, 1000, 2000],
+            help='Node counts to benchmark'
+        )
+        parser.add_argument(
+            '--queries',
+            type=int,
+            default=20,
+            help='Random start/end pairs per graph size'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed for the synthetic graphs'
+        )
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+
+        self.stdout.write(
+            f"{'nodes':>8} {'dijkstra settled':>17} {'astar settled':>14} "
+            f"{'dijkstra ms':>12} {'astar ms':>9}"
+        )
+
+        for size in options['sizes']:
+            traffic = random_nodes(size, 1.65)
+            totals = {"dijkstra": [0, 0.0], "astar": [0, 0.0]}
+
+            for _ in range(options['queries']):
+                nodes = (
+                    [{"type": "start", "coord": random_point()}]
+                    + traffic
+                    + [{"type": "end", "coord": random_point()}]
+                )
+                graph = build_graph(nodes)
+                target = len(nodes) - 1
+
+                def coord(i):
+                    return nodes[i]["coord"]
+
+                stats = {}
+                started = time.perf_counter()
+                expected, _ = dijkstra_with_path(graph, 0, stats)
+                totals["dijkstra"][0] += stats["settled"]
+                totals["dijkstra"][1] += time.perf_counter() - started
+
+                stats = {}
+                started = time.perf_counter()
+                found, _ = astar_with_path(graph, 0, target, coord, stats)
+                totals["astar"][0] += stats["settled"]
+                totals["astar"][1] += time.perf_counter() - started
+
+                if abs(expected.get(target, float("inf")) - found.get(target, float("inf"))) > 1e-6:
+                    self.stdout.write(self.style.ERROR(f'Route cost mismatch at {size} nodes'))
+                    return
+
+            queries = options['queries']
+            self.stdout.write(
+                f"{size:>8} {totals['dijkstra'][0] / queries:>17.0f} "
+                f"{totals['astar'][0] / queries:>14.0f} "
+                f"{totals['dijkstra'][1] / queries * 1000:>12.2f} "
+                f"{totals['astar'][1] / queries * 1000:>9.2f}"
+            )
+
+        self.stdout.write(self.style.SUCCESS('✅ A* and Dijkstra returned identical route costs'))
@@ -0,0 +1,104 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.core.utils import UTTARAKHAND_BOUNDS, as_columns, geohash_encode, haversine_many
+from apps.core.services.spatial_query import SPATIAL_INDEXES, rtree_enabled, within_radius
+from apps.traffic.models import TrafficIncident
+
+
+def random_point():
+    return (
+        random.uniform(UTTARAKHAND_BOUNDS["min_lat"], UTTARAKHAND_BOUNDS["max_lat"]),
+        random.uniform(UTTARAKHAND_BOUNDS["min_lon"], UTTARAKHAND_BOUNDS["max_lon"]),
+    )
+
+
+def scan_and_filter(queryset, lat, lon, radius_km):
+    """Load every row and filter in Python, as the radius endpoints used to."""
+    ids, lats, lons = as_columns(queryset.values_list("id", "latitude", "longitude"), 3)
+    return set(ids[haversine_many(lat, lon, lats, lons) <= radius_km].astype(int).tolist())
+
+
+class Command(BaseCommand):
+    help = 'Compare scan-and-filter radius queries with the bbox, geohash and R*Tree indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[1000, 10000, 100000],
+            help='Synthetic traffic rows to benchmark'
+        )
+        parser.add_argument(
+            '--radius',
+            type=float,
+            default=5,
+            help='Query radius in km'
+        )
+        parser.add_argument(
+            '--queries',
+            type=int,
+            default=20,
+            help='Random query points per size'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed for the synthetic rows'
+        )
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        radius_km = options['radius']
+        queryset = TrafficIncident.objects.all()
+
+        indexes = [index for index in SPATIAL_INDEXES if index != "rtree" or rtree_enabled(queryset)]
+        self.stdout.write(f"📍 {options['queries']} queries of {radius_km} km per size\n")
+        self.stdout.write(f"{'rows':>8} {'scan ms':>9} " + " ".join(f"{index + ' ms':>11}" for index in indexes))
+
+        # synthetic rows live in a transaction that is rolled back at the end
+        with transaction.atomic():
+            inserted = 0
+            for size in options['sizes']:
+                rows = []
+                for _ in range(size - inserted):
+                    lat, lon = random_point()
+                    rows.append(TrafficIncident(
+                        latitude=lat, longitude=lon, geohash=geohash_encode(lat, lon),
+                        congestion_level=random.randint(1, 10),
+                    ))
+                TrafficIncident.objects.bulk_create(rows, batch_size=1000)
+                inserted = size
+
+                points = [random_point() for _ in range(options['queries'])]
+                timings = {"scan": 0.0, **{index: 0.0 for index in indexes}}
+
+                for lat, lon in points:
+                    started = time.perf_counter()
+                    expected = scan_and_filter(queryset, lat, lon, radius_km)
+                    timings["scan"] += time.perf_counter() - started
+
+                    for index in indexes:
+                        started = time.perf_counter()
+                        found = set(within_radius(queryset, lat, lon, radius_km, index=index).values_list("id", flat=True))
+                        timings[index] += time.perf_counter() - started
+
+                        if found != expected:
+                            self.stdout.write(self.style.ERROR(f"❌ {index} returned different rows at {size} rows"))
+                            transaction.set_rollback(True)
+                            return
+
+                per_query = {key: value * 1000 / len(points) for key, value in timings.items()}
+                self.stdout.write(
+                    f"{size:>8} {per_query['scan']:>9.2f} "
+                    + " ".join(f"{per_query[index]:>11.2f}" for index in indexes)
+                )
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS("✅ Every index matches scan-and-filter"))
@@ -0,0 +1,57 @@
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.services.road_network import (
+    parse_osm, build_junction_graph, preprocess, save_network,
+)
+
+
+class Command(BaseCommand):
+    help = 'Import a local OSM XML extract of Uttarakhand into the offline road network'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'extract',
+            help='Path to an .osm, .osm.bz2 or .osm.gz extract'
+        )
+        parser.add_argument(
+            '--output',
+            default=None,
+            help='Directory to write the preprocessed network to (defaults to ROAD_NETWORK_PATH)'
+        )
+
+    def handle(self, *args, **options):
+        extract = Path(options['extract'])
+        output = options['output'] or getattr(settings, 'ROAD_NETWORK_PATH', None)
+
+        if not output:
+            raise CommandError('Set ROAD_NETWORK_PATH or pass --output')
+        if not extract.exists():
+            raise CommandError(f'{extract} does not exist')
+        if extract.suffix == '.pbf':
+            raise CommandError(
+                'PBF extracts are not supported directly; convert first with '
+                '"osmium cat extract.osm.pbf -o extract.osm.bz2"'
+            )
+
+        started = time.perf_counter()
+        coords, ways = parse_osm(extract)
+        self.stdout.write(f'📥 Read {len(ways)} roads with {len(coords)} nodes')
+
+        vertex_coords, edges, geometries = build_junction_graph(coords, ways)
+        self.stdout.write(f'🛣️  Junction graph: {len(vertex_coords)} vertices, {len(edges)} edges')
+
+        arrays = preprocess(vertex_coords, edges, geometries)
+        self.stdout.write(
+            f"🔺 Contraction hierarchy: {len(arrays['up_targets'])} arcs, "
+            f"{len(arrays['tri_in'])} customization triangles"
+        )
+
+        save_network(arrays, output)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Road network written to {output} in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,122 @@
+import json
+import random
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from apps.core.services.dijkstra_route_service import build_graph, dijkstra_with_path
+from apps.core.services.road_network import get_road_network
+from apps.core.services.routing_graph import RoutingGraph, RouteView, START
+from apps.core.management.commands.benchmark_route_graph import random_nodes
+
+
+def synthetic_graph(count, seed):
+    """A loaded RoutingGraph holding ``count`` random traffic nodes."""
+    random.seed(seed)
+    graph = RoutingGraph()
+    graph.replace({("traffic", i): node for i, node in enumerate(random_nodes(count, 1.65))})
+    return graph
+
+
+def memory_usage():
+    """RSS split into private anonymous and file-backed (shareable) MB."""
+    usage = {}
+    with open("/proc/self/status") as fh:
+        for line in fh:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "RssAnon", "RssFile"):
+                usage[key] = int(value.split()[0]) / 1024
+    return usage
+
+
+class Command(BaseCommand):
+    help = 'Compare per-worker memory of a dict routing graph and the mmap-ed graph snapshot routes run on'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--nodes',
+            type=int,
+            default=2000,
+            help='Synthetic traffic nodes in the routing graph'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed for the synthetic nodes'
+        )
+        # internal: run a single measurement in a fresh interpreter
+        parser.add_argument('--measure', choices=['dict', 'csr', 'road'], help='Internal use')
+        parser.add_argument('--csr-dir', help='Internal use')
+
+    def handle(self, *args, **options):
+        if options['measure']:
+            self.stdout.write(json.dumps(self.measure(options)))
+            return
+
+        with tempfile.TemporaryDirectory() as csr_dir:
+            # write the snapshot files the measured workers will map
+            with override_settings(ROUTING_GRAPH_PATH=csr_dir):
+                edges = synthetic_graph(options['nodes'], options['seed']).snapshot().edge_count
+
+            modes = ['dict', 'csr']
+            if get_road_network() is not None:
+                modes.append('road')
+
+            # every measurement runs in its own interpreter, like a fresh
+            # gunicorn worker, so freed memory from one cannot mask another
+            results = {}
+            for mode in modes:
+                output = subprocess.run(
+                    [
+                        sys.executable, str(settings.BASE_DIR / 'manage.py'), 'report_graph_memory',
+                        '--measure', mode, '--csr-dir', csr_dir,
+                        '--nodes', str(options['nodes']), '--seed', str(options['seed']),
+                    ],
+                    capture_output=True, text=True, check=True,
+                ).stdout
+                results[mode] = json.loads(output.strip().splitlines()[-1])
+
+        self.stdout.write(f"📊 Routing graph with {options['nodes']} nodes and {edges} edges\n")
+        self.stdout.write(f"{'representation':<22} {'RSS MB':>8} {'private MB':>11} {'shared file MB':>15}")
+        labels = {
+            'dict': 'dict of tuple lists',
+            'csr': 'mmap graph snapshot',
+            'road': 'mmap road network',
+        }
+        for mode, result in results.items():
+            self.stdout.write(
+                f"{labels[mode]:<22} {result['VmRSS']:>8.1f} {result['RssAnon']:>11.1f} {result['RssFile']:>15.1f}"
+            )
+        self.stdout.write(
+            '\nPrivate memory is paid by every worker; file-backed pages of the '
+            'mmap-ed arrays are shared through the page cache.'
+        )
+
+    def measure(self, options):
+        """Memory growth of one process after loading and searching a graph."""
+        before = memory_usage()
+
+        if options['measure'] == 'dict':
+            random.seed(options['seed'])
+            nodes = random_nodes(options['nodes'], 1.65)
+            graph = build_graph(nodes)
+            dijkstra_with_path(graph, 0)
+        elif options['measure'] == 'csr':
+            # the path live routes take: node dicts plus the shared snapshot
+            with override_settings(ROUTING_GRAPH_PATH=options['csr_dir']):
+                graph = synthetic_graph(options['nodes'], options['seed'])
+                snapshot = graph.snapshot()
+            start = snapshot.coord(1)
+            dijkstra_with_path(RouteView(snapshot, start, [start]), START)
+        else:
+            network = get_road_network()
+            metric = network.customize()
+            network.shortest_path(metric, 0, len(network.vertex_lat) - 1)
+
+        after = memory_usage()
+        return {key: after[key] - before[key] for key in after}
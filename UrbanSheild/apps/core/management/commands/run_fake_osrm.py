@@ -0,0 +1,68 @@
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand
+
+from apps.core.utils import haversine
+
+
+class FakeOSRMHandler(BaseHTTPRequestHandler):
+    """Answers /route/v1/<profile>/<lon,lat;...> with straight segments."""
+
+    def do_GET(self):
+        parts = urlsplit(self.path).path.strip("/").split("/")
+        if len(parts) != 4 or parts[:2] != ["route", "v1"]:
+            return self._reply(400, {"code": "InvalidUrl"})
+
+        try:
+            coords = [
+                [float(value) for value in pair.split(",")]
+                for pair in parts[3].split(";")
+            ]
+        except ValueError:
+            return self._reply(400, {"code": "InvalidQuery"})
+
+        distance_km = sum(
+            haversine(a[1], a[0], b[1], b[0]) for a, b in zip(coords, coords[1:])
+        )
+
+        self._reply(200, {
+            "code": "Ok",
+            "routes": [{
+                "geometry": {"type": "LineString", "coordinates": coords},
+                "distance": round(distance_km * 1000, 1),
+                "duration": round(distance_km / 40 * 3600, 1),
+            }],
+        })
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Run a local stand-in for the OSRM route API (set OSRM_BASE_URL to use it)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help='Interface to bind')
+        parser.add_argument('--port', type=int, default=5000, help='Port to listen on')
+
+    def handle(self, *args, **options):
+        server = ThreadingHTTPServer((options['host'], options['port']), FakeOSRMHandler)
+        self.stdout.write(self.style.SUCCESS(
+            f"🛰️  Fake OSRM listening on http://{options['host']}:{options['port']}"
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,96 @@
+import multiprocessing
+import signal
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+# apps.core.services.job_queue is imported where it is used: under the spawn
+# and forkserver start methods each worker imports this module before
+# Django is set up, which loading the models would fail
+
+
+def run_worker(kinds=None, poll=1.0, once=False, setup=False):
+    """Run jobs until SIGTERM/SIGINT, finishing the current job first.
+
+    Worker processes pass ``setup`` to set Django up in the child first.
+    """
+    if setup:
+        django.setup()
+    from apps.core.services.job_queue import work, worker_name
+
+    stopping = []
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stopping.append(True))
+
+    return work(
+        worker_name(),
+        kinds=kinds,
+        poll=poll,
+        once=once,
+        should_stop=lambda: bool(stopping),
+    )
+
+
+class Command(BaseCommand):
+    help = 'Run background job workers (mail, routing and alert jobs)'
+
+    def add_arguments(self, parser):
+        from apps.core.services.job_queue import JOB_HANDLERS
+
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Worker processes to run'
+        )
+        parser.add_argument(
+            '--kinds',
+            nargs='+',
+            choices=sorted(JOB_HANDLERS),
+            help='Only run these job kinds'
+        )
+        parser.add_argument(
+            '--poll',
+            type=float,
+            default=1.0,
+            help='Seconds to sleep when no job is due'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once no job is due instead of polling'
+        )
+
+    def handle(self, *args, **options):
+        count = max(1, options['workers'])
+        self.stdout.write(f"⚙️ Starting {count} job worker(s)")
+        worker_options = {
+            'kinds': options['kinds'],
+            'poll': options['poll'],
+            'once': options['once'],
+        }
+
+        if count == 1:
+            executed = run_worker(**worker_options)
+            self.stdout.write(f"✅ Executed {executed} job(s)")
+            return
+
+        # forked workers must not share the parent's database connection
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(
+                target=run_worker, kwargs={**worker_options, 'setup': True}, daemon=True
+            )
+            for _ in range(count)
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
+                process.join()
+        self.stdout.write("✅ Workers stopped")
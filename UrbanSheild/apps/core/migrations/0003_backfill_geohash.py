@@ -0,0 +1,47 @@
+from django.db import migrations
+
+from apps.core.utils import geohash_encode
+
+
+GEOHASHED_MODELS = [
+    ('disasters', 'Disaster'),
+    ('traffic', 'TrafficIncident'),
+    ('shelters', 'Shelter'),
+    ('authorities', 'Authority'),
+    ('core', 'UserLocation'),
+]
+
+BATCH_SIZE = 1000
+
+
+def backfill_geohash(apps, schema_editor):
+    for app_label, model_name in GEOHASHED_MODELS:
+        model = apps.get_model(app_label, model_name)
+        last_id = 0
+        while True:
+            batch = list(
+                model.objects.filter(id__gt=last_id)
+                .only('id', 'latitude', 'longitude')
+                .order_by('id')[:BATCH_SIZE]
+            )
+            if not batch:
+                break
+            for row in batch:
+                row.geohash = geohash_encode(row.latitude, row.longitude)
+            model.objects.bulk_update(batch, ['geohash'])
+            last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_userlocation_geohash'),
+        ('disasters', '0003_disaster_geohash'),
+        ('traffic', '0003_trafficincident_geohash'),
+        ('shelters', '0002_shelter_geohash'),
+        ('authorities', '0003_authority_geohash'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+    ]
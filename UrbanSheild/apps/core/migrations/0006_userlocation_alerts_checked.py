@@ -0,0 +1,28 @@
+# Generated by Django 6.0.2 on 2026-10-17 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_streamevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userlocation',
+            name='alerts_checked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userlocation',
+            name='alerts_checked_latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userlocation',
+            name='alerts_checked_longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
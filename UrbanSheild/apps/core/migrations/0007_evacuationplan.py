@@ -0,0 +1,30 @@
+# Generated by Django 6.0.2 on 2026-10-17 16:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_userlocation_alerts_checked'),
+        ('disasters', '0003_disaster_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EvacuationPlan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.CharField(max_length=16)),
+                ('cell', models.CharField(max_length=32)),
+                ('multi_target', models.BooleanField(default=False)),
+                ('plan', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('disaster', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='evacuation_plans', to='disasters.disaster')),
+            ],
+            options={
+                'unique_together': {('disaster', 'version', 'cell', 'multi_target')},
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0.2 on 2026-10-17 19:05
+
+from django.db import migrations, models
+
+
+def backfill_fix_time(apps, schema_editor):
+    # the last write is the best guess for when existing fixes were taken
+    UserLocation = apps.get_model('core', 'UserLocation')
+    UserLocation.objects.update(fix_time=models.F('last_updated'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_evacuationplan'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userlocation',
+            name='fix_time',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_fix_time, migrations.RunPython.noop),
+    ]
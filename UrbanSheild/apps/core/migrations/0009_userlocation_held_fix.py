@@ -0,0 +1,33 @@
+# Generated by Django 6.0.2 on 2026-10-17 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_userlocation_fix_time'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userlocation',
+            name='held_accuracy',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userlocation',
+            name='held_fix_time',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userlocation',
+            name='held_latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userlocation',
+            name='held_longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -8,9 +8,20 @@ class UserLocation(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='current_location')
     latitude = models.FloatField()
     longitude = models.FloatField()
+    geohash = models.CharField(max_length=12, default='', editable=False, db_index=True)
     accuracy = models.FloatField(null=True, blank=True)  # in meters
     last_updated = models.DateTimeField(auto_now=True)
+    fix_time = models.DateTimeField(null=True, blank=True)  # When the stored fix was taken (device clock for batches)
     is_active = models.BooleanField(default=True)
+    # where and when alerts were last evaluated for this user
+    alerts_checked_at = models.DateTimeField(null=True, blank=True)
+    alerts_checked_latitude = models.FloatField(null=True, blank=True)
+    alerts_checked_longitude = models.FloatField(null=True, blank=True)
+    # newest fix held back by the write window, stored when the window closes
+    held_latitude = models.FloatField(null=True, blank=True)
+    held_longitude = models.FloatField(null=True, blank=True)
+    held_accuracy = models.FloatField(null=True, blank=True)
+    held_fix_time = models.DateTimeField(null=True, blank=True, db_index=True)
 
     def __str__(self):
         return f"{self.user.username} at ({self.latitude}, {self.longitude})"
@@ -80,3 +91,62 @@ class EvacuationZone(models.Model):
     class Meta:
         unique_together = ('disaster', 'zone_number')
         ordering = ['disaster', 'zone_number']
+
+
+class Job(models.Model):
+    """Background work item run by `manage.py run_jobs` workers"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    key = models.CharField(max_length=255, unique=True, null=True, blank=True)  # Idempotency key
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)  # Not picked up before this
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.kind} #{self.id} ({self.status})"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ]
+
+
+class StreamEvent(models.Model):
+    """Change pushed to clients of the event stream; the id is the SSE event id"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)  # None = everyone
+    kind = models.CharField(max_length=20)  # alert, disaster, traffic
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.kind} event #{self.id}"
+
+
+class EvacuationPlan(models.Model):
+    """Evacuation route shared by every user in one origin grid cell"""
+    disaster = models.ForeignKey('disasters.Disaster', on_delete=models.CASCADE, related_name='evacuation_plans')
+    version = models.CharField(max_length=16)  # Fingerprint of the disaster, road graph and shelters the plan used
+    cell = models.CharField(max_length=32)  # Snapped origin "i:j", see evacuation_service.plan_cell
+    multi_target = models.BooleanField(default=False)
+    plan = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Plan for disaster {self.disaster_id} from cell {self.cell}"
+
+    class Meta:
+        unique_together = ('disaster', 'version', 'cell', 'multi_target')
@@ -0,0 +1,205 @@
+import time
+
+from django.contrib.auth.models import User
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from apps.core.models import UserLocation, UserAlertPreference, DisasterAlert, StreamEvent
+from apps.core.serializers import DisasterAlertSerializer
+from apps.core.services.spatial_query import candidates, within_radius
+from apps.core.services.job_queue import enqueue
+from apps.core.services.event_stream import publish
+from apps.core.services.evacuation_service import queue_precompute
+from apps.core.utils import as_columns, haversine_many
+from apps.disasters.models import Disaster
+
+
+# ---------------------------------------------------------------------------
+# disaster alerts
+#
+# Alerts are evaluated in bulk: one spatial query picks the matching active
+# disasters, one lookup drops those already alerted and the rest are written
+# with a single bulk_create. Evacuation routes are not computed here; they
+# are filled in on demand by ``get_evacuation_route`` and stored on the alert.
+#
+# Both directions are covered: a location update checks that user against
+# every disaster, a new or escalated disaster checks every tracked user.
+# Requests only enqueue the work, see ``job_queue``; new alerts reach the
+# users' open event streams, see ``event_stream``.
+# ---------------------------------------------------------------------------
+
+# preferences of users who never saved any
+DEFAULT_ALERT_PREFERENCES = {
+    'alert_radius_km': 5,
+    'min_severity': 5,
+    'disaster_types': ['flood', 'fire', 'earthquake', 'cyclone', 'heatwave'],
+}
+
+# severity >= 8 and clustered reports are promoted to critical on save, so
+# "active" alone would skip the most urgent disasters
+ALERTABLE_DISASTER_STATUSES = ('active', 'critical')
+
+
+def alert_preferences(user):
+    """The user's alert preferences, created with the defaults if missing."""
+    prefs, _ = UserAlertPreference.objects.get_or_create(
+        user=user,
+        defaults=dict(DEFAULT_ALERT_PREFERENCES),
+    )
+    return prefs
+
+
+def evaluate_user_alerts(user, lat, lon, prefs=None):
+    """Create alerts for active disasters near ``(lat, lon)``; returns them."""
+    prefs = prefs or alert_preferences(user)
+    if not prefs.alert_enabled:
+        return []
+
+    nearby = within_radius(
+        Disaster.objects.filter(
+            status__in=ALERTABLE_DISASTER_STATUSES,
+            disaster_type__in=prefs.disaster_types,
+            severity__gte=prefs.min_severity,
+        ),
+        lat, lon, prefs.alert_radius_km,
+    ).values_list('id', 'distance_km')
+    nearby = dict(nearby)
+    if not nearby:
+        return []
+
+    sent = set(
+        DisasterAlert.objects.filter(user=user, disaster_id__in=nearby)
+        .values_list('disaster_id', flat=True)
+    )
+    alerts = [
+        DisasterAlert(user=user, disaster_id=disaster_id, distance_km=round(distance_km, 2))
+        for disaster_id, distance_km in nearby.items()
+        if disaster_id not in sent
+    ]
+    # a concurrent update for the same user may have written some already
+    created = DisasterAlert.objects.bulk_create(alerts, ignore_conflicts=True)
+    publish_alerts(DisasterAlert.objects.filter(
+        user=user, disaster_id__in=[alert.disaster_id for alert in alerts]
+    ))
+    return created
+
+
+def fan_out_disaster(disaster):
+    """Alert every tracked user whose preferences match ``disaster``.
+
+    Active user locations around the disaster come from the spatial index,
+    joined with their preferences; per-user radii are applied with one
+    vectorized distance pass. Returns ``{"candidates", "alerted",
+    "elapsed_ms"}``.
+    """
+    started = time.perf_counter()
+    stats = {'candidates': 0, 'alerted': 0}
+
+    if disaster.status in ALERTABLE_DISASTER_STATUSES:
+        max_radius = UserAlertPreference.objects.filter(alert_enabled=True).aggregate(
+            radius=Max('alert_radius_km')
+        )['radius'] or 0
+        max_radius = max(max_radius, DEFAULT_ALERT_PREFERENCES['alert_radius_km'])
+
+        matches = Q(
+            user__alert_preference__alert_enabled=True,
+            user__alert_preference__min_severity__lte=disaster.severity,
+        )
+        if (disaster.severity >= DEFAULT_ALERT_PREFERENCES['min_severity']
+                and disaster.disaster_type in DEFAULT_ALERT_PREFERENCES['disaster_types']):
+            matches |= Q(user__alert_preference__isnull=True)
+
+        rows = list(
+            candidates(
+                UserLocation.objects.filter(is_active=True),
+                disaster.latitude, disaster.longitude, max_radius,
+            )
+            .filter(matches)
+            .exclude(user__disaster_alerts__disaster=disaster)
+            .values_list(
+                'user_id', 'latitude', 'longitude',
+                'user__alert_preference__alert_radius_km',
+                'user__alert_preference__disaster_types',
+            )
+        )
+        stats['candidates'] = len(rows)
+
+        # JSON lists cannot be matched in SQLite, the candidates are few
+        rows = [
+            row[:3] + (DEFAULT_ALERT_PREFERENCES['alert_radius_km'] if row[3] is None else row[3],)
+            for row in rows
+            if disaster.disaster_type in (
+                DEFAULT_ALERT_PREFERENCES['disaster_types'] if row[4] is None else row[4]
+            )
+        ]
+        user_ids, lats, lons, radii = as_columns(rows, 4)
+        distances = haversine_many(disaster.latitude, disaster.longitude, lats, lons)
+        inside = distances <= radii
+        nearby = dict(zip(user_ids[inside].astype(int).tolist(), distances[inside].tolist()))
+
+        # another fan-out of this disaster may have alerted some meanwhile
+        sent = set(DisasterAlert.objects.filter(disaster=disaster).values_list('user_id', flat=True))
+        alerts = [
+            DisasterAlert(user_id=user_id, disaster=disaster, distance_km=round(distance_km, 2))
+            for user_id, distance_km in nearby.items()
+            if user_id not in sent
+        ]
+        sent_after = timezone.now()
+        DisasterAlert.objects.bulk_create(alerts, batch_size=1000, ignore_conflicts=True)
+        if alerts:
+            # ignored conflicts store nothing, so count the rows written
+            created = DisasterAlert.objects.filter(disaster=disaster, alert_sent_at__gte=sent_after)
+            stats['alerted'] = created.count()
+            publish_alerts(created)
+
+    stats['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return stats
+
+
+def publish_alerts(alerts):
+    """Push ``alerts`` (a queryset) to their users' event streams."""
+    publish(*[
+        StreamEvent(user_id=alert.user_id, kind='alert', payload=DisasterAlertSerializer(alert).data)
+        for alert in alerts.select_related('disaster')
+    ])
+
+
+def queue_user_alerts(user, lat, lon):
+    """Evaluate alerts for a location update in a background job."""
+    return enqueue('user_alerts', {'user_id': user.id, 'latitude': lat, 'longitude': lon})
+
+
+def queue_fan_out(disaster_ids, status=None):
+    """Fan out alerts for ``disaster_ids`` in background jobs.
+
+    With ``status`` each disaster is fanned out at most once per status,
+    however many saves report it.
+    """
+    return [
+        enqueue(
+            'alert_fan_out', {'disaster_id': disaster_id},
+            key=f'alert-fan-out:{disaster_id}:{status}' if status else None,
+        )
+        for disaster_id in disaster_ids
+    ]
+
+
+# ---------------------------------------------------------------------------
+# job handlers
+# ---------------------------------------------------------------------------
+
+def user_alerts_job(user_id, latitude, longitude):
+    user = User.objects.filter(id=user_id).first()
+    if user is None:
+        return {'alerted': 0}
+    return {'alerted': len(evaluate_user_alerts(user, latitude, longitude))}
+
+
+def fan_out_job(disaster_id):
+    disaster = Disaster.objects.filter(id=disaster_id).first()
+    if disaster is None:
+        return {'candidates': 0, 'alerted': 0}
+    result = fan_out_disaster(disaster)
+    # route the alerted users' cells before they ask
+    queue_precompute(disaster)
+    return result
@@ -0,0 +1,64 @@
+import json
+from pathlib import Path
+
+import numpy as np
+
+
+# ---------------------------------------------------------------------------
+# compressed-sparse-row graphs backed by .npy files
+#
+# Arrays are written one per file so they can be opened with
+# ``mmap_mode="r"``: every worker maps the same file and the kernel keeps a
+# single copy in the page cache instead of one Python object graph each.
+# ---------------------------------------------------------------------------
+
+def save_arrays(directory, meta=None, **arrays):
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(directory / f"{name}.npy", np.ascontiguousarray(array))
+    with open(directory / "meta.json", "w") as fh:
+        json.dump({**(meta or {}), "arrays": sorted(arrays)}, fh)
+
+
+def load_arrays(directory, mmap=True):
+    """Return ``(meta, arrays)`` for a directory written by save_arrays."""
+    directory = Path(directory)
+    with open(directory / "meta.json") as fh:
+        meta = json.load(fh)
+    arrays = {
+        name: np.load(directory / f"{name}.npy", mmap_mode="r" if mmap else None)
+        for name in meta["arrays"]
+    }
+    return meta, arrays
+
+
+class CSRGraph:
+    """Directed weighted graph in CSR form.
+
+    The edges leaving node ``v`` are ``targets[offsets[v]:offsets[v + 1]]``
+    with the matching ``weights``. Indexing yields ``(target, weight)``
+    pairs, so :func:`dijkstra_with_path` and :func:`astar_with_path` run on
+    it unchanged; ``lat``/``lon`` back :meth:`coord` for the A* heuristic.
+    The routing graph bases (``routing_graph.GraphBase``) wrap one.
+    """
+
+    def __init__(self, offsets, targets, weights, lat=None, lon=None):
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        self.lat = lat
+        self.lon = lon
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        return iter(range(len(self)))
+
+    def __getitem__(self, node):
+        start, end = int(self.offsets[node]), int(self.offsets[node + 1])
+        return zip(self.targets[start:end].tolist(), self.weights[start:end].tolist())
+
+    def coord(self, node):
+        return (float(self.lat[node]), float(self.lon[node]))
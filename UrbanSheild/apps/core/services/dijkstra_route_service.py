@@ -1,9 +1,14 @@
 import math
 import heapq
-import requests
+from concurrent.futures import ThreadPoolExecutor
 
+from django.conf import settings
+from django.db import close_old_connections
+
+from apps.core.utils import haversine
+from apps.core.services.route_cache import route_cache, snap
+from apps.core.services.osrm_client import osrm_client
 from apps.disasters.models import Disaster
-from apps.traffic.models import TrafficIncident
 from apps.shelters.models import Shelter
 
 
@@ -13,68 +18,135 @@ from apps.shelters.models import Shelter
 # version of the existing `find_best_route` which only supported starting from
 # a disaster and heading to the nearest shelter.
 # ---------------------------------------------------------------------------
-def compute_smart_route(start_coord, end_coord):
+def compute_smart_route(start_coord, end_coord, algorithm="dijkstra", graph=None, snapshot=None):
     """Return a dictionary containing route metadata and geometry.
 
     * ``start_coord``/``end_coord`` are (lat, lon) tuples supplied by the
       client.
     * traffic incidents and active disasters are injected as intermediate
       nodes so that the path will attempt to avoid congested/blocked areas.
+      They come from the CSR snapshot of the shared :mod:`routing_graph`,
+      so a request only attaches its own start and end node instead of
+      rebuilding the graph, and searches without taking a lock.
+    * ``algorithm`` is one of :data:`ROUTING_ALGORITHMS`. ``dijkstra`` and
+      ``astar`` return the same cost, A* just settles fewer nodes on the way;
+      ``road`` answers from the offline road network instead (see
+      :mod:`apps.core.services.road_network`).
+    * ``graph`` lets batch callers reuse one routing graph for many routes,
+      and ``snapshot`` pins them all to one of its versions.
+
+    Results are served from :data:`route_cache` when a route between the
+    same snapped coordinates was computed against the current graph version
+    within ``ROUTE_CACHE_TTL`` seconds.
     """
+    from apps.core.services.routing_graph import get_routing_graph
+
+    if graph is None:
+        graph = get_routing_graph()
 
-    traffic_points = TrafficIncident.objects.all()
-    disasters = Disaster.objects.filter(status__in=["active", "critical"])
+    if not getattr(settings, "ROUTE_CACHE_TTL", 300):
+        return _compute_smart_route(start_coord, end_coord, algorithm, graph, snapshot)
 
-    nodes = []
+    version = graph.version if snapshot is None else snapshot.version
+    key = (snap(start_coord), snap(end_coord), algorithm)
+    result = route_cache.get(key, version)
+    if result is not None:
+        return result
 
-    # start and end nodes are always present
-    nodes.append({"type": "start", "coord": start_coord})
+    result = _compute_smart_route(start_coord, end_coord, algorithm, graph, snapshot)
+    # only real answers for this graph version are cached: a failed OSRM
+    # lookup or a road network that is not loaded yet must be retried
+    if result.get("geojson_route") is not None or result.get("message") == "No route found":
+        route_cache.put(key, version, result)
+    return result
 
-    # traffic nodes carry congestion & blocked flags
-    for t in traffic_points:
-        nodes.append({
-            "type": "traffic",
-            "coord": (t.latitude, t.longitude),
-            "congestion": t.congestion_level,
-            "blocked": t.is_blocked,
-        })
 
-    # disasters should be avoided if possible, treat them as blocked nodes and
-    # give them additional congestion penalty based on severity
-    for d in disasters:
-        nodes.append({
-            "type": "disaster",
-            "coord": (d.latitude, d.longitude),
-            "congestion": getattr(d, "severity", 0),
-            "blocked": True,
-        })
+def _compute_smart_route(start_coord, end_coord, algorithm, graph, snapshot=None):
+    from apps.core.services.routing_graph import RouteView, START, END
 
-    nodes.append({"type": "end", "coord": end_coord})
+    if algorithm == "road":
+        from apps.core.services.road_network import compute_road_route
+        return compute_road_route(start_coord, end_coord, graph)
 
-    graph = build_graph(nodes)
-    distances, previous = dijkstra_with_path(graph, 0)
+    view = RouteView(snapshot or graph.snapshot(), start_coord, [end_coord])
+    if algorithm == "astar":
+        distances, previous = astar_with_path(view, START, END, view.coord)
+    else:
+        distances, previous = dijkstra_with_path(view, START)
 
-    end_index = len(nodes) - 1
-    if distances.get(end_index, float("inf")) == float("inf"):
+    if distances.get(END, float("inf")) == float("inf"):
         return {"message": "No route found"}
 
-    path_indices = reconstruct_path(previous, 0, end_index)
-    path_coords = [nodes[i]["coord"] for i in path_indices]
+    path_indices = reconstruct_path(previous, START, END)
+    path_coords = [view.coord(i) for i in path_indices]
+
     osrm_geometry = get_osrm_route(path_coords)
 
     return {
-        "route_cost": round(distances[end_index], 2),
+        "route_cost": round(distances[END], 2),
         "route_nodes": path_coords,
         "geojson_route": osrm_geometry,
     }
 
 
+def compute_batch_routes(pairs, algorithm="dijkstra"):
+    """Route many ``(start_coord, end_coord)`` pairs against one graph.
+
+    Every pair is handed to a thread pool and searched on the same
+    immutable graph snapshot, so searches run side by side (as far as the
+    GIL allows) while the OSRM geometry requests overlap. A failing pair
+    yields ``{"error": ...}`` in its slot instead of aborting the batch.
+    Results keep the order of ``pairs``.
+    """
+    from apps.core.services.routing_graph import get_routing_graph
+
+    graph = get_routing_graph()
+    snapshot = graph.snapshot()
+
+    def route_one(pair):
+        start_coord, end_coord = pair
+        try:
+            return compute_smart_route(
+                start_coord, end_coord, algorithm=algorithm, graph=graph, snapshot=snapshot
+            )
+        except Exception as e:
+            return {"error": str(e)}
+        finally:
+            # pool threads get their own connections; don't leak them
+            close_old_connections()
+
+    if not pairs:
+        return snapshot.version, []
+
+    max_workers = min(getattr(settings, "ROUTE_BATCH_WORKERS", 8), len(pairs))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return snapshot.version, list(pool.map(route_one, pairs))
+
 
 def distance(a, b):
     return math.sqrt((a[0] - b[0])**2 + (a[1] - b[1])**2)
 
 
+# nodes further apart than this (in degrees) are never connected
+EDGE_CUTOFF = 2
+
+
+def edge_weight(d, node_b):
+    """Cost of travelling a distance ``d`` into ``node_b``.
+
+    Also works element-wise when ``d`` and the node's ``congestion`` and
+    ``blocked`` values are NumPy arrays.
+    """
+    return d * 10 + node_b.get("congestion", 0) * 5 + 100 * node_b.get("blocked", False)
+
+
 def build_graph(nodes):
+    """Connect every pair of nodes closer than :data:`EDGE_CUTOFF`.
+
+    The plain all-pairs builder, used by the benchmarks and tests as the
+    reference; live routes run on the CSR arrays of
+    :func:`apps.core.services.routing_graph.build_csr`.
+    """
     graph = {}
 
     for i, node_a in enumerate(nodes):
@@ -86,38 +158,137 @@ def build_graph(nodes):
 
             d = distance(node_a["coord"], node_b["coord"])
 
-            if d < 2:
-                weight = d * 10 + node_b.get("congestion", 0) * 5
+            if d < EDGE_CUTOFF:
+                graph[i].append((j, edge_weight(d, node_b)))
 
-                if node_b.get("blocked", False):
-                    weight += 100
+    return graph
 
-                graph[i].append((j, weight))
 
-    return graph
+ROUTING_ALGORITHMS = ("dijkstra", "astar", "road")
+
+# great-circle km per degree; haversine(a, b) / KM_PER_DEGREE never exceeds
+# the planar degree distance used for edge weights, so it is a safe bound
+KM_PER_DEGREE = 6371 * math.pi / 180
+
 
+def dijkstra_with_path(graph, start, stats=None):
+    """Single-source Dijkstra over any mapping of node -> (neighbour, weight).
 
-def dijkstra_with_path(graph, start):
-    distances = {node: float("inf") for node in graph}
+    Nodes that were never reached are simply absent from ``distances``. When
+    a ``stats`` dict is given the number of settled nodes is stored in it.
+    """
+    distances = {start: 0}
     previous = {}
+    settled = 0
 
-    distances[start] = 0
     pq = [(0, start)]
 
     while pq:
         current_distance, current_node = heapq.heappop(pq)
 
+        if current_distance > distances[current_node]:
+            continue
+        settled += 1
+
         for neighbor, weight in graph[current_node]:
             new_distance = current_distance + weight
 
-            if new_distance < distances[neighbor]:
+            if new_distance < distances.get(neighbor, float("inf")):
                 distances[neighbor] = new_distance
                 previous[neighbor] = current_node
                 heapq.heappush(pq, (new_distance, neighbor))
 
+    if stats is not None:
+        stats["settled"] = settled
+
+    return distances, previous
+
+
+def astar_with_path(graph, start, target, coord, stats=None):
+    """A* search that stops as soon as ``target`` is settled.
+
+    ``coord`` maps a node to its (lat, lon). The heuristic is the haversine
+    distance to the target converted back to edge-weight units; every edge
+    costs at least ten times its planar degree length, which is never less
+    than the great-circle length, so the heuristic is admissible and the
+    returned cost matches :func:`dijkstra_with_path`.
+    """
+    target_lat, target_lon = coord(target)
+
+    def heuristic(node):
+        lat, lon = coord(node)
+        return haversine(lat, lon, target_lat, target_lon) / KM_PER_DEGREE * 10
+
+    distances = {start: 0}
+    previous = {}
+    settled = 0
+
+    pq = [(heuristic(start), 0, start)]
+
+    while pq:
+        _, current_distance, current_node = heapq.heappop(pq)
+
+        if current_distance > distances[current_node]:
+            continue
+        settled += 1
+
+        if current_node == target:
+            break
+
+        for neighbor, weight in graph[current_node]:
+            new_distance = current_distance + weight
+
+            if new_distance < distances.get(neighbor, float("inf")):
+                distances[neighbor] = new_distance
+                previous[neighbor] = current_node
+                heapq.heappush(pq, (new_distance + heuristic(neighbor), new_distance, neighbor))
+
+    if stats is not None:
+        stats["settled"] = settled
+
     return distances, previous
 
 
+def dijkstra_to_targets(graph, start, targets, k=1, stats=None):
+    """Dijkstra that stops once ``k`` of ``targets`` have been settled.
+
+    Returns ``(distances, previous, settled_targets)`` where
+    ``settled_targets`` lists the reached targets cheapest first.
+    """
+    targets = set(targets)
+    distances = {start: 0}
+    previous = {}
+    settled = 0
+    settled_targets = []
+
+    pq = [(0, start)]
+
+    while pq:
+        current_distance, current_node = heapq.heappop(pq)
+
+        if current_distance > distances[current_node]:
+            continue
+        settled += 1
+
+        if current_node in targets:
+            settled_targets.append(current_node)
+            if len(settled_targets) >= k:
+                break
+
+        for neighbor, weight in graph[current_node]:
+            new_distance = current_distance + weight
+
+            if new_distance < distances.get(neighbor, float("inf")):
+                distances[neighbor] = new_distance
+                previous[neighbor] = current_node
+                heapq.heappush(pq, (new_distance, neighbor))
+
+    if stats is not None:
+        stats["settled"] = settled
+
+    return distances, previous, settled_targets
+
+
 def reconstruct_path(previous, start, target):
     path = []
     node = target
@@ -137,39 +308,72 @@ def get_osrm_route(coords):
     """
     coords = [(lat, lon), (lat, lon), ...]
     """
-    coord_string = ";".join(
-        [f"{lon},{lat}" for lat, lon in coords]
-    )
+    return osrm_client.route_geometry(coords)
 
-    url = f"http://router.project-osrm.org/route/v1/driving/{coord_string}"
 
-    params = {
-        "overview": "full",
-        "geometries": "geojson"
-    }
+def compute_shelter_route(start_coord, shelters, k=1, graph=None):
+    """Route to whichever shelter is cheapest by actual graph cost.
 
-    response = requests.get(url, params=params, timeout=10)
+    All ``shelters`` are attached to the routing graph as end nodes and a
+    single Dijkstra run from ``start_coord`` stops once ``k`` of them are
+    settled. The first one settled is the cheapest; the others are returned
+    as ``candidates`` so callers can offer alternatives.
+    """
+    from apps.core.services.routing_graph import get_routing_graph, RouteView, START, end_id
 
-    if response.status_code != 200:
-        return None
+    shelters = list(shelters)
+    if not shelters:
+        return {"message": "No route found"}
 
-    data = response.json()
+    if graph is None:
+        graph = get_routing_graph()
 
-    try:
-        return data["routes"][0]["geometry"]
-    except (KeyError, IndexError):
-        return None
+    view = RouteView(graph.snapshot(), start_coord, [(s.latitude, s.longitude) for s in shelters])
+    by_node = {end_id(i): shelter for i, shelter in enumerate(shelters)}
+    distances, previous, reached = dijkstra_to_targets(view, START, by_node, k=k)
 
+    if not reached:
+        return {"message": "No route found"}
+
+    best = reached[0]
+    path_indices = reconstruct_path(previous, START, best)
+    path_coords = [view.coord(i) for i in path_indices]
 
-def find_best_route(disaster_id):
-    """Wrapper used by the disaster viewset.
+    osrm_geometry = get_osrm_route(path_coords)
+    shelter = by_node[best]
 
-    The original logic manually built a graph with the disaster as the start
-    and all active shelters as possible destinations; it duplicated a lot of
-    the generic routing code.  For maintainability we now simply identify the
-    nearest shelter in straight-line distance and hand the computation off to
-    :func:`compute_smart_route` which already understands traffic and
-    disaster penalties.
+    return {
+        "route_cost": round(distances[best], 2),
+        "route_nodes": path_coords,
+        "geojson_route": osrm_geometry,
+        "shelter": {
+            "id": shelter.id,
+            "name": shelter.name,
+            "latitude": shelter.latitude,
+            "longitude": shelter.longitude,
+        },
+        "candidates": [
+            {"shelter_id": by_node[node].id, "route_cost": round(distances[node], 2)}
+            for node in reached
+        ],
+    }
+
+
+def find_best_route(disaster_id, algorithm="dijkstra", multi_target=False, k=1):
+    """Route from a disaster to a shelter, for the disaster viewset.
+
+    With ``multi_target`` (``smart_route/?mode=multi&k=``) every active
+    shelter is attached to the routing graph as an end node and
+    :func:`compute_shelter_route` runs a single :func:`dijkstra_to_targets`
+    search that stops once ``k`` shelters are settled. The first one is the
+    cheapest by actual graph cost, traffic and disaster penalties included;
+    the others come back as ``candidates``. ``algorithm`` does not apply in
+    this mode.
+
+    Otherwise (the default, kept for existing clients) the shelter closest
+    in straight-line distance is picked first and routed to with
+    :func:`compute_smart_route` using ``algorithm``; that shelter is not
+    necessarily the cheapest one to reach.
     """
 
     disaster = Disaster.objects.get(id=disaster_id)
@@ -178,16 +382,20 @@ def find_best_route(disaster_id):
     if not shelters.exists():
         return {"message": "No route found"}
 
+    start = (disaster.latitude, disaster.longitude)
+
+    if multi_target:
+        return compute_shelter_route(start, shelters, k=k)
+
     # pick the closest shelter by simple Euclidean distance (doesn't need to be
     # perfect since the heavy lifting happens in compute_smart_route)
     def _euclidean(a, b):
         return math.sqrt((a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2)
 
-    start = (disaster.latitude, disaster.longitude)
     closest = min(
         shelters,
         key=lambda s: _euclidean(start, (s.latitude, s.longitude))
     )
     end = (closest.latitude, closest.longitude)
 
-    return compute_smart_route(start, end)
+    return compute_smart_route(start, end, algorithm=algorithm)
@@ -1,6 +1,6 @@
-from django.core.mail import send_mail
 from django.conf import settings
 from apps.authorities.models import Authority
+from apps.core.services.job_queue import enqueue
 
 
 def escalate_disaster(disaster):
@@ -36,9 +36,10 @@ def escalate_disaster(disaster):
     if not emails:
         return {"error": "No authorities found"}
 
-    send_mail(
-        subject=f"🚨 Disaster Alert: {disaster.disaster_type.upper()}",
-        message=f"""
+    # delivered by a job worker, retried if SMTP fails
+    enqueue("send_mail", {
+        "subject": f"🚨 Disaster Alert: {disaster.disaster_type.upper()}",
+        "message": f"""
 Emergency Alert from UrbanShield
 
 Type: {disaster.disaster_type}
@@ -48,9 +49,8 @@ Status: {disaster.status}
 
 Immediate action required.
         """,
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        recipient_list=emails,
-        fail_silently=False,
-    )
+        "from_email": settings.DEFAULT_FROM_EMAIL,
+        "recipient_list": emails,
+    }, key=f"escalation:{disaster.id}")
 
-    return {"message": "Escalation sent", "recipients": emails}
\ No newline at end of file
+    return {"message": "Escalation queued", "recipients": emails}
\ No newline at end of file
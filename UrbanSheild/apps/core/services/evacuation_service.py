@@ -1,10 +1,23 @@
-from apps.core.utils import haversine
-from apps.core.services.dijkstra_route_service import compute_smart_route
+import hashlib
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from apps.core.models import DisasterAlert, EvacuationPlan
+from apps.core.utils import haversine, haversine_many
+from apps.core.services.dijkstra_route_service import compute_smart_route, compute_shelter_route
+from apps.core.services.job_queue import enqueue
+from apps.core.services.route_cache import snap
+from apps.core.services.routing_graph import get_routing_graph
 from apps.shelters.models import Shelter
 from apps.core.utils import UTTARAKHAND_BOUNDS
 
 
-def compute_evacuation_route(user_location, disaster):
+def compute_evacuation_route(user_location, disaster, multi_target=False, k=3):
     """
     Compute the best evacuation route from user location to nearest safe shelter.
     Avoids disaster epicenter and considers traffic.
@@ -12,6 +25,9 @@ def compute_evacuation_route(user_location, disaster):
     Args:
         user_location: (lat, lon) tuple for current user position
         disaster: Disaster model instance
+        multi_target: pick the shelter by routed graph cost (one search over
+            every safe shelter) instead of by straight-line distance
+        k: number of shelters the multi-target search settles before stopping
     
     Returns:
         dict with route_coordinates, nearest_shelter, distance_km, eta_minutes
@@ -21,36 +37,29 @@ def compute_evacuation_route(user_location, disaster):
     # Increase exclusion radius based on disaster severity
     exclusion_radius = max(2, disaster.severity / 2)  # 1-5km based on severity
     
-    shelters = Shelter.objects.filter(
-        is_active=True,
-        latitude__gte=UTTARAKHAND_BOUNDS["min_lat"],
-        latitude__lte=UTTARAKHAND_BOUNDS["max_lat"],
-        longitude__gte=UTTARAKHAND_BOUNDS["min_lon"],
-        longitude__lte=UTTARAKHAND_BOUNDS["max_lon"],
-    )
+    shelters = evacuation_shelters()
     
     best_shelter = None
     best_distance = float('inf')
+    safe_shelters = []
     
-    for shelter in shelters:
-        # Check if shelter is outside danger zone
-        dist_to_disaster = haversine(
-            shelter.latitude, shelter.longitude,
-            disaster.latitude, disaster.longitude
-        )
-        
-        if dist_to_disaster < exclusion_radius:
-            continue  # Skip shelters too close to disaster
+    candidates = list(shelters)
+    if candidates:
+        lats = [shelter.latitude for shelter in candidates]
+        lons = [shelter.longitude for shelter in candidates]
         
-        # Calculate distance from user to shelter
-        dist_to_shelter = haversine(
-            user_location[0], user_location[1],
-            shelter.latitude, shelter.longitude
-        )
+        # Skip shelters too close to disaster
+        dist_to_disaster = haversine_many(disaster.latitude, disaster.longitude, lats, lons)
+        safe = dist_to_disaster >= exclusion_radius
+        safe_shelters = [shelter for shelter, ok in zip(candidates, safe) if ok]
         
-        if dist_to_shelter < best_distance:
-            best_distance = dist_to_shelter
-            best_shelter = shelter
+        # Nearest safe shelter from the user
+        if safe.any():
+            dist_to_shelter = haversine_many(user_location[0], user_location[1], lats, lons)
+            dist_to_shelter[~safe] = np.inf
+            index = int(dist_to_shelter.argmin())
+            best_shelter = candidates[index]
+            best_distance = float(dist_to_shelter[index])
     
     if not best_shelter:
         # If no shelter found, use second-best even if closer to disaster
@@ -63,11 +72,22 @@ def compute_evacuation_route(user_location, disaster):
             'evacuation_route': None
         }
     
-    # Use smart routing with disaster avoidance
-    route_result = compute_smart_route(
-        start_coord=user_location,
-        end_coord=(best_shelter.latitude, best_shelter.longitude)
-    )
+    if multi_target:
+        # Let the graph decide between all safe shelters in a single search
+        route_result = compute_shelter_route(user_location, safe_shelters or [best_shelter], k=k)
+        routed = route_result.get('shelter')
+        if routed:
+            best_shelter = next(s for s in safe_shelters or [best_shelter] if s.id == routed['id'])
+            best_distance = haversine(
+                user_location[0], user_location[1],
+                best_shelter.latitude, best_shelter.longitude
+            )
+    else:
+        # Use smart routing with disaster avoidance
+        route_result = compute_smart_route(
+            start_coord=user_location,
+            end_coord=(best_shelter.latitude, best_shelter.longitude)
+        )
     
     return {
         'status': 'success',
@@ -85,6 +105,17 @@ def compute_evacuation_route(user_location, disaster):
     }
 
 
+def evacuation_shelters():
+    """Active shelters inside Uttarakhand, the ones evacuations lead to."""
+    return Shelter.objects.filter(
+        is_active=True,
+        latitude__gte=UTTARAKHAND_BOUNDS["min_lat"],
+        latitude__lte=UTTARAKHAND_BOUNDS["max_lat"],
+        longitude__gte=UTTARAKHAND_BOUNDS["min_lon"],
+        longitude__lte=UTTARAKHAND_BOUNDS["max_lon"],
+    )
+
+
 def check_user_in_danger_zone(user_location, disaster, radius_km=5):
     """
     Check if user is within danger radius of a disaster.
@@ -95,3 +126,155 @@ def check_user_in_danger_zone(user_location, disaster, radius_km=5):
         disaster.latitude, disaster.longitude
     )
     return distance <= radius_km
+
+
+# ---------------------------------------------------------------------------
+# shared evacuation plans
+#
+# Neighbours a block apart get the same route, so plans are computed once
+# per origin cell (EVACUATION_PLAN_GRID_DEG) from the cell's centre and
+# stored under (disaster, plan_version, cell). The version fingerprints
+# everything a plan is computed from: the disaster, the routing graph
+# (traffic and disasters) and the evacuation shelters' count and last
+# update. Any change to those starts a new version, so stale plans simply
+# stop matching and are pruned once no worker can still be on the old graph.
+# When a disaster is raised the cells of its alerted users are planned
+# ahead, nearest first, up to EVACUATION_PLAN_PRECOMPUTE_MAX cells.
+# ---------------------------------------------------------------------------
+
+def plan_cell(lat, lon):
+    """``"i:j"`` cell of a position on the plan grid."""
+    i, j = snap((lat, lon), getattr(settings, "EVACUATION_PLAN_GRID_DEG", 0.005))
+    return f"{i}:{j}"
+
+
+def cell_center(cell):
+    grid = getattr(settings, "EVACUATION_PLAN_GRID_DEG", 0.005)
+    i, j = (int(part) for part in cell.split(":"))
+    return (i * grid, j * grid)
+
+
+def plan_version(disaster):
+    """Fingerprint of the disaster, road graph and shelters a plan depends on.
+
+    Shelters count by a marker, not row by row: every save moves the
+    latest ``updated_at`` and an added, removed or deactivated shelter
+    moves the count.
+    """
+    shelters = evacuation_shelters().aggregate(count=Count("id"), updated=Max("updated_at"))
+    raw = (
+        f"{disaster.latitude}:{disaster.longitude}:{disaster.severity}:{disaster.status}"
+        f":{get_routing_graph().fingerprint}:{shelters['count']}:{shelters['updated']}"
+    )
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def cached_plan(disaster, cell, multi_target=False, version=None):
+    """The stored plan for ``cell``, or None."""
+    return EvacuationPlan.objects.filter(
+        disaster=disaster, version=version or plan_version(disaster),
+        cell=cell, multi_target=multi_target,
+    ).values_list("plan", flat=True).first()
+
+
+def build_plan(disaster, cell, multi_target=False, version=None):
+    """Compute and store the plan for ``cell``, then prune superseded ones."""
+    version = version or plan_version(disaster)
+    plan = compute_evacuation_route(cell_center(cell), disaster, multi_target=multi_target)
+    EvacuationPlan.objects.bulk_create([
+        EvacuationPlan(
+            disaster=disaster, version=version, cell=cell,
+            multi_target=multi_target, plan=plan,
+        )
+    ], ignore_conflicts=True)
+    expire_plans(disaster, version)
+    return plan
+
+
+def expire_plans(disaster, version):
+    """Drop the disaster's plans of other versions once they are old enough.
+
+    Workers reload their routing graph within ROUTING_GRAPH_MAX_AGE, so a
+    plan of another version that is older than that can no longer be the
+    current one anywhere.
+    """
+    keep = getattr(settings, "ROUTING_GRAPH_MAX_AGE", 300) or 300
+    return EvacuationPlan.objects.filter(
+        disaster=disaster, created_at__lt=timezone.now() - timedelta(seconds=keep),
+    ).exclude(version=version).delete()[0]
+
+
+def queue_plan(disaster, cell, multi_target=False, version=None):
+    """Plan ``cell`` in the background; one job per cell however many ask.
+
+    The job stores the plan under the caller's ``version``, so the caller
+    finds it even when the worker's graph is a reload behind.
+    """
+    version = version or plan_version(disaster)
+    return enqueue(
+        "evacuation_plan",
+        {"disaster_id": disaster.id, "cell": cell, "multi_target": multi_target, "version": version},
+        key=f"evacuation-plan:{disaster.id}:{version}:{cell}:{int(multi_target)}",
+        replace_finished=True,
+    )
+
+
+def queue_precompute(disaster):
+    return enqueue(
+        "evacuation_plans",
+        {"disaster_id": disaster.id},
+        key=f"evacuation-plans:{disaster.id}:{plan_version(disaster)}",
+        replace_finished=True,
+    )
+
+
+def precompute_plans(disaster):
+    """Plan the cells of the disaster's alerted users that have no plan yet."""
+    started = time.perf_counter()
+    version = plan_version(disaster)
+    positions = DisasterAlert.objects.filter(
+        disaster=disaster, user__current_location__is_active=True,
+    ).values_list("user__current_location__latitude", "user__current_location__longitude")
+
+    cells = {plan_cell(lat, lon) for lat, lon in positions}
+    cells -= set(EvacuationPlan.objects.filter(
+        disaster=disaster, version=version, multi_target=False,
+    ).values_list("cell", flat=True))
+
+    # nearest cells first: their users are in the most danger
+    cells = sorted(cells, key=lambda cell: haversine(
+        disaster.latitude, disaster.longitude, *cell_center(cell)
+    ))
+    limit = getattr(settings, "EVACUATION_PLAN_PRECOMPUTE_MAX", 100)
+    for cell in cells[:limit]:
+        build_plan(disaster, cell, version=version)
+
+    return {
+        "cells": len(cells),
+        "planned": min(len(cells), limit),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def evacuation_plan_job(disaster_id, cell, multi_target=False, version=None):
+    """Job handler: plan one cell unless it was planned meanwhile."""
+    from apps.disasters.models import Disaster
+
+    disaster = Disaster.objects.filter(id=disaster_id).first()
+    if disaster is None:
+        return {"status": "error", "message": "Disaster not found"}
+    version = version or plan_version(disaster)
+    plan = (
+        cached_plan(disaster, cell, multi_target, version)
+        or build_plan(disaster, cell, multi_target, version)
+    )
+    return {"status": plan["status"], "cell": cell}
+
+
+def precompute_plans_job(disaster_id):
+    from apps.disasters.models import Disaster
+
+    disaster = Disaster.objects.filter(id=disaster_id).first()
+    if disaster is None:
+        return None
+    return precompute_plans(disaster)
@@ -0,0 +1,293 @@
+import asyncio
+import json
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+
+from apps.core.models import StreamEvent
+
+
+# ---------------------------------------------------------------------------
+# server-sent event stream
+#
+# Changes are written to the StreamEvent table (by whichever process made
+# them, web or job worker) and each web process runs a single poller that
+# hands new rows to the open streams. The database sees one query per
+# process per STREAM_POLL_INTERVAL instead of one per client, and the
+# event id doubles as the SSE ``Last-Event-ID`` a reconnecting client
+# resumes from.
+#
+# Every stream buffers at most STREAM_QUEUE_SIZE events. A client too slow
+# to keep up is disconnected once its buffer drains; the browser reconnects
+# with its last id and replays the rest from the table.
+#
+# An id is taken before its transaction commits, so with concurrent
+# writers (PostgreSQL) a lower id can become visible after a higher one has
+# been read. The poller keeps the ids it stepped over as holes and re-reads
+# them for STREAM_LATE_COMMIT_S seconds (a rolled-back insert never fills
+# its hole); a late row is handed out when it appears and every stream
+# drops the ids it already sent. The SSE id carries the holes still open
+# below it ("<id>,<hole>,...") so a replay after a reconnect reads them too.
+# ---------------------------------------------------------------------------
+
+BATCH_SIZE = 500  # events per query
+RETRY_MS = 3000  # browser reconnect delay
+MAX_HOLES = 100  # skipped ids watched (and sent back in a cursor) at once
+
+
+def publish(*events):
+    """Store ``StreamEvent`` instances once the current transaction commits."""
+    if events:
+        transaction.on_commit(lambda: StreamEvent.objects.bulk_create(events, batch_size=1000))
+
+
+def publish_changes(kind, ids, action="saved"):
+    """Tell every client that rows of ``kind`` (disaster, traffic) changed."""
+    ids = list(ids)
+    if ids:
+        publish(StreamEvent(kind=kind, payload={"ids": ids, "action": action}))
+
+
+def format_cursor(last_id, holes=()):
+    return ",".join(map(str, [last_id, *sorted(holes)]))
+
+
+def parse_cursor(value):
+    """``(last_id, holes)`` from an SSE id written by ``format_cursor``."""
+    last_id, *holes = (int(part) for part in value.split(","))
+    return last_id, [hole for hole in holes if hole < last_id][:MAX_HOLES]
+
+
+def format_event(event, cursor=None):
+    return f"id: {cursor or event.id}\nevent: {event.kind}\ndata: {json.dumps(event.payload)}\n\n"
+
+
+class Subscription:
+    """Bounded buffer of one open stream."""
+
+    def __init__(self, user_id, size):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize=size)
+        self.overflowed = False
+
+    def offer(self, event):
+        if self.overflowed or event.user_id not in (None, self.user_id):
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # stop buffering; the client resumes from the table
+            self.overflowed = True
+
+
+class EventHub:
+    """The per-process poller feeding every open stream."""
+
+    def __init__(self):
+        self.subscriptions = set()
+        self.last_id = 0
+        self.holes = {}  # id below last_id not seen yet -> when it was skipped
+        self.task = None
+        self.ready = None
+        self.loop = None
+        self.pruned_at = 0.0
+
+    async def subscribe(self, user_id):
+        """Register a stream; every event after ``self.last_id`` reaches it.
+
+        Read ``last_id`` right after this returns: events up to it were
+        handed out before the stream joined (or are in its queue already).
+        """
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            # first stream, or a new event loop (tests, server reload)
+            self.subscriptions, self.task, self.loop = set(), None, loop
+
+        subscription = Subscription(user_id, getattr(settings, "STREAM_QUEUE_SIZE", 100))
+        self.subscriptions.add(subscription)
+        if self.task is None:
+            self.ready = asyncio.Event()
+            self.task = loop.create_task(self._poll())
+        try:
+            await self.ready.wait()
+        except asyncio.CancelledError:
+            self.unsubscribe(subscription)
+            raise
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.subscriptions.discard(subscription)
+
+    def watch(self, ids, now=None):
+        """Keep reading ``ids`` for a while in case they commit late."""
+        now = time.monotonic() if now is None else now
+        for hole in ids:
+            self.holes.setdefault(hole, now)
+        for hole in list(self.holes)[:-MAX_HOLES]:
+            del self.holes[hole]
+
+    def deliver(self, events, now=None):
+        """Offer polled ``events`` to the streams and move ``last_id`` on.
+
+        No await in here: ``last_id`` only moves past events every current
+        stream has been offered.
+        """
+        now = time.monotonic() if now is None else now
+        for event in events:
+            if event.id > self.last_id:
+                self.watch(range(max(self.last_id, event.id - MAX_HOLES - 1) + 1, event.id), now)
+                self.last_id = event.id
+            elif event.id in self.holes:
+                del self.holes[event.id]
+            else:
+                continue  # delivered already
+            for subscription in self.subscriptions:
+                subscription.offer(event)
+
+        grace = getattr(settings, "STREAM_LATE_COMMIT_S", 10)
+        for hole, skipped_at in list(self.holes.items()):
+            if now - skipped_at > grace:
+                del self.holes[hole]
+
+    async def _poll(self):
+        interval = getattr(settings, "STREAM_POLL_INTERVAL", 1.0)
+        try:
+            try:
+                self.last_id = await sync_to_async(latest_event_id)()
+                self.watch(await sync_to_async(missing_ids)(self.last_id))
+            except DatabaseError:
+                pass
+            self.ready.set()
+
+            while self.subscriptions:
+                try:
+                    events = await sync_to_async(events_after)(self.last_id, holes=list(self.holes))
+                    await self._prune()
+                except DatabaseError:
+                    events = []
+                self.deliver(events)
+                if len(events) < BATCH_SIZE:
+                    await asyncio.sleep(interval)
+        finally:
+            self.ready.set()
+            self.task = None
+
+    async def _prune(self):
+        retention = getattr(settings, "STREAM_EVENT_RETENTION", 3600)
+        if time.monotonic() - self.pruned_at > min(retention, 60):
+            self.pruned_at = time.monotonic()
+            await sync_to_async(prune_events)(retention)
+
+
+event_hub = EventHub()
+
+
+def latest_event_id():
+    return StreamEvent.objects.aggregate(last=Max("id"))["last"] or 0
+
+
+def missing_ids(last_id):
+    """Ids just below ``last_id`` that are not (or not yet) in the table."""
+    low = max(last_id - MAX_HOLES, 0)
+    present = set(StreamEvent.objects.filter(id__gt=low, id__lte=last_id).values_list("id", flat=True))
+    return [event_id for event_id in range(low + 1, last_id) if event_id not in present]
+
+
+def events_after(last_id, user_id=None, upto_id=None, visible_only=False, holes=()):
+    """The next events after ``last_id``, plus any of ``holes`` now visible."""
+    after = Q(id__gt=last_id)
+    if upto_id is not None:
+        after &= Q(id__lte=upto_id)
+    events = StreamEvent.objects.filter(after | Q(id__in=holes) if holes else after)
+    if visible_only:
+        visible = Q(user__isnull=True)
+        if user_id is not None:
+            visible |= Q(user_id=user_id)
+        events = events.filter(visible)
+    return list(events.order_by("id")[:BATCH_SIZE])
+
+
+def prune_events(retention):
+    StreamEvent.objects.filter(created_at__lt=timezone.now() - timedelta(seconds=retention)).delete()
+
+
+def replay(user_id, after_id, upto_id, holes=()):
+    """Events a reconnecting client missed, or None if some are gone.
+
+    ``holes`` are ids below ``after_id`` that had not committed yet when
+    the client got its last event.
+    """
+    oldest = StreamEvent.objects.aggregate(first=Min("id"))["first"]
+    if after_id < upto_id and (oldest is None or oldest > after_id + 1):
+        return None  # pruned since the client saw them
+
+    events = []
+    while after_id < upto_id or holes:
+        batch = events_after(after_id, user_id, upto_id, visible_only=True, holes=holes)
+        holes = ()
+        if not batch:
+            break
+        events += batch
+        if len(events) > getattr(settings, "STREAM_REPLAY_LIMIT", 1000):
+            return None
+        after_id = max(after_id, batch[-1].id)
+    return events
+
+
+async def stream(user_id, last_event_id=None, holes=()):
+    """SSE body: replayed events after ``last_event_id``, then live ones.
+
+    ``holes`` come with ``last_event_id`` from the client's cursor, see
+    ``parse_cursor``.
+    """
+    subscription = await event_hub.subscribe(user_id)
+    heartbeat = getattr(settings, "STREAM_HEARTBEAT", 15)
+    try:
+        sent = event_hub.last_id
+        # ids below ``sent`` that may still reach this stream, late
+        waiting = set(event_hub.holes)
+        replayed = set()
+
+        def cursor():
+            return format_cursor(sent, [hole for hole in waiting if hole < sent and hole in event_hub.holes])
+
+        yield f"retry: {RETRY_MS}\n\n"
+
+        if last_event_id is not None:
+            holes = [hole for hole in holes if hole <= sent]
+            if last_event_id < sent or holes:
+                missed = await sync_to_async(replay)(user_id, last_event_id, sent, holes)
+                if missed is None:
+                    # too much to replay: the client reloads its lists instead
+                    yield f"id: {cursor()}\nevent: reset\ndata: {{}}\n\n"
+                else:
+                    replayed = {event.id for event in missed}
+                    late = set(holes) - replayed
+                    event_hub.watch(late)
+                    waiting |= late
+                    sent, upto = last_event_id, sent
+                    for event in missed:
+                        sent = max(sent, event.id)
+                        yield format_event(event, cursor())
+                    sent = max(sent, upto)
+
+        while not (subscription.overflowed and subscription.queue.empty()):
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if event.id in replayed:
+                continue
+            if last_event_id is not None and event.id <= last_event_id and event.id not in holes:
+                continue  # the client had it before it reconnected
+            waiting.discard(event.id)
+            sent = max(sent, event.id)
+            yield format_event(event, cursor())
+    finally:
+        event_hub.unsubscribe(subscription)
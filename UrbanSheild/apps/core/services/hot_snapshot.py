@@ -0,0 +1,395 @@
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db import models
+from django.utils import timezone as django_timezone
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+from apps.authorities.models import Authority
+from apps.disasters.models import Disaster
+from apps.shelters.models import Shelter
+from apps.traffic.models import TrafficIncident
+from apps.core.utils import UTTARAKHAND_BOUNDS, haversine_many
+from apps.core.services.csr_graph import save_arrays, load_arrays
+from apps.core.models import Job
+from apps.core.services.job_queue import enqueue
+
+try:
+    import fcntl
+except ImportError:  # Windows: rebuilds race harmlessly, see _write(), and
+    fcntl = None     # a lost generation bump still leaves the snapshot stale
+
+
+# ---------------------------------------------------------------------------
+# shared read snapshot of the map data
+#
+# Every row the map read endpoints serve is written as one .npy file per
+# column under HOT_SNAPSHOT_PATH/<build>/ and mmap-ed by each worker, so all
+# workers share a single page-cache copy and answer disasters/, traffic/ and
+# search/info/ without touching the database.
+#
+# Coordination goes through two files next to the builds: ``CURRENT`` names
+# the latest build, its version and the generation it was built from, and
+# ``GENERATION`` holds a counter bumped whenever a row changes (model
+# signals, see ``apps.core.signals``). Each bump queues a ``hot_snapshot``
+# job that rebuilds in the background; meanwhile readers keep serving the
+# previous build and re-attach once CURRENT names a new one. The first
+# build happens in a request, and so does any rebuild once the served build
+# is older than HOT_SNAPSHOT_MAX_AGE while its job has sat unclaimed for
+# JOB_GRACE_S (no ``run_jobs`` worker), so reads never stay stale for long.
+# ---------------------------------------------------------------------------
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+NO_TIME = np.iinfo(np.int64).min
+
+# dataset -> rows it holds; list endpoints apply the Uttarakhand bounds
+# themselves since search/info/ counts every row
+DATASETS = {
+    "disasters": lambda: Disaster.objects.all(),
+    "traffic": lambda: TrafficIncident.objects.all(),
+    "shelters": lambda: Shelter.objects.filter(is_active=True),
+    "authorities": lambda: Authority.objects.filter(state="Uttarakhand"),
+}
+
+# index-only columns the API serializers exclude
+HIDDEN_FIELDS = {"geohash"}
+
+# seconds a queued rebuild may wait for a worker before a request builds
+JOB_GRACE_S = 5
+
+# query parameters snapshot_list understands; anything else (filters,
+# search, pagination) is left to the viewset
+SNAPSHOT_PARAMS = {"lat", "lon", "radius", "ordering", "format"}
+
+_datetime_field = serializers.DateTimeField()
+
+
+def _to_micros(value):
+    return NO_TIME if value is None else (value - EPOCH) // timedelta(microseconds=1)
+
+
+def _from_micros(value):
+    return None if value == NO_TIME else EPOCH + timedelta(microseconds=value)
+
+
+def build_columns(queryset):
+    """One NumPy array per served concrete field, rows ordered by id.
+
+    Returns ``(columns, nulls)``; ``nulls`` holds a mask per nullable
+    non-datetime field (datetimes use ``NO_TIME``).
+    """
+    fields = [
+        field for field in queryset.model._meta.concrete_fields
+        if field.attname not in HIDDEN_FIELDS
+    ]
+    rows = list(queryset.order_by("id").values_list(*[field.attname for field in fields]))
+    values = list(zip(*rows)) or [()] * len(fields)
+
+    columns, nulls = {}, {}
+    for field, column in zip(fields, values):
+        if field.null and not isinstance(field, models.DateTimeField):
+            nulls[field.attname] = np.array([v is None for v in column], dtype=bool)
+            numeric = isinstance(field, (models.IntegerField, models.FloatField, models.BooleanField))
+            column = [(0 if numeric else "") if v is None else v for v in column]
+
+        if isinstance(field, models.DateTimeField):
+            columns[field.attname] = np.array([_to_micros(v) for v in column], dtype=np.int64)
+        elif isinstance(field, models.BooleanField):
+            columns[field.attname] = np.array(column, dtype=bool)
+        elif isinstance(field, (models.IntegerField, models.AutoField)):
+            columns[field.attname] = np.array(column, dtype=np.int64)
+        elif isinstance(field, models.FloatField):
+            columns[field.attname] = np.array(column, dtype=np.float64)
+        else:
+            columns[field.attname] = np.array([str(v) for v in column], dtype=str)
+    return columns, nulls
+
+
+class Snapshot:
+    """Columnar, read-only view of one snapshot build."""
+
+    def __init__(self, version, meta, arrays):
+        self.version = version
+        self.counts = meta["counts"]
+        self.fields = meta["fields"]
+        self.datetimes = set(meta["datetimes"])
+        self.columns = {
+            name: {field: arrays[f"{name}__{field}"] for field in self.fields[name]}
+            for name in DATASETS
+        }
+        self.nulls = {
+            name: {
+                field: arrays[f"{name}__{field}__null"]
+                for field in self.fields[name] if f"{name}.{field}" in meta.get("nulls", ())
+            }
+            for name in DATASETS
+        }
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+    def column(self, name, field):
+        return self.columns[name][field]
+
+    def in_bounds(self, name, bounds=UTTARAKHAND_BOUNDS):
+        lats, lons = self.column(name, "latitude"), self.column(name, "longitude")
+        return np.flatnonzero(
+            (lats >= bounds["min_lat"]) & (lats <= bounds["max_lat"])
+            & (lons >= bounds["min_lon"]) & (lons <= bounds["max_lon"])
+        )
+
+    def within(self, name, lat, lon, radius_km, indices=None):
+        """``(indices, distances)`` of the rows (of ``indices``) within the radius."""
+        if indices is None:
+            indices = np.arange(self.counts[name])
+        distances = haversine_many(
+            lat, lon, self.column(name, "latitude")[indices], self.column(name, "longitude")[indices]
+        )
+        inside = distances <= radius_km
+        return indices[inside], distances[inside]
+
+    def newest_first(self, name, indices):
+        created = self.column(name, "created_at")[indices]
+        return indices[np.lexsort((self.column(name, "id")[indices], -created))]
+
+    def rows(self, name, indices):
+        """Rows as the model's API serializer would render them."""
+        nulls = self.nulls[name]
+        columns = [
+            (
+                field,
+                self.columns[name][field][indices].tolist(),
+                f"{name}.{field}" in self.datetimes,
+                nulls[field][indices].tolist() if field in nulls else None,
+            )
+            for field in self.fields[name]
+        ]
+
+        result = [{} for _ in range(len(indices))]
+        for field, values, is_datetime, is_null in columns:
+            for position, (row, value) in enumerate(zip(result, values)):
+                if is_datetime:
+                    value = _from_micros(value)
+                    value = None if value is None else _datetime_field.to_representation(value)
+                elif is_null is not None and is_null[position]:
+                    value = None
+                row[field] = value
+        return result
+
+
+class HotSnapshot:
+    """Per-process handle on the shared snapshot files."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.snapshot = None
+        self.build = None
+        self.requested = None  # (build, generation) a rebuild was last queued for
+
+    @property
+    def path(self):
+        path = getattr(settings, "HOT_SNAPSHOT_PATH", None)
+        return Path(path) if path else None
+
+    def invalidate(self):
+        """Bump the generation and queue a rebuild."""
+        path = self.path
+        if path is None:
+            return
+        path.mkdir(parents=True, exist_ok=True)
+        with open(path / "GENERATION", "a+") as fh:
+            if fcntl:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+            fh.seek(0)
+            generation = int(fh.read() or 0) + 1
+            fh.seek(0)
+            fh.truncate()
+            fh.write(str(generation))
+        self._queue_rebuild(generation)
+
+    def _queue_rebuild(self, generation):
+        # one job per generation: a build already running may have read the
+        # rows before this change
+        enqueue("hot_snapshot", key=self._job_key(generation), replace_finished=True)
+
+    @staticmethod
+    def _job_key(generation):
+        return f"hot-snapshot:{generation}"
+
+    def _overdue(self, current, generation):
+        """No worker took the rebuild and the served build is too old."""
+        max_age = getattr(settings, "HOT_SNAPSHOT_MAX_AGE", 60)
+        if max_age is None or time.time() - current["built_at"] <= max_age:
+            return False
+        waiting = Job.objects.filter(
+            key=self._job_key(generation), status="queued",
+            run_at__lt=django_timezone.now() - timedelta(seconds=JOB_GRACE_S),
+        )
+        return waiting.exists()
+
+    def _current(self):
+        try:
+            with open(self.path / "CURRENT") as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    def _generation(self):
+        try:
+            with open(self.path / "GENERATION") as fh:
+                return int(fh.read() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _needs_build(self, current):
+        if current is None or self._generation() > current.get("generation", -1):
+            return True
+        max_age = getattr(settings, "HOT_SNAPSHOT_MAX_AGE", 60)
+        return max_age is not None and time.time() - current["built_at"] > max_age
+
+    def _write(self, current):
+        """Build a new snapshot directory and point CURRENT at it."""
+        # read the generation before the rows so a change during the build
+        # leaves the new snapshot stale
+        generation = self._generation()
+        version = (current or {}).get("version", 0) + 1
+
+        arrays, fields, datetimes, nulls, counts = {}, {}, [], [], {}
+        for name, rows in DATASETS.items():
+            queryset = rows()
+            columns, null_masks = build_columns(queryset)
+            fields[name] = list(columns)
+            counts[name] = len(columns["id"])
+            datetimes += [
+                f"{name}.{field.attname}" for field in queryset.model._meta.concrete_fields
+                if isinstance(field, models.DateTimeField)
+            ]
+            nulls += [f"{name}.{field}" for field in null_masks]
+            arrays.update({f"{name}__{field}": column for field, column in columns.items()})
+            arrays.update({f"{name}__{field}__null": mask for field, mask in null_masks.items()})
+
+        # unique directory per build, so racing builders never write into
+        # files another worker has mapped
+        build = f"v{version}-{os.getpid()}-{time.time_ns()}"
+        save_arrays(
+            self.path / build,
+            meta={
+                "version": version, "fields": fields, "datetimes": datetimes,
+                "nulls": nulls, "counts": counts,
+            },
+            **arrays,
+        )
+
+        tmp = self.path / f"CURRENT.{os.getpid()}"
+        with open(tmp, "w") as fh:
+            json.dump({
+                "version": version, "build": build,
+                "built_at": time.time(), "generation": generation,
+            }, fh)
+        os.replace(tmp, self.path / "CURRENT")
+
+        # mapped files stay readable after unlink on POSIX; elsewhere the
+        # old build is left for a later cleanup
+        for old in self.path.glob("v*"):
+            if old.name not in (build, (current or {}).get("build")):
+                shutil.rmtree(old, ignore_errors=True)
+
+    def rebuild(self, force=False):
+        """Build a new snapshot if stale (or ``force``); returns CURRENT."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        with open(self.path / "LOCK", "w") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            # another worker may have finished the build while we waited
+            current = self._current()
+            if force or self._needs_build(current):
+                self._write(current)
+                current = self._current()
+        return current
+
+    def refresh(self):
+        """Attach to the latest build, queueing a rebuild if it is stale.
+
+        A stale build keeps being served until the job replaces it. The
+        first build ever is made here, and so is a rebuild the job queue
+        left waiting (see :meth:`_overdue`).
+        """
+        current = self._current()
+        if current is None:
+            current = self.rebuild()
+        elif self._needs_build(current):
+            requested = (current["build"], self._generation())
+            if requested != self.requested:
+                self._queue_rebuild(requested[1])
+                self.requested = requested
+            elif self._overdue(current, requested[1]):
+                current = self.rebuild()
+
+        if current["build"] != self.build:
+            meta, arrays = load_arrays(self.path / current["build"])
+            self.snapshot = Snapshot(current["version"], meta, arrays)
+            self.build = current["build"]
+        return self.snapshot
+
+    def get(self):
+        """The current snapshot, or None when disabled via HOT_SNAPSHOT_PATH."""
+        if self.path is None:
+            return None
+        with self.lock:
+            return self.refresh()
+
+
+hot_snapshot = HotSnapshot()
+
+
+def rebuild_job():
+    """Job handler: rebuild the snapshot unless another job already did."""
+    current = hot_snapshot.rebuild()
+    return {"version": current["version"], "generation": current["generation"]}
+
+
+# ---------------------------------------------------------------------------
+# endpoint helpers
+# ---------------------------------------------------------------------------
+
+def snapshot_list(name, params, newest_first=True):
+    """Rows for a map list endpoint, or None to let the viewset answer.
+
+    That is when the snapshot is disabled, a default paginator is set, or
+    the request carries parameters beyond ``SNAPSHOT_PARAMS``.
+
+    Mirrors the viewsets' querysets: rows inside Uttarakhand, narrowed by
+    ``lat``/``lon``/``radius`` to a circle ordered closest first with
+    ``ordering=distance``; otherwise rows come back newest first, or by id
+    without ``newest_first``.
+    """
+    if api_settings.DEFAULT_PAGINATION_CLASS or not set(params) <= SNAPSHOT_PARAMS:
+        return None
+    snapshot = hot_snapshot.get()
+    if snapshot is None:
+        return None
+
+    indices = snapshot.in_bounds(name)
+    try:
+        lat = float(params.get("lat"))
+        lon = float(params.get("lon"))
+        radius_km = float(params.get("radius", 10))
+    except (TypeError, ValueError):
+        if newest_first:
+            indices = snapshot.newest_first(name, indices)
+        return snapshot.rows(name, indices)
+
+    indices, distances = snapshot.within(name, lat, lon, radius_km, indices)
+    if params.get("ordering") == "distance":
+        indices = indices[np.lexsort((snapshot.column(name, "id")[indices], distances))]
+    elif newest_first:
+        indices = snapshot.newest_first(name, indices)
+    return snapshot.rows(name, indices)
@@ -0,0 +1,187 @@
+import os
+import random
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from apps.core.models import Job
+
+
+# ---------------------------------------------------------------------------
+# database-backed job queue
+#
+# Slow side effects (SMTP, OSRM, alert fan-out) are written to the Job table
+# inside the caller's transaction and picked up by `manage.py run_jobs`
+# workers once it commits, so a rolled back request leaves no job behind.
+# Workers claim a job with a conditional UPDATE, which works on SQLite
+# without row locks; failures are retried with exponential backoff and a
+# job whose worker died is reclaimed after JOB_LOCK_TIMEOUT.
+#
+# A job may carry an idempotency ``key``: enqueueing the same key again
+# returns the existing job instead of adding another one.
+# ---------------------------------------------------------------------------
+
+# kind -> handler, called with the payload as keyword arguments
+JOB_HANDLERS = {
+    "send_mail": "apps.core.services.job_queue.send_mail_job",
+    "user_alerts": "apps.core.services.alert_service.user_alerts_job",
+    "alert_fan_out": "apps.core.services.alert_service.fan_out_job",
+    "evacuation_plan": "apps.core.services.evacuation_service.evacuation_plan_job",
+    "evacuation_plans": "apps.core.services.evacuation_service.precompute_plans_job",
+    "evacuation_zones": "apps.core.services.zone_service.zones_job",
+    "hot_snapshot": "apps.core.services.hot_snapshot.rebuild_job",
+    "location_flush": "apps.core.services.location_gate.flush_job",
+}
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue(kind, payload=None, key=None, delay=0, max_attempts=None, replace_finished=False):
+    """Add a job (or return the one already queued under ``key``).
+
+    With ``replace_finished`` a done or failed job under ``key`` is queued
+    again instead, so the key only dedupes jobs still pending.
+    """
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"unknown job kind: {kind}")
+
+    fields = {
+        "kind": kind,
+        "payload": payload or {},
+        "run_at": timezone.now() + timedelta(seconds=delay),
+        "max_attempts": max_attempts or getattr(settings, "JOB_MAX_ATTEMPTS", 5),
+    }
+    if key is None:
+        job = Job.objects.create(**fields)
+    else:
+        try:
+            with transaction.atomic():
+                job, created = Job.objects.get_or_create(key=key, defaults=fields)
+        except IntegrityError:
+            # another request created it between our lookup and insert
+            job, created = Job.objects.get(key=key), False
+        if not created:
+            if not (replace_finished and job.status in ("done", "failed")):
+                return job
+            requeued = Job.objects.filter(id=job.id, status=job.status).update(
+                status="queued", attempts=0, locked_by="", locked_at=None,
+                result=None, last_error="", finished_at=None, **fields,
+            )
+            job.refresh_from_db()
+            if not requeued:
+                return job  # someone else requeued it first
+
+    if getattr(settings, "JOB_QUEUE_EAGER", False):
+        # no workers (development): run it in this process after the commit
+        transaction.on_commit(lambda: run_next(job_id=job.id))
+    return job
+
+
+def _claimable(now):
+    stale = now - timedelta(seconds=getattr(settings, "JOB_LOCK_TIMEOUT", 300))
+    return Q(status="queued", run_at__lte=now) | Q(status="running", locked_at__lt=stale)
+
+
+def claim(worker, kinds=None, job_id=None):
+    """Lock the next due job for ``worker``; None if there is none."""
+    now = timezone.now()
+    due = Job.objects.filter(_claimable(now))
+    if kinds:
+        due = due.filter(kind__in=kinds)
+    if job_id is not None:
+        due = due.filter(id=job_id)
+
+    for candidate in due.order_by("run_at", "id").values_list("id", flat=True)[:10]:
+        # only one worker's UPDATE still matches the claimable condition
+        claimed = Job.objects.filter(_claimable(now), id=candidate).update(
+            status="running", locked_by=worker, locked_at=now, attempts=F("attempts") + 1,
+        )
+        if claimed:
+            return Job.objects.get(id=candidate)
+    return None
+
+
+def backoff(attempts):
+    """Seconds before retry number ``attempts``, with +-10% jitter."""
+    base = getattr(settings, "JOB_RETRY_BACKOFF", 5)
+    cap = getattr(settings, "JOB_RETRY_MAX_DELAY", 600)
+    return min(cap, base * 2 ** (attempts - 1)) * random.uniform(0.9, 1.1)
+
+
+def execute(job):
+    """Run a claimed job and record its outcome."""
+    try:
+        if job.attempts > job.max_attempts:
+            raise RuntimeError("worker lock timed out on the last attempt")
+        result = import_string(JOB_HANDLERS[job.kind])(**job.payload)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = "queued"
+            job.run_at = timezone.now() + timedelta(seconds=backoff(job.attempts))
+        else:
+            job.status = "failed"
+            job.finished_at = timezone.now()
+    else:
+        job.status = "done"
+        job.result = result
+        job.finished_at = timezone.now()
+
+    job.locked_by, job.locked_at = "", None
+    job.save(update_fields=[
+        "status", "run_at", "result", "last_error", "finished_at", "locked_by", "locked_at",
+    ])
+    return job
+
+
+def run_next(worker=None, kinds=None, job_id=None):
+    """Claim and execute one job; returns it, or None if nothing was due."""
+    job = claim(worker or worker_name(), kinds=kinds, job_id=job_id)
+    return execute(job) if job else None
+
+
+def work(worker=None, kinds=None, poll=1.0, once=False, should_stop=lambda: False):
+    """Worker loop: run due jobs, sleeping ``poll`` seconds when idle.
+
+    With ``once`` it returns as soon as no job is due. Returns the number
+    of jobs executed.
+    """
+    worker = worker or worker_name()
+    executed = 0
+    while not should_stop():
+        if run_next(worker, kinds) is not None:
+            executed += 1
+        elif once:
+            break
+        else:
+            time.sleep(poll)
+    return executed
+
+
+# ---------------------------------------------------------------------------
+# handlers that do not belong to another service
+# ---------------------------------------------------------------------------
+
+def send_mail_job(subject, message, recipient_list, from_email=None, escalation_log_id=None):
+    """Send one email; SMTP errors raise so the job is retried."""
+    send_mail(
+        subject=subject,
+        message=message,
+        from_email=from_email,
+        recipient_list=recipient_list,
+        fail_silently=False,
+    )
+    if escalation_log_id is not None:
+        from apps.disasters.models import EscalationLog
+        EscalationLog.objects.filter(id=escalation_log_id).update(email_sent=True)
+    return {"recipients": recipient_list}
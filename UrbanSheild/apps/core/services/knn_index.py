@@ -0,0 +1,221 @@
+import heapq
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Max
+
+from apps.authorities.models import Authority
+from apps.shelters.models import Shelter
+from apps.core.utils import haversine_many
+
+
+# ---------------------------------------------------------------------------
+# in-memory nearest-neighbour indexes
+#
+# Rows are placed on the unit sphere as (x, y, z) so that straight-line
+# (chord) distance orders them exactly like great-circle distance, which a
+# plain k-d tree can then search. Indexes are rebuilt lazily: model signals
+# mark them dirty (see ``apps.core.signals``) and, since signals only reach
+# the process that saved the row, every lookup first compares the table's
+# row count and latest ``updated_at`` with the ones the index was built
+# from. Queryset ``update()`` calls set neither, so indexes also expire
+# after ``KNN_INDEX_MAX_AGE`` seconds.
+# ---------------------------------------------------------------------------
+
+LEAF_SIZE = 32
+
+
+def unit_vectors(lats, lons):
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+class KDTree:
+    """Static k-d tree with leaf buckets over an ``(n, 3)`` point array.
+
+    Nodes are ``(start, end, dim, split, left, right)`` over a permutation
+    of the points; leaves have ``dim == -1``.
+    """
+
+    def __init__(self, points):
+        self.points = points
+        self.order = np.arange(len(points))
+        self.nodes = []
+        if len(points):
+            self._build(0, len(points))
+
+    def _build(self, start, end):
+        node = len(self.nodes)
+        self.nodes.append(None)
+
+        if end - start <= LEAF_SIZE:
+            self.nodes[node] = (start, end, -1, 0.0, -1, -1)
+            return node
+
+        indices = self.order[start:end]
+        coords = self.points[indices]
+        dim = int(np.ptp(coords, axis=0).argmax())
+        mid = (end - start) // 2
+
+        # left half <= split <= right half
+        self.order[start:end] = indices[np.argpartition(coords[:, dim], mid)]
+        split = float(self.points[self.order[start + mid], dim])
+
+        left = self._build(start, start + mid)
+        right = self._build(start + mid, end)
+        self.nodes[node] = (start, end, dim, split, left, right)
+        return node
+
+    def query(self, point, k):
+        """``[(squared chord, point index), ...]`` of the ``k`` nearest, closest first."""
+        if not self.nodes or k <= 0:
+            return []
+
+        best = []  # max-heap of (-squared distance, -index)
+
+        def visit(node):
+            start, end, dim, split, left, right = self.nodes[node]
+            if dim < 0:
+                indices = self.order[start:end]
+                squared = ((self.points[indices] - point) ** 2).sum(axis=1)
+                for dist, index in zip(squared.tolist(), indices.tolist()):
+                    if len(best) < k:
+                        heapq.heappush(best, (-dist, -index))
+                    elif (-dist, -index) > best[0]:
+                        heapq.heapreplace(best, (-dist, -index))
+                return
+
+            diff = float(point[dim]) - split
+            near, far = (left, right) if diff < 0 else (right, left)
+            visit(near)
+            if len(best) < k or diff * diff <= -best[0][0]:
+                visit(far)
+
+        visit(0)
+        return sorted((-dist, -index) for dist, index in best)
+
+
+class KNNIndex:
+    """Nearest rows of one model, optionally filtered by column values.
+
+    ``fields`` are the columns callers may filter on; one tree per distinct
+    filter is built on first use and dropped with the rest on rebuild.
+    """
+
+    def __init__(self, model, fields=()):
+        self.model = model
+        self.fields = tuple(fields)
+        self.lock = threading.Lock()
+        self.dirty = True
+        self.loaded_at = None
+        self.marker = None
+        self.ids = np.empty(0, dtype=np.int64)
+        self.lats = self.lons = np.empty(0)
+        self.columns = {}
+        self.trees = {}
+
+    def invalidate(self):
+        self.dirty = True
+
+    def is_stale(self):
+        if self.dirty or self.loaded_at is None:
+            return True
+        max_age = getattr(settings, "KNN_INDEX_MAX_AGE", 300)
+        return max_age is not None and time.monotonic() - self.loaded_at > max_age
+
+    def current_marker(self):
+        """``(row count, latest updated_at)`` of the table."""
+        marker = self.model.objects.aggregate(count=Count("id"), updated=Max("updated_at"))
+        return marker["count"], marker["updated"]
+
+    def load(self, marker=None):
+        # cleared first, so an invalidate() or a write racing the query
+        # below is seen on the next lookup
+        self.dirty = False
+        self.marker = marker or self.current_marker()
+        rows = list(self.model.objects.order_by("id").values_list("id", "latitude", "longitude", *self.fields))
+        columns = list(zip(*rows)) or [()] * (3 + len(self.fields))
+
+        self.ids = np.array(columns[0], dtype=np.int64)
+        self.lats = np.array(columns[1], dtype=np.float64)
+        self.lons = np.array(columns[2], dtype=np.float64)
+        self.columns = {
+            field: np.array(values, dtype=object)
+            for field, values in zip(self.fields, columns[3:])
+        }
+        self.trees = {}
+        self.loaded_at = time.monotonic()
+
+    def _tree(self, filters, bounds):
+        """``(tree, row positions)`` for the rows matching the filters."""
+        key = (tuple(sorted(filters.items())), tuple(sorted((bounds or {}).items())))
+        if key not in self.trees:
+            mask = np.ones(len(self.ids), dtype=bool)
+            for field, value in filters.items():
+                mask &= self.columns[field] == value
+            if bounds:
+                mask &= (
+                    (self.lats >= bounds["min_lat"]) & (self.lats <= bounds["max_lat"])
+                    & (self.lons >= bounds["min_lon"]) & (self.lons <= bounds["max_lon"])
+                )
+            positions = np.flatnonzero(mask)
+            self.trees[key] = (KDTree(unit_vectors(self.lats[positions], self.lons[positions])), positions)
+        return self.trees[key]
+
+    def query(self, lat, lon, k=1, bounds=None, **filters):
+        """``[(id, distance_km), ...]`` of the ``k`` nearest matching rows.
+
+        ``bounds`` takes a dict shaped like ``UTTARAKHAND_BOUNDS``. The
+        index is rebuilt first if the table's marker moved since the last
+        build.
+        """
+        marker = self.current_marker()
+        with self.lock:
+            if self.is_stale() or marker != self.marker:
+                self.load(marker)
+            tree, positions = self._tree(filters, bounds)
+            found = positions[[index for _, index in tree.query(unit_vectors([lat], [lon])[0], k)]]
+            ids, lats, lons = self.ids[found], self.lats[found], self.lons[found]
+
+        distances = haversine_many(lat, lon, lats, lons)
+        return list(zip(ids.tolist(), distances.tolist()))
+
+    def nearest(self, lat, lon, k=1, bounds=None, **filters):
+        """Model instances of :meth:`query`, closest first, with ``distance_km``.
+
+        Rows added, edited or deleted by any process are picked up before
+        the tree is asked (see :meth:`query`). The rows found are fetched
+        with the filters and bounds applied once more; if one no longer
+        matches (a queryset ``update()`` changes no marker), the index is
+        reloaded and asked again, so the answer still has ``k`` current
+        rows.
+        """
+        matches = self.query(lat, lon, k, bounds, **filters)
+        objects = self._current(matches, bounds, filters)
+        if len(objects) < len(matches):
+            self.invalidate()
+            matches = self.query(lat, lon, k, bounds, **filters)
+            objects = self._current(matches, bounds, filters)
+
+        results = []
+        for pk, distance_km in matches:
+            if pk in objects:
+                objects[pk].distance_km = distance_km
+                results.append(objects[pk])
+        return results
+
+    def _current(self, matches, bounds, filters):
+        queryset = self.model.objects.filter(**filters)
+        if bounds:
+            queryset = queryset.filter(
+                latitude__gte=bounds["min_lat"], latitude__lte=bounds["max_lat"],
+                longitude__gte=bounds["min_lon"], longitude__lte=bounds["max_lon"],
+            )
+        return queryset.in_bulk([pk for pk, _ in matches])
+
+
+shelter_index = KNNIndex(Shelter, fields=("is_active",))
+authority_index = KNNIndex(Authority, fields=("authority_type",))
@@ -0,0 +1,208 @@
+import math
+import threading
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.core.models import UserLocation
+from apps.core.utils import geohash_encode, haversine
+from apps.core.services.job_queue import enqueue
+
+
+# ---------------------------------------------------------------------------
+# GPS update gating
+#
+# Phones post a fix every few seconds, mostly from where they were a moment
+# ago. A fix is only written at once when the user's last write is older
+# than LOCATION_WRITE_WINDOW_S; later fixes in the window are held back and
+# the newest of them is kept in the row's ``held_*`` columns and written by
+# a ``location_flush`` job when the window closes (a burst of fixes becomes
+# a leading and a trailing write, ending on the latest position). The
+# trailing write only applies if no newer fix was stored meanwhile. Alerts
+# are only re-evaluated once the user has both moved
+# LOCATION_EVAL_MIN_DISTANCE_M from where they were last evaluated and
+# LOCATION_EVAL_MIN_INTERVAL_S has passed. New disasters reach stationary
+# users through the alert fan-out instead.
+# ---------------------------------------------------------------------------
+
+class LocationGate:
+    """Per-process decisions and counters for incoming GPS fixes."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {
+            "fixes": 0,
+            "writes": 0,
+            "coalesced": 0,
+            "trailing_writes": 0,
+            "evaluations": 0,
+            "skipped_not_moved": 0,
+            "skipped_too_soon": 0,
+        }
+
+    def check(self, location, lat, lon, now):
+        """``(write, evaluate)`` for a fix at ``(lat, lon)``.
+
+        ``location`` is the user's stored UserLocation, or None.
+        """
+        window = getattr(settings, "LOCATION_WRITE_WINDOW_S", 5)
+        min_distance_m = getattr(settings, "LOCATION_EVAL_MIN_DISTANCE_M", 100)
+        min_interval = getattr(settings, "LOCATION_EVAL_MIN_INTERVAL_S", 30)
+
+        write = evaluate = True
+        skipped = None
+        if location is not None and location.is_active:
+            write = (now - location.last_updated).total_seconds() >= window
+
+            if location.alerts_checked_at is not None:
+                moved_m = 1000 * haversine(
+                    location.alerts_checked_latitude, location.alerts_checked_longitude, lat, lon
+                )
+                if moved_m < min_distance_m:
+                    evaluate, skipped = False, "skipped_not_moved"
+                elif (now - location.alerts_checked_at).total_seconds() < min_interval:
+                    evaluate, skipped = False, "skipped_too_soon"
+
+        # an evaluation is recorded on the row, so it always writes
+        write = write or evaluate
+
+        with self.lock:
+            self.counters["fixes"] += 1
+            self.counters["writes" if write else "coalesced"] += 1
+            self.counters["evaluations" if evaluate else skipped] += 1
+        return write, evaluate
+
+    def defer(self, location, lat, lon, accuracy, fix_time):
+        """Hold a fix ``check`` did not write for the trailing write.
+
+        Only the newest held fix of a user is kept on the row; a
+        ``location_flush`` job writes it once the window that started at
+        ``location.last_updated`` has closed.
+        """
+        held = UserLocation.objects.filter(
+            Q(held_fix_time__isnull=True) | Q(held_fix_time__lt=fix_time), pk=location.pk,
+        ).update(held_latitude=lat, held_longitude=lon, held_accuracy=accuracy, held_fix_time=fix_time)
+        if not held:
+            return  # a newer fix is held already
+
+        # one job per second of closing windows, shared by every user in it
+        window = getattr(settings, "LOCATION_WRITE_WINDOW_S", 5)
+        run_at = math.ceil((location.last_updated + timedelta(seconds=window)).timestamp())
+        enqueue(
+            "location_flush", key=f"location-flush:{run_at}",
+            delay=max(run_at - timezone.now().timestamp(), 0),
+        )
+
+    def flush(self, now=None):
+        """Write the held fixes whose window has closed."""
+        now = now or timezone.now()
+        window = getattr(settings, "LOCATION_WRITE_WINDOW_S", 5)
+        due = UserLocation.objects.filter(
+            held_fix_time__isnull=False, last_updated__lte=now - timedelta(seconds=window),
+        ).values_list("user_id", "held_latitude", "held_longitude", "held_accuracy", "held_fix_time")
+        written = store_trailing({user_id: fix for user_id, *fix in due}, now)
+
+        with self.lock:
+            self.counters["trailing_writes"] += written
+        return written
+
+    def coalesce(self, count):
+        """Count fixes dropped before reaching ``check`` (older batch points)."""
+        with self.lock:
+            self.counters["fixes"] += count
+            self.counters["coalesced"] += count
+
+    def stats(self):
+        with self.lock:
+            fixes = self.counters["fixes"]
+            return {
+                **self.counters,
+                "evaluation_rate": round(self.counters["evaluations"] / fixes, 3) if fixes else None,
+            }
+
+
+location_gate = LocationGate()
+
+
+def flush_job():
+    """Job handler: store the held fixes that are due."""
+    return {"written": location_gate.flush()}
+
+
+def store_fixes(fixes, now):
+    """Write the newest fix of many users with one upsert.
+
+    ``fixes`` maps user ids to ``(lat, lon, accuracy, timestamp)``. A fix
+    not newer than the stored one's ``fix_time`` is dropped as stale (both
+    are fix times; ``last_updated`` is the server's write time), the rest go
+    through the gate like single updates. Returns the counts and the
+    ``(user_id, lat, lon)`` whose alerts should be re-checked.
+    """
+    stored = {
+        location.user_id: location
+        for location in UserLocation.objects.filter(user_id__in=list(fixes))
+    }
+    rows, evaluated = [], []
+    stats = {"written": 0, "stale": 0}
+
+    for user_id, (lat, lon, accuracy, timestamp) in fixes.items():
+        location = stored.get(user_id)
+        if location is not None and location.fix_time is not None and timestamp <= location.fix_time:
+            stats["stale"] += 1
+            continue
+        write, evaluate = location_gate.check(location, lat, lon, now)
+        if not write:
+            transaction.on_commit(partial(location_gate.defer, location, lat, lon, accuracy, timestamp))
+            continue
+
+        # bulk writes skip pre_save, so the geohash is set here
+        row = UserLocation(
+            user_id=user_id, latitude=lat, longitude=lon, geohash=geohash_encode(lat, lon),
+            accuracy=accuracy, is_active=True, last_updated=now, fix_time=timestamp,
+        )
+        if evaluate:
+            row.alerts_checked_at, row.alerts_checked_latitude, row.alerts_checked_longitude = now, lat, lon
+            evaluated.append((user_id, lat, lon))
+        elif location is not None:
+            row.alerts_checked_at = location.alerts_checked_at
+            row.alerts_checked_latitude = location.alerts_checked_latitude
+            row.alerts_checked_longitude = location.alerts_checked_longitude
+        rows.append(row)
+
+    UserLocation.objects.bulk_create(
+        rows,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=["user"],
+        update_fields=[
+            "latitude", "longitude", "geohash", "accuracy", "is_active", "last_updated", "fix_time",
+            "alerts_checked_at", "alerts_checked_latitude", "alerts_checked_longitude",
+        ],
+    )
+    stats["written"] = len(rows)
+    return stats, evaluated
+
+
+def store_trailing(fixes, now):
+    """Write held fixes, each unless a newer one is already stored.
+
+    ``fixes`` maps user ids to their held ``(lat, lon, accuracy,
+    fix_time)``; a row holding a newer fix by now is left for its own
+    window. Returns the number of rows written.
+    """
+    released = {"held_latitude": None, "held_longitude": None, "held_accuracy": None, "held_fix_time": None}
+    written = 0
+    for user_id, (lat, lon, accuracy, fix_time) in fixes.items():
+        held = UserLocation.objects.filter(user_id=user_id, held_fix_time=fix_time)
+        # update() skips pre_save and auto_now, so both are set here
+        written += held.filter(Q(fix_time__isnull=True) | Q(fix_time__lt=fix_time)).update(
+            latitude=lat, longitude=lon, geohash=geohash_encode(lat, lon), accuracy=accuracy,
+            is_active=True, last_updated=now, fix_time=fix_time, **released,
+        )
+        # a newer fix was written meanwhile; the held one is stale
+        held.update(**released)
+    return written
@@ -0,0 +1,109 @@
+import threading
+from collections import OrderedDict
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# ---------------------------------------------------------------------------
+# OSRM geometry client
+#
+# One pooled keep-alive session per process, a cap on in-flight requests and
+# an LRU cache of geometries keyed on the rounded waypoint list. Point
+# OSRM_BASE_URL at a local OSRM container (or `manage.py run_fake_osrm`) to
+# stop depending on the public demo server.
+# ---------------------------------------------------------------------------
+
+class OSRMClient:
+
+    def __init__(self):
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(getattr(settings, "OSRM_MAX_CONCURRENCY", 8))
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return getattr(settings, "OSRM_BASE_URL", "http://router.project-osrm.org").rstrip("/")
+
+    @property
+    def session(self):
+        with self._session_lock:
+            if self._session is None:
+                retry = Retry(
+                    total=getattr(settings, "OSRM_RETRIES", 2),
+                    backoff_factor=0.3,
+                    status_forcelist=(429, 500, 502, 503, 504),
+                    allowed_methods=("GET",),
+                )
+                pool_size = getattr(settings, "OSRM_MAX_CONCURRENCY", 8)
+                adapter = HTTPAdapter(
+                    pool_connections=1, pool_maxsize=pool_size, max_retries=retry
+                )
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = session
+            return self._session
+
+    def _cache_key(self, coords):
+        precision = getattr(settings, "OSRM_CACHE_PRECISION", 5)
+        return tuple((round(lat, precision), round(lon, precision)) for lat, lon in coords)
+
+    def route_geometry(self, coords):
+        """GeoJSON geometry through ``coords`` ([(lat, lon), ...]) or None."""
+        key = self._cache_key(coords)
+
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        geometry = self._fetch(key)
+
+        if geometry is not None:
+            with self._cache_lock:
+                self._cache[key] = geometry
+                self._cache.move_to_end(key)
+                while len(self._cache) > getattr(settings, "OSRM_CACHE_SIZE", 2048):
+                    self._cache.popitem(last=False)
+
+        return geometry
+
+    def _fetch(self, coords):
+        coord_string = ";".join(
+            [f"{lon},{lat}" for lat, lon in coords]
+        )
+
+        url = f"{self.base_url}/route/v1/driving/{coord_string}"
+
+        params = {
+            "overview": "full",
+            "geometries": "geojson"
+        }
+
+        with self._slots:
+            try:
+                response = self.session.get(
+                    url, params=params, timeout=getattr(settings, "OSRM_TIMEOUT", 10)
+                )
+            except requests.exceptions.RequestException:
+                return None
+
+        if response.status_code != 200:
+            return None
+
+        try:
+            return response.json()["routes"][0]["geometry"]
+        except (ValueError, KeyError, IndexError):
+            return None
+
+    def clear_cache(self):
+        with self._cache_lock:
+            self._cache.clear()
+
+
+osrm_client = OSRMClient()
@@ -0,0 +1,702 @@
+import bz2
+import gzip
+import heapq
+import math
+import threading
+import xml.etree.ElementTree as ET
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+
+from apps.core.utils import haversine, UTTARAKHAND_BOUNDS
+from apps.core.services.csr_graph import save_arrays, load_arrays
+
+
+# ---------------------------------------------------------------------------
+# offline road network
+#
+# ``import_road_network`` turns a local OSM extract into a compact junction
+# graph and preprocesses it into a customizable contraction hierarchy (CCH):
+# the contraction order and shortcut set do not depend on edge weights, so
+# traffic and disaster penalties are applied by re-running the cheap
+# customization step instead of contracting the graph again.
+#
+# The network is stored as flat CSR arrays (see ``csr_graph``) that every
+# worker memory-maps read-only, so one copy is shared through the page cache.
+# ---------------------------------------------------------------------------
+
+FORMAT_VERSION = 2
+
+INF = float("inf")
+
+# rough travel speeds (km/h) for the OSM highway classes we route on; hill
+# roads in Uttarakhand rarely allow more
+HIGHWAY_SPEEDS = {
+    "motorway": 80,
+    "motorway_link": 50,
+    "trunk": 60,
+    "trunk_link": 40,
+    "primary": 50,
+    "primary_link": 35,
+    "secondary": 40,
+    "secondary_link": 30,
+    "tertiary": 30,
+    "tertiary_link": 25,
+    "unclassified": 25,
+    "residential": 20,
+    "living_street": 10,
+    "service": 15,
+    "road": 20,
+    "track": 10,
+}
+
+# grid cell size in degrees used to snap coordinates onto road vertices
+SNAP_CELL = 0.01
+
+
+def _open_extract(path):
+    path = str(path)
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def _way_direction(tags):
+    """1 = forward only, -1 = backward only, 0 = both ways."""
+    oneway = tags.get("oneway")
+    if oneway in ("yes", "true", "1"):
+        return 1
+    if oneway == "-1":
+        return -1
+    if oneway == "no":
+        return 0
+    if tags.get("highway") == "motorway" or tags.get("junction") == "roundabout":
+        return 1
+    return 0
+
+
+def parse_osm(path, bounds=UTTARAKHAND_BOUNDS):
+    """Read routable ways and their node coordinates from an OSM XML file.
+
+    The file is streamed twice so only nodes referenced by roads are kept in
+    memory. Nodes outside ``bounds`` are dropped. Returns ``(coords, ways)``
+    where ``ways`` holds ``(node_refs, speed_kmh, direction)`` tuples.
+    """
+    ways = []
+    wanted = set()
+
+    with _open_extract(path) as fh:
+        for _, elem in ET.iterparse(fh, events=("end",)):
+            if elem.tag == "way":
+                tags = {tag.get("k"): tag.get("v") for tag in elem.iter("tag")}
+                highway = tags.get("highway")
+                if highway in HIGHWAY_SPEEDS and tags.get("access") not in ("no", "private"):
+                    refs = [int(nd.get("ref")) for nd in elem.iter("nd")]
+                    ways.append((refs, HIGHWAY_SPEEDS[highway], _way_direction(tags)))
+                    wanted.update(refs)
+                elem.clear()
+            elif elem.tag in ("node", "relation"):
+                elem.clear()
+
+    coords = {}
+    with _open_extract(path) as fh:
+        for _, elem in ET.iterparse(fh, events=("end",)):
+            if elem.tag == "node":
+                node_id = int(elem.get("id"))
+                if node_id in wanted:
+                    lat = float(elem.get("lat"))
+                    lon = float(elem.get("lon"))
+                    if (bounds["min_lat"] <= lat <= bounds["max_lat"]
+                            and bounds["min_lon"] <= lon <= bounds["max_lon"]):
+                        coords[node_id] = (lat, lon)
+            elem.clear()
+
+    return coords, ways
+
+
+def build_junction_graph(coords, ways):
+    """Collapse ways into edges between junctions and dead ends.
+
+    Interior way nodes only carry geometry, which keeps the routing graph
+    several times smaller than the raw OSM node set. Returns
+    ``(vertex_coords, edges, geometries)``; each edge is
+    ``(u, v, forward_seconds, backward_seconds)`` and ``geometries[i]`` lists
+    the intermediate coordinates of edge ``i`` from ``u`` to ``v``.
+    """
+    # split ways wherever they leave the extract
+    segments = []
+    for refs, speed, direction in ways:
+        current = []
+        for ref in refs:
+            if ref in coords:
+                current.append(ref)
+            else:
+                if len(current) > 1:
+                    segments.append((current, speed, direction))
+                current = []
+        if len(current) > 1:
+            segments.append((current, speed, direction))
+
+    usage = Counter()
+    for refs, _, _ in segments:
+        usage.update(refs)
+        usage[refs[0]] += 1
+        usage[refs[-1]] += 1
+
+    vertex_of = {}
+    vertex_coords = []
+    for ref, count in usage.items():
+        if count > 1:
+            vertex_of[ref] = len(vertex_coords)
+            vertex_coords.append(coords[ref])
+
+    edges = []
+    geometries = []
+    for refs, speed, direction in segments:
+        start = refs[0]
+        length_km = 0.0
+        geometry = []
+
+        for prev, ref in zip(refs, refs[1:]):
+            length_km += haversine(*coords[prev], *coords[ref])
+            if ref not in vertex_of:
+                geometry.append(coords[ref])
+                continue
+
+            if ref != start:
+                seconds = length_km / speed * 3600
+                edges.append((
+                    vertex_of[start],
+                    vertex_of[ref],
+                    seconds if direction >= 0 else INF,
+                    seconds if direction <= 0 else INF,
+                ))
+                geometries.append(geometry)
+
+            start = ref
+            length_km = 0.0
+            geometry = []
+
+    return vertex_coords, edges, geometries
+
+
+def contract(vertex_count, edges):
+    """Metric-independent contraction by greedy minimum degree.
+
+    Every fill-in shortcut is kept (no witness search), which is what makes
+    the hierarchy valid for any edge weights. Returns ``(order, up)`` where
+    ``up[v]`` lists the neighbours of ``v`` that are contracted after it.
+    """
+    adjacency = [set() for _ in range(vertex_count)]
+    for u, v, _, _ in edges:
+        if u != v:
+            adjacency[u].add(v)
+            adjacency[v].add(u)
+
+    heap = [(len(adjacency[v]), v) for v in range(vertex_count)]
+    heapq.heapify(heap)
+
+    contracted = [False] * vertex_count
+    order = []
+    up = [None] * vertex_count
+
+    while heap:
+        degree, v = heapq.heappop(heap)
+        if contracted[v] or degree != len(adjacency[v]):
+            continue
+
+        contracted[v] = True
+        order.append(v)
+        neighbours = list(adjacency[v])
+        up[v] = neighbours
+        adjacency[v] = set()
+
+        for a in neighbours:
+            adjacency[a].discard(v)
+        for i, a in enumerate(neighbours):
+            for b in neighbours[i + 1:]:
+                adjacency[a].add(b)
+                adjacency[b].add(a)
+        for a in neighbours:
+            heapq.heappush(heap, (len(adjacency[a]), a))
+
+    return order, up
+
+
+# snap grid cells are packed into one sortable int64 key
+SNAP_KEY_STRIDE = 1 << 32
+
+
+def _snap_key(cx, cy):
+    return cx * SNAP_KEY_STRIDE + cy
+
+
+def _group_csr(keys, values, count):
+    """CSR offsets/values grouping ``values`` by integer ``keys < count``."""
+    order = np.argsort(keys, kind="stable")
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=count), out=offsets[1:])
+    return offsets, values[order]
+
+
+def preprocess(vertex_coords, edges, geometries):
+    """Contract the junction graph and flatten everything into arrays."""
+    vertex_count = len(vertex_coords)
+    order, up = contract(vertex_count, edges)
+
+    rank = np.empty(vertex_count, dtype=np.int32)
+    rank[order] = np.arange(vertex_count, dtype=np.int32)
+
+    # upward arcs in CSR form; an arc id is its position in up_targets
+    up_offsets = np.zeros(vertex_count + 1, dtype=np.int64)
+    np.cumsum([len(higher) for higher in up], out=up_offsets[1:])
+    up_targets = np.fromiter(
+        (a for higher in up for a in higher), dtype=np.int32, count=int(up_offsets[-1])
+    )
+    arc_index = {}
+    for v, higher in enumerate(up):
+        for offset, a in enumerate(higher):
+            arc_index[(v, a)] = int(up_offsets[v]) + offset
+
+    edge_u = np.array([e[0] for e in edges], dtype=np.int32)
+    edge_v = np.array([e[1] for e in edges], dtype=np.int32)
+    edge_arc = np.array([
+        arc_index[(u, v)] if rank[u] < rank[v] else arc_index[(v, u)]
+        for u, v, _, _ in edges
+    ], dtype=np.int64)
+
+    # customization triangles: arc a->b can be improved through v, reading
+    # the weights of a->v and v->b. Weights live in one flat array where slot
+    # 2 * arc is the upward direction and 2 * arc + 1 the downward one.
+    # Triangles are grouped by elimination level so that each group only
+    # reads weights finished by earlier groups.
+    level = [0] * vertex_count
+    for v in order:
+        for a in up[v]:
+            level[a] = max(level[a], level[v] + 1)
+
+    triangles = {}
+    for v in order:
+        bucket = triangles.setdefault(level[v], ([], [], [], []))
+        for a in up[v]:
+            arc_av = arc_index[(v, a)]
+            for b in up[v]:
+                if a == b:
+                    continue
+                arc_vb = arc_index[(v, b)]
+                if rank[a] < rank[b]:
+                    write = 2 * arc_index[(a, b)]
+                else:
+                    write = 2 * arc_index[(b, a)] + 1
+                bucket[0].append(2 * arc_av + 1)
+                bucket[1].append(2 * arc_vb)
+                bucket[2].append(write)
+                bucket[3].append(v)
+
+    levels = sorted(triangles)
+    level_offsets = np.zeros(len(levels) + 1, dtype=np.int64)
+    np.cumsum([len(triangles[lv][0]) for lv in levels], out=level_offsets[1:])
+
+    def _column(i, dtype):
+        return np.fromiter(
+            (x for lv in levels for x in triangles[lv][i]), dtype=dtype, count=int(level_offsets[-1])
+        )
+
+    vertex_lat = np.array([c[0] for c in vertex_coords], dtype=np.float64)
+    vertex_lon = np.array([c[1] for c in vertex_coords], dtype=np.float64)
+
+    geometry_offsets = np.zeros(len(edges) + 1, dtype=np.int64)
+    np.cumsum([len(g) for g in geometries], out=geometry_offsets[1:])
+
+    vertex_edge_offsets, vertex_edge_ids = _group_csr(
+        np.concatenate([edge_u, edge_v]),
+        np.tile(np.arange(len(edges), dtype=np.int32), 2),
+        vertex_count,
+    )
+
+    keys = _snap_key(
+        np.floor(vertex_lat / SNAP_CELL).astype(np.int64),
+        np.floor(vertex_lon / SNAP_CELL).astype(np.int64),
+    )
+    snap_order = np.argsort(keys, kind="stable")
+    snap_keys, snap_counts = np.unique(keys[snap_order], return_counts=True)
+    snap_offsets = np.zeros(len(snap_keys) + 1, dtype=np.int64)
+    np.cumsum(snap_counts, out=snap_offsets[1:])
+
+    return {
+        "vertex_lat": vertex_lat,
+        "vertex_lon": vertex_lon,
+        "edge_u": edge_u,
+        "edge_v": edge_v,
+        "edge_forward": np.array([e[2] for e in edges], dtype=np.float64),
+        "edge_backward": np.array([e[3] for e in edges], dtype=np.float64),
+        "edge_arc": edge_arc,
+        "geometry_offsets": geometry_offsets,
+        "geometry_lat": np.array([c[0] for g in geometries for c in g], dtype=np.float64),
+        "geometry_lon": np.array([c[1] for g in geometries for c in g], dtype=np.float64),
+        "order": np.array(order, dtype=np.int32),
+        "rank": rank,
+        "up_offsets": up_offsets,
+        "up_targets": up_targets,
+        "tri_in": _column(0, np.int64),
+        "tri_out": _column(1, np.int64),
+        "tri_write": _column(2, np.int64),
+        "tri_via": _column(3, np.int64),
+        "level_offsets": level_offsets,
+        "vertex_edge_offsets": vertex_edge_offsets,
+        "vertex_edge_ids": vertex_edge_ids,
+        "snap_keys": snap_keys,
+        "snap_offsets": snap_offsets,
+        "snap_vertices": snap_order.astype(np.int32),
+    }
+
+
+def save_network(arrays, path):
+    save_arrays(path, meta={"kind": "road_network", "format": FORMAT_VERSION}, **arrays)
+
+
+def load_network(path, mmap=True):
+    meta, arrays = load_arrays(path, mmap=mmap)
+    if meta.get("kind") != "road_network" or meta.get("format") != FORMAT_VERSION:
+        raise ValueError(f"{path} was written by an incompatible road network importer")
+    return RoadNetwork(arrays)
+
+
+def _relax(weight, via, slots, values, vias):
+    """``weight[slot] = min(weight[slot], value)`` with duplicate slots."""
+    order = np.lexsort((values, slots))
+    slots, values, vias = slots[order], values[order], vias[order]
+    first = np.ones(len(slots), dtype=bool)
+    first[1:] = slots[1:] != slots[:-1]
+    slots, values, vias = slots[first], values[first], vias[first]
+
+    better = values < weight[slots]
+    weight[slots[better]] = values[better]
+    via[slots[better]] = vias[better]
+
+
+class Metric:
+    """Customized CCH weights for one set of traffic/disaster penalties.
+
+    ``weight[2 * arc]`` is the cost of ``arc`` from its lower to its higher
+    ranked end and ``weight[2 * arc + 1]`` the opposite direction. The
+    matching ``via`` entry is the middle vertex of a shortcut, or ``~i``
+    when the weight comes straight from base edge ``i``.
+    """
+
+    def __init__(self, weight, via):
+        self.weight = weight
+        self.via = via
+        self.up_weight = weight[0::2]
+        self.down_weight = weight[1::2]
+
+
+class RoadNetwork:
+    """Query side of an imported road network; all arrays may be mmaps."""
+
+    def __init__(self, arrays):
+        self.vertex_lat = arrays["vertex_lat"]
+        self.vertex_lon = arrays["vertex_lon"]
+        self.edge_u = arrays["edge_u"]
+        self.edge_v = arrays["edge_v"]
+        self.edge_forward = arrays["edge_forward"]
+        self.edge_backward = arrays["edge_backward"]
+        self.edge_arc = arrays["edge_arc"]
+        self.geometry_offsets = arrays["geometry_offsets"]
+        self.geometry_lat = arrays["geometry_lat"]
+        self.geometry_lon = arrays["geometry_lon"]
+        self.rank = arrays["rank"]
+        self.up_offsets = arrays["up_offsets"]
+        self.up_targets = arrays["up_targets"]
+        self.tri_in = arrays["tri_in"]
+        self.tri_out = arrays["tri_out"]
+        self.tri_write = arrays["tri_write"]
+        self.tri_via = arrays["tri_via"]
+        self.level_offsets = arrays["level_offsets"]
+        self.vertex_edge_offsets = arrays["vertex_edge_offsets"]
+        self.vertex_edge_ids = arrays["vertex_edge_ids"]
+        self.snap_keys = arrays["snap_keys"]
+        self.snap_offsets = arrays["snap_offsets"]
+        self.snap_vertices = arrays["snap_vertices"]
+
+        self._metric = None
+        self._metric_version = None
+        self._metric_lock = threading.Lock()
+
+    def vertex_coord(self, v):
+        return (float(self.vertex_lat[v]), float(self.vertex_lon[v]))
+
+    def _row(self, offsets, values, i):
+        return values[int(offsets[i]):int(offsets[i + 1])].tolist()
+
+    # -- spatial lookups ---------------------------------------------------
+
+    def _cell_vertices(self, cx, cy):
+        key = _snap_key(cx, cy)
+        i = int(np.searchsorted(self.snap_keys, key))
+        if i < len(self.snap_keys) and self.snap_keys[i] == key:
+            return self._row(self.snap_offsets, self.snap_vertices, i)
+        return ()
+
+    def _ring_vertices(self, lat, lon, ring):
+        cx = math.floor(lat / SNAP_CELL)
+        cy = math.floor(lon / SNAP_CELL)
+        for dx in range(-ring, ring + 1):
+            for dy in range(-ring, ring + 1):
+                if max(abs(dx), abs(dy)) == ring:
+                    yield from self._cell_vertices(cx + dx, cy + dy)
+
+    def nearest_vertex(self, lat, lon, max_rings=20):
+        """Snap a coordinate onto the closest road vertex, or ``None``."""
+        best = None
+        best_distance = INF
+        found_at = None
+
+        for ring in range(max_rings + 1):
+            for v in self._ring_vertices(lat, lon, ring):
+                d = haversine(lat, lon, *self.vertex_coord(v))
+                if d < best_distance:
+                    best, best_distance = v, d
+            if best is not None:
+                # one extra ring catches vertices just across a cell border
+                if found_at is not None:
+                    break
+                found_at = ring
+
+        return best
+
+    def vertices_within(self, lat, lon, radius_km):
+        rings = math.ceil(radius_km / (111.0 * SNAP_CELL)) + 1
+        for ring in range(rings + 1):
+            for v in self._ring_vertices(lat, lon, ring):
+                if haversine(lat, lon, *self.vertex_coord(v)) <= radius_km:
+                    yield v
+
+    # -- customization -----------------------------------------------------
+
+    def overlay_penalties(self, routing_graph):
+        """Per-edge ``(factor, extra_seconds)`` from traffic and disasters.
+
+        Congestion slows every edge touching a vertex near the incident;
+        blocked roads and active disasters add a large fixed delay so routes
+        only pass through them when nothing else connects.
+        """
+        traffic_radius = getattr(settings, "ROAD_OVERLAY_TRAFFIC_RADIUS_KM", 0.5)
+        blocked_penalty = getattr(settings, "ROAD_OVERLAY_BLOCKED_PENALTY_S", 3600)
+
+        penalties = {}
+        for node in routing_graph.nodes.values():
+            lat, lon = node["coord"]
+            if node["type"] == "disaster":
+                radius = max(1, node["congestion"] / 2)
+                factor = 1.0
+            else:
+                radius = traffic_radius
+                factor = 1 + node["congestion"] / 10
+
+            for v in self.vertices_within(lat, lon, radius):
+                for i in self._row(self.vertex_edge_offsets, self.vertex_edge_ids, v):
+                    current = penalties.get(i, (1.0, 0.0))
+                    penalties[i] = (
+                        max(current[0], factor),
+                        blocked_penalty if node["blocked"] else current[1],
+                    )
+
+        return penalties
+
+    def customize(self, penalties=None):
+        """Compute a :class:`Metric` for the given edge penalties."""
+        edge_count = len(self.edge_u)
+        factor = np.ones(edge_count)
+        extra = np.zeros(edge_count)
+        for i, (edge_factor, edge_extra) in (penalties or {}).items():
+            factor[i] = edge_factor
+            extra[i] = edge_extra
+
+        weight = np.full(2 * len(self.up_targets), INF)
+        via = np.zeros(2 * len(self.up_targets), dtype=np.int64)
+
+        # base edges: forward runs u -> v, which is upward when u ranks lower
+        u_lower = (self.rank[self.edge_u] < self.rank[self.edge_v]).astype(np.int64)
+        base_ids = ~np.arange(edge_count, dtype=np.int64)
+        _relax(
+            weight, via,
+            np.concatenate([2 * self.edge_arc + 1 - u_lower, 2 * self.edge_arc + u_lower]),
+            np.concatenate([self.edge_forward * factor + extra, self.edge_backward * factor + extra]),
+            np.concatenate([base_ids, base_ids]),
+        )
+
+        for level in range(len(self.level_offsets) - 1):
+            start, end = int(self.level_offsets[level]), int(self.level_offsets[level + 1])
+            _relax(
+                weight, via,
+                self.tri_write[start:end],
+                weight[self.tri_in[start:end]] + weight[self.tri_out[start:end]],
+                self.tri_via[start:end],
+            )
+
+        return Metric(weight, via)
+
+    def metric_for(self, routing_graph):
+        """Customized metric for the current routing graph version."""
+        with self._metric_lock:
+            if self._metric is None or self._metric_version != routing_graph.version:
+                with routing_graph.lock:
+                    version = routing_graph.version
+                    penalties = self.overlay_penalties(routing_graph)
+                self._metric = self.customize(penalties)
+                self._metric_version = version
+            return self._metric
+
+    # -- queries -----------------------------------------------------------
+
+    def shortest_path(self, metric, source, target):
+        """Bidirectional upward search; returns ``(cost, vertex_path)``."""
+        if source == target:
+            return 0.0, [source]
+
+        dist = ({source: 0.0}, {target: 0.0})
+        previous = ({}, {})
+        queues = ([(0.0, source)], [(0.0, target)])
+        weights = (metric.up_weight, metric.down_weight)
+
+        best = INF
+        meeting = None
+
+        while queues[0] or queues[1]:
+            tops = [q[0][0] if q else INF for q in queues]
+            if min(tops) >= best:
+                break
+
+            side = 0 if tops[0] <= tops[1] else 1
+            d, v = heapq.heappop(queues[side])
+            if d > dist[side][v]:
+                continue
+
+            other = dist[1 - side].get(v)
+            if other is not None and d + other < best:
+                best, meeting = d + other, v
+
+            start, end = int(self.up_offsets[v]), int(self.up_offsets[v + 1])
+            for a, w in zip(self.up_targets[start:end].tolist(), weights[side][start:end].tolist()):
+                nd = d + w
+                if nd < dist[side].get(a, INF):
+                    dist[side][a] = nd
+                    previous[side][a] = v
+                    heapq.heappush(queues[side], (nd, a))
+
+        if meeting is None:
+            return INF, []
+
+        path = [meeting]
+        while path[-1] != source:
+            path.append(previous[0][path[-1]])
+        path.reverse()
+        v = meeting
+        while v != target:
+            v = previous[1][v]
+            path.append(v)
+
+        return best, path
+
+    def _slot(self, a, b):
+        """Flat weight slot of the hierarchy arc traversed from a to b."""
+        if self.rank[a] < self.rank[b]:
+            low, high, direction = a, b, 0
+        else:
+            low, high, direction = b, a, 1
+        arc = int(self.up_offsets[low]) + self._row(self.up_offsets, self.up_targets, low).index(high)
+        return 2 * arc + direction
+
+    def unpack(self, metric, path):
+        """Expand hierarchy arcs into ``(base_edge, from_vertex)`` steps."""
+        steps = []
+        for x, y in zip(path, path[1:]):
+            stack = [(x, y)]
+            while stack:
+                a, b = stack.pop()
+                via = int(metric.via[self._slot(a, b)])
+                if via < 0:
+                    steps.append((~via, a))
+                else:
+                    stack.append((via, b))
+                    stack.append((a, via))
+        return steps
+
+    def geometry(self, steps):
+        """Full (lat, lon) polyline along unpacked base edges."""
+        coords = []
+        for edge, start in steps:
+            u, v = int(self.edge_u[edge]), int(self.edge_v[edge])
+            first, last = int(self.geometry_offsets[edge]), int(self.geometry_offsets[edge + 1])
+            interior = list(zip(
+                self.geometry_lat[first:last].tolist(), self.geometry_lon[first:last].tolist()
+            ))
+            if start != u:
+                u, v = v, u
+                interior.reverse()
+            if not coords:
+                coords.append(self.vertex_coord(u))
+            coords.extend(interior)
+            coords.append(self.vertex_coord(v))
+        return coords
+
+
+_network = None
+_network_lock = threading.Lock()
+
+
+def get_road_network():
+    """Map the imported road network once per process, if configured."""
+    global _network
+
+    path = getattr(settings, "ROAD_NETWORK_PATH", None)
+    if _network is None and path:
+        with _network_lock:
+            if _network is None:
+                try:
+                    _network = load_network(path)
+                except FileNotFoundError:
+                    return None
+    return _network
+
+
+def compute_road_route(start_coord, end_coord, graph):
+    """Road-accurate route with traffic/disaster overlays from ``graph``.
+
+    Matches the response shape of ``compute_smart_route``; ``route_cost`` is
+    the penalised travel time in seconds and the geometry is built locally,
+    so no OSRM request is made.
+    """
+    network = get_road_network()
+    if network is None:
+        return {"message": "Road network not available"}
+
+    source = network.nearest_vertex(*start_coord)
+    target = network.nearest_vertex(*end_coord)
+    if source is None or target is None:
+        return {"message": "No route found"}
+
+    metric = network.metric_for(graph)
+    cost, path = network.shortest_path(metric, source, target)
+    if cost == INF:
+        return {"message": "No route found"}
+
+    steps = network.unpack(metric, path)
+    coords = network.geometry(steps) or [network.vertex_coord(source)]
+    junctions = [source] + [
+        int(network.edge_v[edge]) if start == network.edge_u[edge] else int(network.edge_u[edge])
+        for edge, start in steps
+    ]
+
+    return {
+        "route_cost": round(cost, 2),
+        "route_nodes": [network.vertex_coord(v) for v in junctions],
+        "geojson_route": {
+            "type": "LineString",
+            "coordinates": [[lon, lat] for lat, lon in coords],
+        },
+    }
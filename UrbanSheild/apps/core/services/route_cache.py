@@ -0,0 +1,93 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+# ---------------------------------------------------------------------------
+# route result cache
+#
+# Routes are cached per (snapped start, snapped end, algorithm). Every entry
+# is tied to the routing graph version it was computed against, so any
+# traffic or disaster change that bumps the version drops the whole cache.
+# ---------------------------------------------------------------------------
+
+def snap(coord, grid=None):
+    """Round a (lat, lon) onto the cache grid (ROUTE_CACHE_GRID_DEG)."""
+    if grid is None:
+        grid = getattr(settings, "ROUTE_CACHE_GRID_DEG", 0.001)
+    return (round(coord[0] / grid), round(coord[1] / grid))
+
+
+class RouteCache:
+    """Thread-safe LRU cache with TTL and graph-version invalidation."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (expires_at, result)
+        self.version = None
+        self.counters = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+        }
+
+    def _sync_version(self, version):
+        if version != self.version:
+            self.counters["invalidations"] += len(self.entries)
+            self.entries.clear()
+            self.version = version
+
+    def get(self, key, version):
+        with self.lock:
+            self._sync_version(version)
+            entry = self.entries.get(key)
+
+            if entry is not None and entry[0] < time.monotonic():
+                del self.entries[key]
+                self.counters["expirations"] += 1
+                entry = None
+
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return dict(entry[1])
+
+    def put(self, key, version, result):
+        ttl = getattr(settings, "ROUTE_CACHE_TTL", 300)
+        max_entries = getattr(settings, "ROUTE_CACHE_MAX_ENTRIES", 1024)
+
+        with self.lock:
+            # a newer graph was loaded while this route was computed
+            if version != self.version:
+                return
+
+            self.entries[key] = (time.monotonic() + ttl, dict(result))
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > max_entries:
+                self.entries.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "size": len(self.entries),
+                "graph_version": self.version,
+                "hit_rate": round(self.counters["hits"] / lookups, 3) if lookups else None,
+            }
+
+
+route_cache = RouteCache()
@@ -0,0 +1,523 @@
+import hashlib
+import itertools
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from apps.disasters.models import Disaster
+from apps.traffic.models import TrafficIncident
+from apps.core.services.csr_graph import CSRGraph, save_arrays, load_arrays
+from apps.core.services.dijkstra_route_service import (
+    EDGE_CUTOFF, distance, edge_weight,
+)
+
+
+# ---------------------------------------------------------------------------
+# process-wide routing graph
+#
+# Traffic incidents and active disasters are kept as the nodes of one
+# long-lived graph that is patched by model signals (see
+# ``apps.core.signals``) instead of being rebuilt on every request.
+#
+# Searches never touch those dicts. A base set of nodes is packed into CSR
+# arrays (:class:`GraphBase`) saved under ROUTING_GRAPH_PATH/<content
+# hash>/, where every worker mmaps it, so the edges live once in the page
+# cache instead of once per worker. Nodes added, changed or removed since
+# then form a small overlay on top of the base (:class:`GraphSnapshot`),
+# so a change costs one vectorized pass per changed node rather than a
+# full rebuild; once the overlay grows past ROUTING_GRAPH_OVERLAY_MAX
+# nodes a background thread packs a new base. Snapshots are immutable, so
+# searches run without a lock; a request only attaches its own start and
+# end nodes through :class:`RouteView`.
+# ---------------------------------------------------------------------------
+
+# ids reserved for the per-request start/end nodes; snapshot row 0 is an
+# empty placeholder so graph nodes are numbered from 1
+START = 0
+END = -1
+
+ROUTABLE_DISASTER_STATUSES = ("active", "critical")
+
+# snapshot directories no process has re-created for this long are removed
+SNAPSHOT_KEEP_S = 60
+
+
+def traffic_node(incident):
+    return {
+        "type": "traffic",
+        "coord": (incident.latitude, incident.longitude),
+        "congestion": incident.congestion_level,
+        "blocked": incident.is_blocked,
+    }
+
+
+def disaster_node(disaster):
+    # disasters should be avoided if possible, treat them as blocked nodes and
+    # give them additional congestion penalty based on severity
+    return {
+        "type": "disaster",
+        "coord": (disaster.latitude, disaster.longitude),
+        "congestion": getattr(disaster, "severity", 0),
+        "blocked": True,
+    }
+
+
+def within_cutoff(lat, lon, coord):
+    """``(indices, distances)`` of the points closer than EDGE_CUTOFF to coord.
+
+    Same arithmetic as :func:`distance`; NaN placeholders never match.
+    """
+    d = np.sqrt((lat - coord[0]) ** 2 + (lon - coord[1]) ** 2)
+    indices = np.flatnonzero(d < EDGE_CUTOFF)
+    return indices, d[indices]
+
+
+# distance cells compared per NumPy pass, bounds the temporary matrices
+CSR_BLOCK_CELLS = 1 << 22
+
+
+def build_csr(lat, lon, congestion, blocked):
+    """Vectorized :func:`build_graph` over node columns, as CSR arrays.
+
+    Returns ``(offsets, targets, weights)``. Nodes are bucketed into
+    EDGE_CUTOFF cells; all the nodes of a cell are compared with the 3x3
+    block of cells around it in one matrix pass and the edges weighed with
+    :func:`edge_weight`, so the costs equal the dict graph's up to
+    floating-point rounding. Rows list their targets in index order, like
+    :func:`build_graph`.
+    """
+    count = len(lat)
+    finite = np.flatnonzero(np.isfinite(lat) & np.isfinite(lon))
+    cx = np.floor(lat[finite] / EDGE_CUTOFF).astype(np.int64)
+    cy = np.floor(lon[finite] / EDGE_CUTOFF).astype(np.int64)
+
+    cells = {}
+    for node, x, y in zip(finite.tolist(), cx.tolist(), cy.tolist()):
+        cells.setdefault((x, y), []).append(node)
+
+    sources, targets, weights = [], [], []
+    for (x, y), members in cells.items():
+        candidates = np.array(sorted(
+            other for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+            for other in cells.get((x + dx, y + dy), ())
+        ), dtype=np.int64)
+        members = np.array(members, dtype=np.int64)
+        step = max(1, CSR_BLOCK_CELLS // len(candidates))
+        for first in range(0, len(members), step):
+            rows = members[first:first + step]
+            d = np.sqrt(
+                (lat[candidates] - lat[rows, None]) ** 2 + (lon[candidates] - lon[rows, None]) ** 2
+            )
+            keep = (d < EDGE_CUTOFF) & (candidates != rows[:, None])
+            row, column = np.nonzero(keep)  # row-major: targets ascend per row
+            target = candidates[column]
+            sources.append(rows[row])
+            targets.append(target)
+            weights.append(edge_weight(d[row, column], {
+                "congestion": congestion[target], "blocked": blocked[target],
+            }))
+
+    if not sources:
+        return np.zeros(count + 1, dtype=np.int64), np.empty(0, dtype=np.int32), np.empty(0)
+
+    sources = np.concatenate(sources)
+    # every row comes from one cell, so a stable sort keeps its targets in order
+    order = np.argsort(sources, kind="stable")
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=count), out=offsets[1:])
+    return (
+        offsets,
+        np.concatenate(targets)[order].astype(np.int32),
+        np.concatenate(weights)[order].astype(np.float64),
+    )
+
+
+def node_columns(nodes):
+    """Column arrays of ``{key: node}``, row 0 a NaN placeholder."""
+    ordered = [nodes[key] for key in sorted(nodes)]
+    return {
+        "lat": np.array([np.nan] + [n["coord"][0] for n in ordered], dtype=np.float64),
+        "lon": np.array([np.nan] + [n["coord"][1] for n in ordered], dtype=np.float64),
+        "congestion": np.array([0] + [n.get("congestion", 0) for n in ordered], dtype=np.float64),
+        "blocked": np.array([False] + [bool(n.get("blocked", False)) for n in ordered], dtype=bool),
+    }
+
+
+def node_digest(key, node):
+    """64-bit hash of one node; XOR-ed together they name a node set."""
+    text = repr((key, sorted(node.items())))
+    return int.from_bytes(hashlib.sha1(text.encode()).digest()[:8], "big")
+
+
+class GraphBase:
+    """CSR arrays of one set of nodes, row ``i`` (from 1) the ``i``-th key.
+
+    Rows are ordered by node key, so every worker holding the same nodes
+    computes the same arrays and content hash, and maps the directory the
+    first of them wrote.
+    """
+
+    def __init__(self, nodes, arrays):
+        self.nodes = nodes
+        self.rows = {key: row for row, key in enumerate(sorted(nodes), start=1)}
+        self.graph = CSRGraph(
+            arrays["offsets"], arrays["targets"], arrays["weights"], arrays["lat"], arrays["lon"],
+        )
+        self.congestion = arrays["congestion"]
+        self.blocked = arrays["blocked"]
+
+
+def build_base(nodes):
+    """Pack ``nodes`` into a :class:`GraphBase`, via the shared files."""
+    columns = node_columns(nodes)
+    path = getattr(settings, "ROUTING_GRAPH_PATH", None)
+    if path:
+        try:
+            return GraphBase(nodes, _shared_arrays(Path(path), columns_digest(columns), columns))
+        except OSError:
+            pass  # unwritable, or pruned under us: keep this one private
+
+    offsets, targets, weights = build_csr(**columns)
+    return GraphBase(nodes, {**columns, "offsets": offsets, "targets": targets, "weights": weights})
+
+
+def columns_digest(columns):
+    """Content hash of :func:`node_columns` output and the edge cutoff."""
+    digest = hashlib.sha1(str(EDGE_CUTOFF).encode())
+    for name in sorted(columns):
+        digest.update(columns[name].tobytes())
+    return digest.hexdigest()[:20]
+
+
+def _shared_arrays(path, fingerprint, columns):
+    directory = path / fingerprint
+
+    if not (directory / "meta.json").exists():
+        offsets, targets, weights = build_csr(**columns)
+        path.mkdir(parents=True, exist_ok=True)
+        tmp = path / f".{directory.name}.{os.getpid()}.{threading.get_ident()}"
+        save_arrays(tmp, offsets=offsets, targets=targets, weights=weights, **columns)
+        try:
+            os.rename(tmp, directory)
+        except OSError:
+            # another worker published the same graph first
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    os.utime(directory)
+    arrays = load_arrays(directory)[1]
+    _prune(path, keep=directory)
+    return arrays
+
+
+def _prune(path, keep):
+    """Remove bases (and unfinished temp dirs) no worker packed recently.
+
+    Workers touch a base when they map it; mapped files stay readable
+    after unlink on POSIX, so a worker still searching one is unaffected.
+    """
+    cutoff = time.time() - SNAPSHOT_KEEP_S
+    for old in path.iterdir():
+        try:
+            if old != keep and old.is_dir() and old.stat().st_mtime < cutoff:
+                shutil.rmtree(old, ignore_errors=True)
+        except OSError:
+            pass
+
+
+class GraphSnapshot:
+    """Immutable view of one :class:`RoutingGraph` version.
+
+    A :class:`GraphBase` plus ``changes`` (``{key: node}``, None for a
+    removed node) made since it was packed. Changed and removed base rows
+    are masked out, their coordinates set to NaN so nothing attaches to
+    them; the changed and new nodes are appended as rows
+    ``len(base.graph)`` onwards. One distance matrix between every row and
+    the appended ones gives both the appended rows' edges and the base
+    rows' edges into them, kept in small CSR arrays of their own.
+    Indexing yields a row's ``(target, weight)`` edges, with the costs a
+    full rebuild would give.
+    """
+
+    def __init__(self, version, base, changes=None):
+        self.version = version
+        self.base = base
+        self.graph = base.graph
+        self.size = len(base.graph)  # base rows, placeholder included
+        self.removed = None
+        self.added = []  # (targets, weights) of the appended rows
+        self.into = None  # (offsets, targets, weights) of base rows into them
+
+        self.lat, self.lon = base.graph.lat, base.graph.lon
+        self.congestion, self.blocked = base.congestion, base.blocked
+        if not changes:
+            return
+
+        rows = [base.rows[key] for key in changes if key in base.rows]
+        added = node_columns({key: node for key, node in changes.items() if node is not None})
+        self.removed = np.zeros(self.size, dtype=bool)
+        self.removed[rows] = True
+
+        self.lat = np.concatenate([self.lat, added["lat"][1:]])
+        self.lon = np.concatenate([self.lon, added["lon"][1:]])
+        self.lat[rows] = self.lon[rows] = np.nan
+        self.congestion = np.concatenate([self.congestion, added["congestion"][1:]])
+        self.blocked = np.concatenate([self.blocked, added["blocked"][1:]])
+
+        appended = np.arange(self.size, len(self.lat))
+        d = np.sqrt(
+            (self.lat[appended] - self.lat[:, None]) ** 2 + (self.lon[appended] - self.lon[:, None]) ** 2
+        )
+        near = (d < EDGE_CUTOFF) & (np.arange(len(self.lat))[:, None] != appended)
+
+        for column in range(len(appended)):
+            targets = np.flatnonzero(near[:, column])
+            self.added.append((targets, edge_weight(d[targets, column], {
+                "congestion": self.congestion[targets], "blocked": self.blocked[targets],
+            })))
+
+        row, column = np.nonzero(near[:self.size])
+        offsets = np.zeros(self.size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(row, minlength=self.size), out=offsets[1:])
+        self.into = (offsets, appended[column], edge_weight(d[row, column], {
+            "congestion": self.congestion[appended[column]], "blocked": self.blocked[appended[column]],
+        }))
+
+    def __len__(self):
+        return len(self.lat) - 1
+
+    def __getitem__(self, node):
+        if node >= self.size:
+            targets, weights = self.added[node - self.size]
+            return zip(targets.tolist(), weights.tolist())
+
+        if self.removed is None:
+            return self.graph[node]
+
+        start, end = int(self.graph.offsets[node]), int(self.graph.offsets[node + 1])
+        targets = self.graph.targets[start:end]
+        keep = ~self.removed[targets]
+        edges = zip(targets[keep].tolist(), self.graph.weights[start:end][keep].tolist())
+
+        offsets, targets, weights = self.into
+        start, end = int(offsets[node]), int(offsets[node + 1])
+        if start == end:
+            return edges
+        return itertools.chain(edges, zip(targets[start:end].tolist(), weights[start:end].tolist()))
+
+    def coord(self, node):
+        return (float(self.lat[node]), float(self.lon[node]))
+
+    @property
+    def edge_count(self):
+        """Edges stored: the base arrays plus the overlay."""
+        overlay = sum(len(targets) for targets, _ in self.added)
+        if self.into is not None:
+            overlay += len(self.into[1])
+        return len(self.graph.targets) + overlay
+
+
+class RoutingGraph:
+    """Traffic/disaster nodes kept in sync with the database.
+
+    Nodes are keyed by ``("traffic", pk)`` / ``("disaster", pk)``. Every
+    mutation bumps :attr:`version` and records the key in :attr:`changed`;
+    :meth:`snapshot` lays the changed nodes over the last packed base, on
+    first use of each version. :attr:`fingerprint` names the node set, the
+    same in every worker holding the same nodes.
+
+    Signals only reach the process that saved the row, and queryset
+    ``update()`` calls bypass them entirely, so the graph is also reloaded
+    from the database once it is older than ``ROUTING_GRAPH_MAX_AGE``
+    seconds.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.version = 0
+        self.loaded_at = None
+        self.nodes = {}  # (kind, pk) -> node dict
+        self.digest = 0
+        self.base = None
+        self.changed = {}  # key -> version it last changed in, since the base
+        self.compacting = False
+        self._snapshot = None
+
+    @property
+    def fingerprint(self):
+        return f"{self.digest:016x}"
+
+    # -- loading ----------------------------------------------------------
+
+    def is_stale(self):
+        if self.loaded_at is None:
+            return True
+        max_age = getattr(settings, "ROUTING_GRAPH_MAX_AGE", 300)
+        return max_age is not None and time.monotonic() - self.loaded_at > max_age
+
+    def load(self):
+        """Reload every node from the database."""
+        nodes = {
+            ("traffic", incident.pk): traffic_node(incident)
+            for incident in TrafficIncident.objects.all()
+        }
+        nodes.update(
+            (("disaster", disaster.pk), disaster_node(disaster))
+            for disaster in Disaster.objects.filter(status__in=ROUTABLE_DISASTER_STATUSES)
+        )
+        self.replace(nodes)
+
+    def replace(self, nodes):
+        """Swap in a whole new set of nodes, e.g. freshly loaded ones."""
+        digest = 0
+        for key, node in nodes.items():
+            digest ^= node_digest(key, node)
+
+        with self.lock:
+            self.nodes = nodes
+            self.digest = digest
+            self.version += 1
+            self.loaded_at = time.monotonic()
+            if self.base is not None:
+                # only rows that differ from the base join the overlay
+                self.changed = {
+                    key: self.version for key in self.base.nodes.keys() | nodes.keys()
+                    if self.base.nodes.get(key) != nodes.get(key)
+                }
+
+    # -- incremental updates ----------------------------------------------
+
+    def upsert(self, key, node):
+        """Insert or replace the node stored under ``key``."""
+        with self.lock:
+            if self.loaded_at is None:
+                return
+            old = self.nodes.get(key)
+            if old == node:
+                return
+            if old is not None:
+                self.digest ^= node_digest(key, old)
+            self.digest ^= node_digest(key, node)
+            self.nodes[key] = node
+            self.version += 1
+            self.changed[key] = self.version
+
+    def remove(self, key):
+        with self.lock:
+            if self.loaded_at is None:
+                return
+            old = self.nodes.pop(key, None)
+            if old is not None:
+                self.digest ^= node_digest(key, old)
+                self.version += 1
+                self.changed[key] = self.version
+
+    # -- queries ----------------------------------------------------------
+
+    def snapshot(self):
+        """The :class:`GraphSnapshot` of the current version."""
+        with self.lock:
+            if self._snapshot is not None and self._snapshot.version == self.version:
+                return self._snapshot
+
+            changes = {
+                key: self.nodes.get(key) for key in self.changed
+                if self.base is None or self.base.nodes.get(key) != self.nodes.get(key)
+            }
+            limit = getattr(settings, "ROUTING_GRAPH_OVERLAY_MAX", 64)
+            if self.base is None or len(changes) > 4 * limit:
+                # nothing to lay an overlay on, or one that costs more than
+                # a full build: pack the current nodes right away
+                self.base = build_base(dict(self.nodes))
+                self.changed, changes = {}, {}
+            elif len(changes) > limit and not self.compacting:
+                self.compacting = True
+                threading.Thread(target=self.compact, name="routing-compact", daemon=True).start()
+
+            self._snapshot = GraphSnapshot(self.version, self.base, changes)
+            return self._snapshot
+
+    def compact(self):
+        """Pack the current nodes into a new base and shrink the overlay."""
+        try:
+            with self.lock:
+                nodes, packed = dict(self.nodes), self.version
+            base = build_base(nodes)
+            with self.lock:
+                self.base = base
+                # keys changed while the base was being packed stay in
+                self.changed = {key: v for key, v in self.changed.items() if v > packed}
+        finally:
+            self.compacting = False
+
+
+def end_id(index):
+    """Node id of the ``index``-th end node of a :class:`RouteView`."""
+    return END - index
+
+
+class RouteView:
+    """A :class:`GraphSnapshot` plus one request's start and end nodes.
+
+    Only the edges leaving the start node and the edges entering the end
+    nodes are computed per request, one vectorized pass over the snapshot
+    each; everything else is read straight from the shared arrays.
+    """
+
+    def __init__(self, snapshot, start_coord, end_coords):
+        self.snapshot = snapshot
+        self.start_coord = start_coord
+        self.end_coords = {end_id(i): coord for i, coord in enumerate(end_coords)}
+        lat, lon = snapshot.lat, snapshot.lon
+
+        nodes, d = within_cutoff(lat, lon, start_coord)
+        weights = edge_weight(d, {"congestion": snapshot.congestion[nodes], "blocked": snapshot.blocked[nodes]})
+        self.start_edges = list(zip(nodes.tolist(), weights.tolist()))
+
+        self.end_edges = {}
+        for target, end_coord in self.end_coords.items():
+            end_node = {"type": "end", "coord": end_coord}
+
+            d = distance(start_coord, end_coord)
+            if d < EDGE_CUTOFF:
+                self.start_edges.append((target, edge_weight(d, end_node)))
+
+            nodes, d = within_cutoff(lat, lon, end_coord)
+            for node, weight in zip(nodes.tolist(), edge_weight(d, end_node).tolist()):
+                self.end_edges.setdefault(node, []).append((target, weight))
+
+    def __getitem__(self, node_id):
+        if node_id == START:
+            return self.start_edges
+        if node_id < 0:
+            return ()
+
+        edges = self.snapshot[node_id]
+        to_ends = self.end_edges.get(node_id)
+        if to_ends is None:
+            return edges
+        return itertools.chain(edges, to_ends)
+
+    def coord(self, node_id):
+        if node_id == START:
+            return self.start_coord
+        if node_id < 0:
+            return self.end_coords[node_id]
+        return self.snapshot.coord(node_id)
+
+
+routing_graph = RoutingGraph()
+
+
+def get_routing_graph():
+    """Return the shared graph, loading it on first use or once stale."""
+    if routing_graph.is_stale():
+        with routing_graph.lock:
+            # another thread may have reloaded it while we waited
+            if routing_graph.is_stale():
+                routing_graph.load()
+    return routing_graph
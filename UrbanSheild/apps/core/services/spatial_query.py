@@ -0,0 +1,313 @@
+import math
+
+from django.apps import apps
+from django.db import connections, OperationalError
+from django.db.models import Case, F, FloatField, Q, Sum, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import ASin, Cos, Least, Power, Radians, Sin, Sqrt
+from django.db.models.lookups import LessThanOrEqual
+
+from apps.core.utils import GEOHASH_PRECISION, geohash_cell_size, geohash_encode, haversine
+
+
+EARTH_RADIUS_KM = 6371
+MAX_DISTANCE_KM = math.pi * EARTH_RADIUS_KM
+
+# point models mirrored into an SQLite R*Tree index
+RTREE_MODELS = (
+    "disasters.Disaster",
+    "traffic.TrafficIncident",
+    "shelters.Shelter",
+    "authorities.Authority",
+    "core.UserLocation",
+)
+
+
+# ---------------------------------------------------------------------------
+# SQLite R*Tree indexes
+#
+# Each model gets a ``<db_table>_rtree`` virtual table holding one
+# degenerate box per row. Triggers on the base table keep it in sync, which
+# also covers ``queryset.update()`` and ``bulk_create`` that bypass model
+# signals. Schema migrations that rebuild a table drop its triggers, so
+# ensure_rtree_indexes() runs after every migrate and restores them.
+# ---------------------------------------------------------------------------
+
+_rtree_tables = {}
+
+
+def rtree_table(model):
+    return f"{model._meta.db_table}_rtree"
+
+
+def ensure_rtree_indexes(using="default"):
+    """Create missing R*Tree tables and triggers and resync stale ones."""
+    connection = connections[using]
+    _rtree_tables.clear()
+    if connection.vendor != "sqlite":
+        return
+
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for label in RTREE_MODELS:
+            model = apps.get_model(label)
+            table, index = quote(model._meta.db_table), quote(rtree_table(model))
+            try:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {index} "
+                    f"USING rtree(id, min_lat, max_lat, min_lon, max_lon)"
+                )
+            except OperationalError:
+                return  # SQLite built without the R*Tree module
+
+            name = rtree_table(model)
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {quote(name + '_insert')} AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {index} VALUES "
+                f"(new.id, new.latitude, new.latitude, new.longitude, new.longitude); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {quote(name + '_update')} "
+                f"AFTER UPDATE OF id, latitude, longitude ON {table} BEGIN "
+                f"DELETE FROM {index} WHERE id = old.id; "
+                f"INSERT INTO {index} VALUES "
+                f"(new.id, new.latitude, new.latitude, new.longitude, new.longitude); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {quote(name + '_delete')} AFTER DELETE ON {table} BEGIN "
+                f"DELETE FROM {index} WHERE id = old.id; END"
+            )
+
+            cursor.execute(f"SELECT (SELECT COUNT(*) FROM {table}), (SELECT COUNT(*) FROM {index})")
+            rows, indexed = cursor.fetchone()
+            if rows != indexed:
+                cursor.execute(f"DELETE FROM {index}")
+                cursor.execute(
+                    f"INSERT INTO {index} SELECT id, latitude, latitude, longitude, longitude FROM {table}"
+                )
+
+
+def rtree_enabled(queryset):
+    """Whether ``queryset`` can be narrowed through an R*Tree index."""
+    connection = connections[queryset.db]
+    if connection.vendor != "sqlite" or queryset.model._meta.label not in RTREE_MODELS:
+        return False
+
+    key = (queryset.db, rtree_table(queryset.model))
+    if key not in _rtree_tables:
+        _rtree_tables[key] = key[1] in connection.introspection.table_names()
+    return _rtree_tables[key]
+
+
+def in_bbox(queryset, min_lat, max_lat, min_lon, max_lon, use_rtree=True):
+    """Rows of ``queryset`` inside the box; ids via ``values_list("id")``.
+
+    Uses the R*Tree index on SQLite and the (latitude, longitude) columns
+    elsewhere. R*Tree boxes are stored as 32-bit floats rounded outwards,
+    so the exact comparison is applied to its candidates as well.
+    """
+    if use_rtree and rtree_enabled(queryset):
+        queryset = queryset.filter(id__in=RawSQL(
+            f"SELECT id FROM {connections[queryset.db].ops.quote_name(rtree_table(queryset.model))} "
+            f"WHERE max_lat >= %s AND min_lat <= %s AND max_lon >= %s AND min_lon <= %s",
+            (min_lat, max_lat, min_lon, max_lon),
+        ))
+
+    return queryset.filter(
+        latitude__gte=min_lat,
+        latitude__lte=max_lat,
+        longitude__gte=min_lon,
+        longitude__lte=max_lon,
+    )
+
+
+# ---------------------------------------------------------------------------
+# geohash neighbour cells
+#
+# Portable alternative to the R*Tree: pick the finest geohash precision at
+# which a handful of cells covers the search box; each cell is then one
+# prefix range scan on the geohash index.
+# ---------------------------------------------------------------------------
+
+MAX_GEOHASH_CELLS = 16
+
+def has_geohash(model):
+    return any(field.name == "geohash" for field in model._meta.get_fields())
+
+
+def geohash_cells(lat, lon, radius_km):
+    """Prefixes of the cells covering the radius, or None if too large."""
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+    if max_lon - min_lon >= 360:
+        return None
+
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = geohash_cell_size(precision)
+        rows = range(int((min_lat + 90) // height), min(int((max_lat + 90) // height), round(180 / height) - 1) + 1)
+        cols = range(int((min_lon + 180) // width), int((max_lon + 180) // width) + 1)
+        if len(rows) * len(cols) <= MAX_GEOHASH_CELLS:
+            break
+    else:
+        return None
+
+    wrap = round(360 / width)
+    return sorted({
+        geohash_encode(-90 + (row + 0.5) * height, -180 + (col % wrap + 0.5) * width, precision)
+        for row in rows
+        for col in cols
+    })
+
+
+def in_geohash_cells(queryset, lat, lon, radius_km):
+    """Narrow ``queryset`` to the geohash cells around the radius.
+
+    Falls back to the bounding box when the radius is too large for cells.
+    """
+    cells = geohash_cells(lat, lon, radius_km)
+    if cells is None:
+        return in_bbox(queryset, *bounding_box(lat, lon, radius_km), use_rtree=False)
+
+    # "~" sorts after every base32 character, so each cell is a plain range
+    ranges = Q()
+    for cell in cells:
+        ranges |= Q(geohash__gte=cell, geohash__lt=cell + "~")
+    return queryset.filter(ranges)
+
+
+# ---------------------------------------------------------------------------
+# radius queries
+#
+# A spatial index picks the candidates: the R*Tree on SQLite, geohash cells
+# for models that carry one, or the (latitude, longitude) bounding box. The
+# exact haversine distance is then computed in SQL for those rows only, so
+# filtering, ordering and fetching all happen in a single query.
+# ---------------------------------------------------------------------------
+
+SPATIAL_INDEXES = ("rtree", "geohash", "bbox")
+
+
+def default_index(queryset):
+    if rtree_enabled(queryset):
+        return "rtree"
+    if has_geohash(queryset.model):
+        return "geohash"
+    return "bbox"
+
+
+def bounding_box(lat, lon, radius_km):
+    """``(min_lat, max_lat, min_lon, max_lon)`` enclosing the radius."""
+    angular = radius_km / EARTH_RADIUS_KM
+    d_lat = math.degrees(angular)
+
+    min_lat, max_lat = lat - d_lat, lat + d_lat
+    if min_lat <= -90 or max_lat >= 90 or angular >= math.pi / 2:
+        # the circle touches a pole, every longitude is in range
+        return max(min_lat, -90), min(max_lat, 90), -180, 180
+
+    d_lon = math.degrees(math.asin(min(1, math.sin(angular) / math.cos(math.radians(lat)))))
+    return min_lat, max_lat, lon - d_lon, lon + d_lon
+
+
+def distance_expression(lat, lon):
+    """Haversine distance in km from the point to each row, as SQL."""
+    d_lat = Radians(F("latitude") - lat)
+    d_lon = Radians(F("longitude") - lon)
+
+    a = (
+        Power(Sin(d_lat / 2), 2)
+        + math.cos(math.radians(lat))
+        * Cos(Radians(F("latitude")))
+        * Power(Sin(d_lon / 2), 2)
+    )
+
+    # clamp rounding noise above 1 for (near) antipodal points
+    return 2 * EARTH_RADIUS_KM * ASin(Least(Sqrt(a), Value(1.0)), output_field=FloatField())
+
+
+def inner_box(lat, lon, radius_km):
+    """``(min_lat, max_lat, min_lon, max_lon)`` lying entirely inside the radius.
+
+    Distance from the centre peaks at a corner of a box that stays clear of
+    the poles and spans under a hemisphere, so it is shrunk until that holds
+    and all four corners are within the radius.
+    """
+    d_lat = math.degrees(radius_km / EARTH_RADIUS_KM) / math.sqrt(2)
+    d_lon = d_lat / max(math.cos(math.radians(min(abs(lat) + d_lat, 89.9))), 1e-6)
+
+    limit = radius_km * (1 - 1e-9)
+    while abs(lat) + d_lat >= 90 or d_lon >= 90 or any(
+        haversine(lat, lon, lat + step_lat, lon + step_lon) > limit
+        for step_lat in (-d_lat, d_lat)
+        for step_lon in (-d_lon, d_lon)
+    ):
+        d_lat *= 0.9
+        d_lon *= 0.9
+
+    return lat - d_lat, lat + d_lat, lon - d_lon, lon + d_lon
+
+
+def candidates(queryset, lat, lon, radius_km, index=None):
+    """Narrow ``queryset`` to the rows a spatial index finds near the radius.
+
+    ``index`` forces one of SPATIAL_INDEXES instead of the best available one.
+    """
+    index = index or default_index(queryset)
+    if index == "geohash":
+        # the cells already cover the box; a lat/lon filter on top would
+        # only tempt the planner away from the geohash index
+        return in_geohash_cells(queryset, lat, lon, radius_km)
+    return in_bbox(queryset, *bounding_box(lat, lon, radius_km), use_rtree=index == "rtree")
+
+
+def within_radius(queryset, lat, lon, radius_km, order_by="distance_km", index=None):
+    """Rows of ``queryset`` within ``radius_km``, annotated with ``distance_km``.
+
+    ``order_by`` is any field name accepted by ``order_by()``; the default
+    returns the closest rows first.
+    """
+    return (
+        candidates(queryset, lat, lon, radius_km, index)
+        .annotate(distance_km=distance_expression(lat, lon))
+        .filter(distance_km__lte=radius_km)
+        .order_by(order_by)
+    )
+
+
+def nearest(queryset, lat, lon, n=1, start_km=5):
+    """The ``n`` closest rows of ``queryset``, annotated with ``distance_km``.
+
+    Searches a growing radius until it holds ``n`` rows: everything outside
+    the radius is farther than anything inside, so the first ``n`` by
+    distance are exact.
+    """
+    radius_km = start_km
+    while True:
+        rows = list(within_radius(queryset, lat, lon, radius_km).order_by("distance_km", "id")[:n])
+        if len(rows) >= n or radius_km >= MAX_DISTANCE_KM:
+            return rows
+        radius_km *= 4
+
+
+def radius_counts(queryset, lat, lon, radius_km, index=None, **breakdowns):
+    """Count rows within ``radius_km`` in one aggregate query, no objects.
+
+    Each keyword maps an extra result name to a ``Q`` counted alongside
+    ``count``. Rows inside :func:`inner_box` are in range without any trig;
+    only the ring between it and the bounding box gets the exact distance.
+    """
+    min_lat, max_lat, min_lon, max_lon = inner_box(lat, lon, radius_km)
+    inside = Case(
+        When(
+            Q(latitude__gte=min_lat, latitude__lte=max_lat, longitude__gte=min_lon, longitude__lte=max_lon),
+            then=Value(1),
+        ),
+        When(LessThanOrEqual(distance_expression(lat, lon), radius_km), then=Value(1)),
+        default=Value(0),
+    )
+
+    aggregates = {"count": Sum(inside)}
+    for name, condition in breakdowns.items():
+        aggregates[name] = Sum(inside, filter=condition)
+
+    totals = candidates(queryset, lat, lon, radius_km, index).aggregate(**aggregates)
+    return {name: value or 0 for name, value in totals.items()}
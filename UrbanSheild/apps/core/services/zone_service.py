@@ -0,0 +1,91 @@
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from apps.core.models import EvacuationZone, UserLocation
+from apps.core.services.job_queue import enqueue
+from apps.core.services.spatial_query import candidates
+from apps.core.utils import as_columns, haversine_many
+from apps.disasters.models import Disaster
+
+
+# ---------------------------------------------------------------------------
+# evacuation zones
+#
+# Zone 1 is the disc no shelter is picked from (max(2, severity / 2) km,
+# as in compute_evacuation_route); every further zone doubles the radius,
+# EVACUATION_ZONE_COUNT zones in all. Active user locations inside the
+# outer ring come from the spatial index and are binned with a single
+# vectorized distance pass.
+# ---------------------------------------------------------------------------
+
+def zone_edges(severity):
+    """Ring boundaries in km, innermost first: ``[0, r1, r2, ...]``."""
+    inner = max(2, severity / 2)
+    count = getattr(settings, "EVACUATION_ZONE_COUNT", 3)
+    return [0.0] + [inner * 2 ** n for n in range(count)]
+
+
+def build_zones(disaster):
+    """Create or refresh the zones of ``disaster`` with their user counts.
+
+    Order times already issued for a zone are kept. Returns ``{"zones",
+    "users", "elapsed_ms"}``.
+    """
+    started = time.perf_counter()
+    edges = zone_edges(disaster.severity)
+
+    lats, lons = as_columns(
+        candidates(
+            UserLocation.objects.filter(is_active=True),
+            disaster.latitude, disaster.longitude, edges[-1],
+        ).values_list("latitude", "longitude"),
+        2,
+    )
+    distances = haversine_many(disaster.latitude, disaster.longitude, lats, lons)
+    counts, _ = np.histogram(distances, bins=edges)
+
+    zones = [
+        EvacuationZone(
+            disaster=disaster, zone_number=number,
+            radius_km_from=edges[number - 1], radius_km_to=edges[number],
+            estimated_users_affected=int(count),
+        )
+        for number, count in enumerate(counts.tolist(), start=1)
+    ]
+    with transaction.atomic():
+        EvacuationZone.objects.filter(disaster=disaster, zone_number__gt=len(zones)).delete()
+        EvacuationZone.objects.bulk_create(
+            zones,
+            update_conflicts=True,
+            unique_fields=["disaster", "zone_number"],
+            update_fields=["radius_km_from", "radius_km_to", "estimated_users_affected"],
+        )
+
+    return {
+        "zones": len(zones),
+        "users": int(counts.sum()),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def queue_zones(disaster_ids):
+    """Rebuild the zones of ``disaster_ids`` in the background."""
+    return [
+        enqueue(
+            "evacuation_zones",
+            {"disaster_id": disaster_id},
+            key=f"evacuation-zones:{disaster_id}",
+            replace_finished=True,
+        )
+        for disaster_id in disaster_ids
+    ]
+
+
+def zones_job(disaster_id):
+    disaster = Disaster.objects.filter(id=disaster_id).first()
+    if disaster is None:
+        return None
+    return build_zones(disaster)
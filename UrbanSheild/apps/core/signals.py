@@ -0,0 +1,136 @@
+from django.db.models.signals import pre_save, post_save, post_delete, post_migrate
+from django.db import transaction
+from django.dispatch import receiver
+
+from apps.core.models import UserLocation
+from apps.core.utils import geohash_encode
+from apps.authorities.models import Authority
+from apps.disasters.models import Disaster
+from apps.shelters.models import Shelter
+from apps.traffic.models import TrafficIncident
+from apps.core.services.routing_graph import (
+    routing_graph, traffic_node, disaster_node, ROUTABLE_DISASTER_STATUSES,
+)
+from apps.core.services.spatial_query import ensure_rtree_indexes
+from apps.core.services.knn_index import shelter_index, authority_index
+from apps.core.services.hot_snapshot import hot_snapshot
+from apps.core.services.alert_service import queue_fan_out
+from apps.core.services.event_stream import publish_changes
+from apps.core.services.zone_service import queue_zones
+
+
+# ---------------------------------------------------------------------------
+# geohash cell of every point row, for prefix range scans
+# ---------------------------------------------------------------------------
+
+GEOHASHED_MODELS = (Disaster, TrafficIncident, Shelter, Authority, UserLocation)
+
+
+@receiver(pre_save)
+def geohash_before_save(sender, instance, **kwargs):
+    if sender in GEOHASHED_MODELS:
+        instance.geohash = geohash_encode(instance.latitude, instance.longitude)
+
+
+# ---------------------------------------------------------------------------
+# keep the shared routing graph in sync with traffic and disaster rows,
+# once the change is committed (a rollback must not reach the graph)
+# ---------------------------------------------------------------------------
+
+@receiver(post_save, sender=TrafficIncident)
+def traffic_saved(sender, instance, **kwargs):
+    key, node = ("traffic", instance.pk), traffic_node(instance)
+    transaction.on_commit(lambda: routing_graph.upsert(key, node))
+
+
+@receiver(post_delete, sender=TrafficIncident)
+def traffic_deleted(sender, instance, **kwargs):
+    key = ("traffic", instance.pk)
+    transaction.on_commit(lambda: routing_graph.remove(key))
+
+
+@receiver(post_save, sender=Disaster)
+def disaster_saved(sender, instance, **kwargs):
+    key = ("disaster", instance.pk)
+    if instance.status in ROUTABLE_DISASTER_STATUSES:
+        node = disaster_node(instance)
+        transaction.on_commit(lambda: routing_graph.upsert(key, node))
+    else:
+        transaction.on_commit(lambda: routing_graph.remove(key))
+
+
+@receiver(post_delete, sender=Disaster)
+def disaster_deleted(sender, instance, **kwargs):
+    key = ("disaster", instance.pk)
+    transaction.on_commit(lambda: routing_graph.remove(key))
+
+
+# ---------------------------------------------------------------------------
+# rebuild the nearest-neighbour indexes on their next lookup
+# ---------------------------------------------------------------------------
+
+@receiver(post_save, sender=Shelter)
+@receiver(post_delete, sender=Shelter)
+def shelter_changed(sender, **kwargs):
+    shelter_index.invalidate()
+
+
+@receiver(post_save, sender=Authority)
+@receiver(post_delete, sender=Authority)
+def authority_changed(sender, **kwargs):
+    authority_index.invalidate()
+
+
+# ---------------------------------------------------------------------------
+# mark the shared map snapshot stale once the change is committed
+# ---------------------------------------------------------------------------
+
+SNAPSHOT_MODELS = (Disaster, TrafficIncident, Shelter, Authority)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def snapshot_rows_changed(sender, **kwargs):
+    if sender in SNAPSHOT_MODELS:
+        transaction.on_commit(hot_snapshot.invalidate)
+
+
+# ---------------------------------------------------------------------------
+# tell event stream clients which map rows changed
+# ---------------------------------------------------------------------------
+
+STREAMED_MODELS = {Disaster: 'disaster', TrafficIncident: 'traffic'}
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def streamed_rows_changed(sender, instance, signal, **kwargs):
+    if sender in STREAMED_MODELS:
+        action = 'deleted' if signal is post_delete else 'saved'
+        publish_changes(STREAMED_MODELS[sender], [instance.pk], action)
+
+
+# ---------------------------------------------------------------------------
+# push alerts to tracked users when a disaster is reported or escalated,
+# and lay out evacuation zones around critical ones
+# ---------------------------------------------------------------------------
+
+@receiver(post_save, sender=Disaster)
+def disaster_alerts(sender, instance, created, update_fields=None, **kwargs):
+    # Disaster.save() promotes severe reports with update_fields=['status']
+    escalated = instance.status == 'critical' and update_fields is not None and 'status' in update_fields
+    if created or escalated:
+        queue_fan_out([instance.pk], status=instance.status)
+    if instance.status == 'critical':
+        # counts and radii follow every edit of a critical disaster
+        queue_zones([instance.pk])
+
+
+# ---------------------------------------------------------------------------
+# (re)create the SQLite R*Tree indexes once migrations have run
+# ---------------------------------------------------------------------------
+
+@receiver(post_migrate)
+def spatial_indexes_migrated(sender, using, **kwargs):
+    if sender.name == 'apps.core':
+        ensure_rtree_indexes(using)
@@ -0,0 +1,841 @@
+import itertools
+import json
+import random
+import tempfile
+import threading
+from datetime import timedelta
+from http.server import ThreadingHTTPServer
+from unittest import mock
+
+import numpy as np
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Q
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from apps.core.models import DisasterAlert, EvacuationZone, Job, StreamEvent, UserAlertPreference, UserLocation
+from apps.core.services.alert_service import (
+    ALERTABLE_DISASTER_STATUSES, DEFAULT_ALERT_PREFERENCES, evaluate_user_alerts, fan_out_disaster,
+)
+from apps.core.utils import as_columns, geohash_encode, haversine, pairs_within
+from apps.core.services.spatial_query import SPATIAL_INDEXES, radius_counts, rtree_table, within_radius
+from apps.core.services.dijkstra_route_service import (
+    astar_with_path, build_graph, dijkstra_with_path, reconstruct_path,
+)
+from apps.core.services.road_network import INF, RoadNetwork, preprocess
+from apps.core.services.routing_graph import END, START, RouteView, RoutingGraph, get_routing_graph
+from apps.core.services.osrm_client import OSRMClient
+from apps.core.services.job_queue import backoff, claim, enqueue, run_next
+from apps.core.services.location_gate import location_gate
+from apps.core.services.hot_snapshot import HotSnapshot
+from apps.core.services.event_stream import (
+    EventHub, Subscription, events_after, format_cursor, parse_cursor, replay,
+)
+from apps.core.services.zone_service import build_zones, zone_edges
+from apps.core.services.evacuation_service import plan_version
+from apps.core.management.commands.run_fake_osrm import FakeOSRMHandler
+from apps.disasters.models import Disaster
+from apps.shelters.models import Shelter
+from apps.traffic.models import TrafficIncident
+
+
+def floyd_warshall(count, edges):
+    """All-pairs costs by brute force, ``edges`` as (u, v, weight)."""
+    inf = float("inf")
+    cost = [[0 if i == j else inf for j in range(count)] for i in range(count)]
+    for u, v, weight in edges:
+        cost[u][v] = min(cost[u][v], weight)
+    for k, i, j in itertools.product(range(count), repeat=3):
+        if cost[i][k] + cost[k][j] < cost[i][j]:
+            cost[i][j] = cost[i][k] + cost[k][j]
+    return cost
+
+
+def grid_nodes(size=5, spacing=0.9, seed=3):
+    """Traffic-style nodes on a jittered square grid, a few of them blocked."""
+    rng = random.Random(seed)
+    return [
+        {
+            "coord": (30 + i * spacing + rng.uniform(-0.1, 0.1), 78 + j * spacing + rng.uniform(-0.1, 0.1)),
+            "congestion": rng.randint(0, 10),
+            "blocked": rng.random() < 0.15,
+        }
+        for i in range(size) for j in range(size)
+    ]
+
+
+class ShortestPathTests(SimpleTestCase):
+    """Dijkstra and A* against all-pairs brute force on a small grid."""
+
+    def setUp(self):
+        self.nodes = grid_nodes()
+        self.graph = build_graph(self.nodes)
+        self.expected = floyd_warshall(len(self.nodes), [
+            (u, v, weight) for u, edges in self.graph.items() for v, weight in edges
+        ])
+
+    def path_cost(self, path):
+        weights = {(u, v): w for u, edges in self.graph.items() for v, w in edges}
+        return sum(weights[edge] for edge in zip(path, path[1:]))
+
+    def test_dijkstra_matches_brute_force(self):
+        for start in self.graph:
+            distances, previous = dijkstra_with_path(self.graph, start)
+            for target, expected in enumerate(self.expected[start]):
+                if expected == float("inf"):
+                    self.assertNotIn(target, distances)
+                    continue
+                self.assertAlmostEqual(distances[target], expected)
+                path = reconstruct_path(previous, start, target)
+                self.assertAlmostEqual(self.path_cost(path), expected)
+
+    def test_astar_matches_dijkstra(self):
+        coord = lambda node: self.nodes[node]["coord"]
+        for start, target in itertools.permutations(self.graph, 2):
+            expected = self.expected[start][target]
+            stats = {}
+            distances, previous = astar_with_path(self.graph, start, target, coord, stats)
+            if expected == float("inf"):
+                self.assertNotIn(target, distances)
+                continue
+            self.assertAlmostEqual(distances[target], expected)
+            self.assertAlmostEqual(self.path_cost(reconstruct_path(previous, start, target)), expected)
+            self.assertLessEqual(stats["settled"], len(self.nodes))
+
+
+@override_settings(ROUTING_GRAPH_PATH=None, ROUTING_GRAPH_OVERLAY_MAX=64)
+class RoutingGraphTests(SimpleTestCase):
+    """Snapshots with an overlay of changes against a graph built from scratch."""
+
+    def setUp(self):
+        self.graph = RoutingGraph()
+        self.graph.replace({("traffic", i): node for i, node in enumerate(grid_nodes(size=6))})
+        self.graph.snapshot()
+
+    def change(self, seed=9):
+        rng = random.Random(seed)
+        for i in rng.sample(range(36), 6):
+            self.graph.remove(("traffic", i))
+        for i in list(rng.sample(range(36), 6)) + [100, 101, 102]:
+            lat, lon = rng.uniform(30, 34.5), rng.uniform(78, 82.5)
+            self.graph.upsert(("traffic", i), {
+                "coord": (lat, lon), "congestion": rng.randint(0, 10), "blocked": rng.random() < 0.3,
+            })
+
+    def assert_matches_rebuild(self, snapshot):
+        nodes = [self.graph.nodes[key] for key in sorted(self.graph.nodes)]
+        rng = random.Random(4)
+        for _ in range(20):
+            start = (rng.uniform(30, 34.5), rng.uniform(78, 82.5))
+            end = (rng.uniform(30, 34.5), rng.uniform(78, 82.5))
+            graph = build_graph([{"coord": start}] + nodes + [{"coord": end}])
+            expected = dijkstra_with_path(graph, 0)[0].get(len(nodes) + 1)
+
+            distances = dijkstra_with_path(RouteView(snapshot, start, [end]), START)[0]
+            if expected is None:
+                self.assertNotIn(END, distances)
+            else:
+                self.assertAlmostEqual(distances[END], expected)
+
+    def test_overlay_matches_rebuild(self):
+        base = self.graph.base
+        self.change()
+        snapshot = self.graph.snapshot()
+        self.assertIs(self.graph.base, base)
+        self.assertIsNotNone(snapshot.removed)
+        self.assert_matches_rebuild(snapshot)
+
+    def test_compaction_folds_the_overlay_in(self):
+        self.change()
+        self.graph.compact()
+        self.assertEqual(self.graph.changed, {})
+        snapshot = self.graph.snapshot()
+        self.assertIsNone(snapshot.removed)
+        self.assert_matches_rebuild(snapshot)
+
+    def test_fingerprint_names_the_node_set(self):
+        self.change()
+        fresh = RoutingGraph()
+        fresh.replace(dict(self.graph.nodes))
+        self.assertEqual(fresh.fingerprint, self.graph.fingerprint)
+        self.graph.remove(("traffic", 100))
+        self.assertNotEqual(fresh.fingerprint, self.graph.fingerprint)
+
+
+class ContractionHierarchyTests(SimpleTestCase):
+    """CCH queries against brute force on a small road grid."""
+
+    def setUp(self):
+        rng = random.Random(5)
+        size = 5
+        self.coords = [(30 + i * 0.01, 78 + j * 0.01) for i in range(size) for j in range(size)]
+        self.edges = []
+        for i, j in itertools.product(range(size), repeat=2):
+            for di, dj in ((0, 1), (1, 0)):
+                if i + di < size and j + dj < size:
+                    seconds = rng.uniform(10, 100)
+                    # some roads are one-way
+                    direction = rng.choice((1, 0, 0, 0, -1))
+                    self.edges.append((
+                        i * size + j, (i + di) * size + j + dj,
+                        seconds if direction >= 0 else INF,
+                        seconds if direction <= 0 else INF,
+                    ))
+        self.network = RoadNetwork(preprocess(self.coords, self.edges, [[] for _ in self.edges]))
+
+    def expected(self, penalties=None):
+        directed = []
+        for index, (u, v, forward, backward) in enumerate(self.edges):
+            factor, extra = (penalties or {}).get(index, (1, 0))
+            directed += [(u, v, forward * factor + extra), (v, u, backward * factor + extra)]
+        return floyd_warshall(len(self.coords), directed)
+
+    def assert_matches(self, metric, expected, penalties=None):
+        for source, target in itertools.product(range(len(self.coords)), repeat=2):
+            cost, path = self.network.shortest_path(metric, source, target)
+            if expected[source][target] == INF:
+                self.assertEqual(cost, INF)
+                continue
+            self.assertAlmostEqual(cost, expected[source][target])
+
+            # the unpacked base edges add up to the same cost
+            steps = self.network.unpack(metric, path)
+            total = 0.0
+            for edge, start in steps:
+                u, v, forward, backward = self.edges[edge]
+                factor, extra = (penalties or {}).get(edge, (1, 0))
+                total += (forward if start == u else backward) * factor + extra
+            self.assertAlmostEqual(total, cost)
+
+    def test_matches_brute_force(self):
+        self.assert_matches(self.network.customize(), self.expected())
+
+    def test_customized_penalties_match_brute_force(self):
+        penalties = {index: (3.0, 50.0) for index in range(0, len(self.edges), 4)}
+        self.assert_matches(self.network.customize(penalties), self.expected(penalties), penalties)
+
+
+class CountingOSRMHandler(FakeOSRMHandler):
+    requests = 0
+
+    def do_GET(self):
+        type(self).requests += 1
+        super().do_GET()
+
+
+class OSRMClientTests(SimpleTestCase):
+    """Pooled client against the local stand-in server."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), CountingOSRMHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        CountingOSRMHandler.requests = 0
+
+    def test_geometry_follows_waypoints_and_is_cached(self):
+        coords = [(30.3165, 78.0322), (30.0869, 78.2676), (29.9457, 78.1642)]
+        with override_settings(OSRM_BASE_URL=self.base_url):
+            client = OSRMClient()
+            geometry = client.route_geometry(coords)
+            # nearby coordinates round to the same cache key
+            again = client.route_geometry([(lat + 1e-7, lon) for lat, lon in coords])
+
+        self.assertEqual(geometry["type"], "LineString")
+        self.assertEqual(geometry["coordinates"], [[lon, lat] for lat, lon in coords])
+        self.assertEqual(again, geometry)
+        self.assertEqual(CountingOSRMHandler.requests, 1)
+
+    def test_cache_evicts_least_recently_used(self):
+        a, b, c = [(30, 78), (30.1, 78.1)], [(30, 78), (30.2, 78.2)], [(30, 78), (30.3, 78.3)]
+        with override_settings(OSRM_BASE_URL=self.base_url, OSRM_CACHE_SIZE=2):
+            client = OSRMClient()
+            for coords in (a, b, a, c, a, b):
+                client.route_geometry(coords)
+        # a stays cached throughout; b is evicted by c and fetched again
+        self.assertEqual(CountingOSRMHandler.requests, 4)
+
+    def test_failures_are_not_cached(self):
+        with override_settings(OSRM_BASE_URL=f"{self.base_url}/broken", OSRM_RETRIES=0):
+            client = OSRMClient()
+            self.assertIsNone(client.route_geometry([(30, 78), (30.1, 78.1)]))
+            self.assertIsNone(client.route_geometry([(30, 78), (30.1, 78.1)]))
+        self.assertEqual(CountingOSRMHandler.requests, 2)
+
+
+def random_incidents(count, seed=7):
+    rng = random.Random(seed)
+    incidents = []
+    for _ in range(count):
+        lat, lon = rng.uniform(29.5, 30.5), rng.uniform(78, 79.5)
+        # bulk_create skips the pre_save signal that fills the geohash
+        incidents.append(TrafficIncident(
+            latitude=lat, longitude=lon, geohash=geohash_encode(lat, lon),
+            congestion_level=rng.randint(1, 10), is_blocked=rng.random() < 0.2,
+        ))
+    return TrafficIncident.objects.bulk_create(incidents)
+
+
+class RTreeIndexTests(TestCase):
+    """R*Tree triggers and radius queries against brute force."""
+
+    def indexed(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT id, min_lat, min_lon FROM {rtree_table(TrafficIncident)}")
+            return {pk: (lat, lon) for pk, lat, lon in cursor.fetchall()}
+
+    def assert_index_matches_table(self):
+        indexed = self.indexed()
+        rows = dict((pk, (lat, lon)) for pk, lat, lon in TrafficIncident.objects.values_list("id", "latitude", "longitude"))
+        self.assertEqual(set(indexed), set(rows))
+        for pk, (lat, lon) in rows.items():
+            # boxes are 32-bit floats
+            self.assertAlmostEqual(indexed[pk][0], lat, places=4)
+            self.assertAlmostEqual(indexed[pk][1], lon, places=4)
+
+    def test_triggers_follow_inserts_updates_and_deletes(self):
+        random_incidents(50)
+        incident = TrafficIncident.objects.create(latitude=30.1, longitude=78.1, congestion_level=3)
+        self.assert_index_matches_table()
+
+        # queryset updates and deletes bypass signals, not triggers
+        TrafficIncident.objects.filter(id=incident.id).update(latitude=29.9, longitude=78.9)
+        TrafficIncident.objects.filter(congestion_level__lt=4).delete()
+        incident.congestion_level = 9
+        incident.save()
+        self.assert_index_matches_table()
+
+    def test_within_radius_matches_haversine(self):
+        random_incidents(300)
+        rows = list(TrafficIncident.objects.values_list("id", "latitude", "longitude"))
+        for lat, lon, radius_km in [(30, 78.7, 25), (29.6, 78.1, 60), (30.4, 79.4, 5), (35, 75, 10)]:
+            expected = sorted(
+                (haversine(lat, lon, row_lat, row_lon), pk)
+                for pk, row_lat, row_lon in rows
+                if haversine(lat, lon, row_lat, row_lon) <= radius_km
+            )
+            for index in SPATIAL_INDEXES:
+                found = list(
+                    within_radius(TrafficIncident.objects.all(), lat, lon, radius_km, index=index)
+                    .order_by("distance_km", "id").values_list("id", "distance_km")
+                )
+                self.assertEqual([pk for pk, _ in found], [pk for _, pk in expected], index)
+                for (_, distance), (expected_distance, _) in zip(found, expected):
+                    self.assertAlmostEqual(distance, expected_distance, places=6)
+
+
+class RadiusCountTests(TestCase):
+    """In-database search info counts against brute force."""
+
+    def test_counts_match_haversine(self):
+        random_incidents(300)
+        rows = list(TrafficIncident.objects.values_list("latitude", "longitude", "is_blocked"))
+        for lat, lon, radius_km in [(30, 78.7, 25), (29.6, 78.1, 60), (30.4, 79.4, 5), (30, 78.7, 500)]:
+            inside = [blocked for row_lat, row_lon, blocked in rows if haversine(lat, lon, row_lat, row_lon) <= radius_km]
+            for index in SPATIAL_INDEXES:
+                counts = radius_counts(
+                    TrafficIncident.objects.all(), lat, lon, radius_km, index=index, blocked=Q(is_blocked=True)
+                )
+                self.assertEqual(counts, {"count": len(inside), "blocked": sum(inside)}, index)
+
+    @override_settings(HOT_SNAPSHOT_PATH=None)
+    def test_search_info_endpoint(self):
+        random_incidents(100)
+        rows = list(TrafficIncident.objects.values_list("latitude", "longitude", "is_blocked"))
+        inside = [blocked for lat, lon, blocked in rows if haversine(30, 78.7, lat, lon) <= 40]
+
+        response = self.client.get("/api/search/info/", {"lat": 30, "lon": 78.7, "radius": 40, "breakdown": "true"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["traffic_count"], len(inside))
+        self.assertEqual(response.json()["blocked_road_count"], sum(inside))
+        self.assertEqual(response.json()["disaster_count"], 0)
+
+
+class PairsWithinTests(SimpleTestCase):
+    """Grid spatial join against every pair."""
+
+    def assert_matches_all_pairs(self, lats1, lons1, lats2, lons2, radius_km):
+        first, second, distances = pairs_within(lats1, lons1, lats2, lons2, radius_km)
+        found = {(i, j): d for i, j, d in zip(first.tolist(), second.tolist(), distances.tolist())}
+
+        expected = {}
+        for i, j in itertools.product(range(len(lats1)), range(len(lats2))):
+            d = haversine(lats1[i], lons1[i], lats2[j], lons2[j])
+            if d <= radius_km:
+                expected[(i, j)] = d
+        self.assertEqual(set(found), set(expected))
+        for pair, d in expected.items():
+            self.assertAlmostEqual(found[pair], d, places=6)
+
+    def test_uttarakhand_scale(self):
+        rng = np.random.default_rng(4)
+        for radius_km in (0.5, 5, 40):
+            self.assert_matches_all_pairs(
+                rng.uniform(29, 31.5, 200), rng.uniform(77.5, 81, 200),
+                rng.uniform(29, 31.5, 300), rng.uniform(77.5, 81, 300),
+                radius_km,
+            )
+
+    def test_antimeridian_and_poles(self):
+        rng = np.random.default_rng(5)
+        lats = np.concatenate([rng.uniform(-10, 10, 80), rng.uniform(85, 90, 40)])
+        lons = np.concatenate([rng.uniform(179, 180, 40), rng.uniform(-180, -179, 40), rng.uniform(-180, 180, 40)])
+        for radius_km in (50, 300, 5000):
+            self.assert_matches_all_pairs(lats, lons, lats[::-1], lons[::-1], radius_km)
+
+    def test_empty_sets(self):
+        first, second, distances = pairs_within([], [], [30], [78], 10)
+        self.assertEqual((len(first), len(second), len(distances)), (0, 0, 0))
+
+
+def random_disasters(count, seed=11):
+    rng = random.Random(seed)
+    disasters = []
+    for _ in range(count):
+        lat, lon = rng.gauss(30.3, 0.1), rng.gauss(78.05, 0.1)
+        # bulk_create skips the save() escalation and the alert signals
+        disasters.append(Disaster(
+            disaster_type=rng.choice([choice for choice, _ in Disaster.DISASTER_TYPES]),
+            latitude=lat, longitude=lon, geohash=geohash_encode(lat, lon),
+            severity=rng.randint(1, 10), status=rng.choice(['active', 'critical', 'resolved']),
+        ))
+    return Disaster.objects.bulk_create(disasters)
+
+
+class UserAlertTests(TestCase):
+    """Batched alert evaluation for one location against brute force."""
+
+    def setUp(self):
+        self.disasters = random_disasters(300)
+        self.user = User.objects.create(username='alerts-test')
+        self.prefs = UserAlertPreference.objects.create(
+            user=self.user, alert_radius_km=8, min_severity=4, disaster_types=['flood', 'fire', 'cyclone'],
+        )
+
+    def expected(self, lat, lon):
+        return {
+            disaster.id: round(haversine(lat, lon, disaster.latitude, disaster.longitude), 2)
+            for disaster in self.disasters
+            if disaster.status in ALERTABLE_DISASTER_STATUSES
+            and disaster.disaster_type in self.prefs.disaster_types
+            and disaster.severity >= self.prefs.min_severity
+            and haversine(lat, lon, disaster.latitude, disaster.longitude) <= self.prefs.alert_radius_km
+        }
+
+    def alerted(self):
+        return dict(DisasterAlert.objects.filter(user=self.user).values_list('disaster_id', 'distance_km'))
+
+    def test_alerts_match_brute_force(self):
+        expected = {}
+        for lat, lon in ((30.3, 78.05), (30.35, 78.1), (30.2, 77.95)):
+            created = evaluate_user_alerts(self.user, lat, lon)
+            fresh = {pk: km for pk, km in self.expected(lat, lon).items() if pk not in expected}
+            self.assertEqual({alert.disaster_id for alert in created}, set(fresh))
+            expected.update(fresh)
+            alerted = self.alerted()
+            self.assertEqual(alerted.keys(), expected.keys())
+            for pk, km in expected.items():
+                # both sides are rounded to 10 m
+                self.assertAlmostEqual(alerted[pk], km, delta=0.011)
+        self.assertTrue(expected)
+
+    def test_repeat_evaluation_creates_nothing(self):
+        self.assertTrue(evaluate_user_alerts(self.user, 30.3, 78.05))
+        self.assertEqual(evaluate_user_alerts(self.user, 30.3, 78.05), [])
+
+    def test_disabled_preferences_alert_nothing(self):
+        self.prefs.alert_enabled = False
+        self.prefs.save()
+        self.assertEqual(evaluate_user_alerts(self.user, 30.3, 78.05), [])
+        self.assertFalse(DisasterAlert.objects.filter(user=self.user).exists())
+
+
+class FanOutTests(TestCase):
+    """Disaster fan-out over tracked users against per-user brute force."""
+
+    def setUp(self):
+        rng = random.Random(13)
+        User.objects.bulk_create([User(username=f'fan-out-{i}') for i in range(400)])
+        self.users = list(User.objects.filter(username__startswith='fan-out-'))
+        locations, preferences = [], []
+        for user in self.users:
+            lat, lon = rng.gauss(30.3, 0.1), rng.gauss(78.05, 0.1)
+            locations.append(UserLocation(
+                user=user, latitude=lat, longitude=lon,
+                geohash=geohash_encode(lat, lon), is_active=rng.random() < 0.9,
+            ))
+            # a quarter never saved preferences and get the defaults
+            if rng.random() < 0.75:
+                preferences.append(UserAlertPreference(
+                    user=user, alert_radius_km=rng.choice([2, 5, 10, 25]), min_severity=rng.randint(1, 9),
+                    disaster_types=rng.sample(['flood', 'fire', 'earthquake', 'cyclone', 'heatwave'], 2),
+                    alert_enabled=rng.random() < 0.9,
+                ))
+        UserLocation.objects.bulk_create(locations)
+        UserAlertPreference.objects.bulk_create(preferences)
+
+    def expected(self, disaster):
+        preferences = {prefs.user_id: prefs for prefs in UserAlertPreference.objects.all()}
+        expected = set()
+        for location in UserLocation.objects.filter(is_active=True):
+            prefs = preferences.get(location.user_id)
+            if prefs is None:
+                prefs = UserAlertPreference(**DEFAULT_ALERT_PREFERENCES)
+            if (prefs.alert_enabled
+                    and disaster.disaster_type in prefs.disaster_types
+                    and disaster.severity >= prefs.min_severity
+                    and haversine(disaster.latitude, disaster.longitude,
+                                  location.latitude, location.longitude) <= prefs.alert_radius_km):
+                expected.add(location.user_id)
+        return expected
+
+    def alerted(self, disaster):
+        return set(DisasterAlert.objects.filter(disaster=disaster).values_list('user_id', flat=True))
+
+    def test_fan_out_matches_brute_force(self):
+        total = 0
+        for disaster in random_disasters(12):
+            stats = fan_out_disaster(disaster)
+            expected = self.expected(disaster) if disaster.status in ALERTABLE_DISASTER_STATUSES else set()
+            self.assertEqual(self.alerted(disaster), expected)
+            self.assertEqual(stats['alerted'], len(expected))
+            total += len(expected)
+        self.assertTrue(total)
+
+    def test_users_already_alerted_are_skipped(self):
+        disaster = random_disasters(1, seed=2)[0]
+        disaster.status, disaster.severity, disaster.disaster_type = 'critical', 9, 'flood'
+        disaster.save(update_fields=['status', 'severity', 'disaster_type'])
+        expected = self.expected(disaster)
+        first = sorted(expected)[:len(expected) // 2]
+        DisasterAlert.objects.bulk_create([DisasterAlert(user_id=pk, disaster=disaster, distance_km=0) for pk in first])
+
+        stats = fan_out_disaster(disaster)
+        self.assertEqual(stats['alerted'], len(expected) - len(first))
+        self.assertEqual(self.alerted(disaster), expected)
+        self.assertEqual(fan_out_disaster(disaster)['alerted'], 0)
+
+    def test_alerts_written_concurrently_are_not_counted(self):
+        disaster = random_disasters(1, seed=2)[0]
+        disaster.status, disaster.severity, disaster.disaster_type = 'critical', 9, 'flood'
+        disaster.save(update_fields=['status', 'severity', 'disaster_type'])
+        expected = self.expected(disaster)
+        raced = sorted(expected)[:3]
+
+        def racing_columns(rows, width):
+            # another worker alerts a few users after the candidates were read
+            DisasterAlert.objects.bulk_create([
+                DisasterAlert(user_id=pk, disaster=disaster, distance_km=0) for pk in raced
+            ])
+            return as_columns(rows, width)
+
+        with mock.patch('apps.core.services.alert_service.as_columns', racing_columns):
+            stats = fan_out_disaster(disaster)
+        self.assertEqual(stats['alerted'], len(expected) - len(raced))
+        self.assertEqual(self.alerted(disaster), expected)
+
+
+@override_settings(
+    JOB_QUEUE_EAGER=False, JOB_RETRY_BACKOFF=5, JOB_RETRY_MAX_DELAY=600, JOB_LOCK_TIMEOUT=300,
+)
+class JobQueueTests(TestCase):
+    """Job claiming, retries and backoff."""
+
+    def mail(self, **kwargs):
+        payload = {'subject': 'test', 'message': 'test', 'recipient_list': ['ops@example.com']}
+        return enqueue('send_mail', payload, **kwargs)
+
+    def test_backoff_doubles_with_jitter_up_to_the_cap(self):
+        random.seed(1)
+        for attempts in range(1, 12):
+            delay = min(600, 5 * 2 ** (attempts - 1))
+            samples = [backoff(attempts) for _ in range(200)]
+            self.assertTrue(all(0.9 * delay <= sample <= 1.1 * delay for sample in samples))
+            # the jitter spreads retries of jobs that failed together
+            self.assertGreater(max(samples) - min(samples), 0.1 * delay)
+
+    def test_claim_takes_each_due_job_once(self):
+        jobs = [self.mail() for _ in range(3)]
+        later = self.mail(delay=60)
+
+        claimed = [claim('worker-a'), claim('worker-b'), claim('worker-a')]
+        self.assertEqual([job.id for job in claimed], [job.id for job in jobs])
+        self.assertEqual([job.locked_by for job in claimed], ['worker-a', 'worker-b', 'worker-a'])
+        self.assertTrue(all(job.status == 'running' and job.attempts == 1 for job in claimed))
+        self.assertIsNone(claim('worker-b'))
+        # a worker that lost the race for a job finds it no longer claimable
+        self.assertIsNone(claim('worker-b', job_id=jobs[0].id))
+        self.assertIsNone(claim('worker-b', job_id=later.id))
+
+    def test_stale_lock_is_reclaimed(self):
+        job = claim('worker-a', job_id=self.mail().id)
+        Job.objects.filter(id=job.id).update(locked_at=timezone.now() - timedelta(seconds=301))
+
+        reclaimed = claim('worker-b')
+        self.assertEqual((reclaimed.id, reclaimed.locked_by, reclaimed.attempts), (job.id, 'worker-b', 2))
+
+    def test_failures_are_retried_then_marked_failed(self):
+        # an unexpected keyword makes the handler raise on every attempt
+        job = enqueue('send_mail', {'subject': 'test', 'bogus': True}, max_attempts=2)
+
+        started = timezone.now()
+        job = run_next('worker-a')
+        self.assertEqual((job.status, job.attempts, job.locked_by), ('queued', 1, ''))
+        self.assertIn('TypeError', job.last_error)
+        self.assertGreaterEqual(job.run_at, started + timedelta(seconds=4.5))
+        self.assertIsNone(run_next('worker-a'))
+
+        Job.objects.filter(id=job.id).update(run_at=timezone.now())
+        job = run_next('worker-a')
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+        self.assertIsNotNone(job.finished_at)
+        self.assertIsNone(run_next('worker-a'))
+
+    def test_key_dedupes_pending_jobs_only(self):
+        job = self.mail(key='mail:1')
+        self.assertEqual(self.mail(key='mail:1').id, job.id)
+
+        self.assertEqual(run_next('worker-a').status, 'done')
+        self.assertEqual(self.mail(key='mail:1').status, 'done')
+        requeued = self.mail(key='mail:1', replace_finished=True)
+        self.assertEqual((requeued.id, requeued.status, requeued.attempts), (job.id, 'queued', 0))
+
+
+class LocationGateTests(TestCase):
+    """Held trailing fixes live on the row until the flush job stores them."""
+
+    def setUp(self):
+        self.user = User.objects.create(username='walker')
+        self.now = timezone.now()
+        self.location = UserLocation.objects.create(user=self.user, latitude=30.0, longitude=78.0)
+        UserLocation.objects.filter(pk=self.location.pk).update(last_updated=self.now, fix_time=self.now)
+        self.location.refresh_from_db()
+
+    def hold(self, seconds, lat):
+        location_gate.defer(self.location, lat, 78.0, 5.0, self.now + timedelta(seconds=seconds))
+
+    def stored(self):
+        return UserLocation.objects.values_list('latitude', 'held_fix_time').get(pk=self.location.pk)
+
+    def test_newest_held_fix_is_written_when_the_window_closes(self):
+        self.hold(2, 30.2)
+        self.hold(3, 30.3)
+        self.hold(1, 30.1)  # arrived late, older than the one held
+        with self.settings(LOCATION_WRITE_WINDOW_S=5):
+            self.assertEqual(location_gate.flush(self.now + timedelta(seconds=4)), 0)
+            self.assertEqual(location_gate.flush(self.now + timedelta(seconds=5)), 1)
+        self.assertEqual(self.stored(), (30.3, None))
+
+    def test_flush_runs_as_a_job(self):
+        with self.settings(LOCATION_WRITE_WINDOW_S=5):
+            self.hold(2, 30.2)
+            self.hold(3, 30.3)
+            job = Job.objects.get(kind='location_flush')
+            self.assertGreater(job.run_at, self.now)
+            UserLocation.objects.filter(pk=self.location.pk).update(last_updated=self.now - timedelta(seconds=10))
+            Job.objects.filter(pk=job.pk).update(run_at=self.now)
+            self.assertEqual(run_next(job_id=job.id).result, {'written': 1})
+        self.assertEqual(self.stored(), (30.3, None))
+
+    def test_newer_stored_fix_wins(self):
+        self.hold(2, 30.2)
+        UserLocation.objects.filter(pk=self.location.pk).update(
+            latitude=30.9, fix_time=self.now + timedelta(seconds=3),
+        )
+        with self.settings(LOCATION_WRITE_WINDOW_S=5):
+            self.assertEqual(location_gate.flush(self.now + timedelta(seconds=5)), 0)
+        self.assertEqual(self.stored(), (30.9, None))
+
+
+class PlanVersionTests(TestCase):
+    """Shelter edits start a new plan version without reading every row."""
+
+    def setUp(self):
+        self.disaster = random_disasters(1)[0]
+        self.shelters = [
+            Shelter.objects.create(name=f'Shelter {i}', latitude=30.1 + i / 10, longitude=78.1, capacity=100, contact='-')
+            for i in range(5)
+        ]
+        get_routing_graph()
+        self.version = plan_version(self.disaster)
+
+    def test_unchanged_shelters_keep_the_version(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(plan_version(self.disaster), self.version)
+
+    def test_saved_shelter_changes_the_version(self):
+        self.shelters[2].latitude += 0.01
+        self.shelters[2].save()
+        self.assertNotEqual(plan_version(self.disaster), self.version)
+
+    def test_added_and_removed_shelters_change_the_version(self):
+        self.shelters[0].delete()
+        removed = plan_version(self.disaster)
+        self.assertNotEqual(removed, self.version)
+        Shelter.objects.filter(pk=self.shelters[1].pk).update(is_active=False)
+        self.assertNotEqual(plan_version(self.disaster), removed)
+
+
+class EvacuationZoneTests(TestCase):
+    """Zone histograms against binning every location one at a time."""
+
+    def setUp(self):
+        rng = random.Random(17)
+        User.objects.bulk_create([User(username=f'zones-{i}') for i in range(500)])
+        locations = []
+        for user_id in User.objects.filter(username__startswith='zones-').values_list('id', flat=True):
+            lat, lon = rng.gauss(30.3, 0.1), rng.gauss(78.05, 0.1)
+            locations.append(UserLocation(
+                user_id=user_id, latitude=lat, longitude=lon,
+                geohash=geohash_encode(lat, lon), is_active=rng.random() < 0.9,
+            ))
+        UserLocation.objects.bulk_create(locations)
+
+    def expected(self, disaster):
+        edges = zone_edges(disaster.severity)
+        counts = [0] * (len(edges) - 1)
+        for location in UserLocation.objects.filter(is_active=True):
+            distance = haversine(disaster.latitude, disaster.longitude, location.latitude, location.longitude)
+            for number in range(len(counts)):
+                # the outermost ring includes its edge, as np.histogram does
+                last = number == len(counts) - 1
+                if edges[number] <= distance < edges[number + 1] or (last and distance == edges[-1]):
+                    counts[number] += 1
+                    break
+        return counts
+
+    def zones(self, disaster):
+        return list(
+            EvacuationZone.objects.filter(disaster=disaster).order_by('zone_number')
+            .values_list('zone_number', 'radius_km_from', 'radius_km_to', 'estimated_users_affected')
+        )
+
+    def test_counts_match_brute_force(self):
+        disaster = random_disasters(1, seed=4)[0]
+        for severity in (1, 4, 7, 10):
+            disaster.severity = severity
+            stats = build_zones(disaster)
+            counts = self.expected(disaster)
+            edges = zone_edges(severity)
+            self.assertEqual(self.zones(disaster), [
+                (number, edges[number - 1], edges[number], count)
+                for number, count in enumerate(counts, start=1)
+            ])
+            self.assertEqual(stats['users'], sum(counts))
+            self.assertTrue(sum(counts))
+
+    def test_fewer_zones_drop_the_outer_ones(self):
+        disaster = random_disasters(1, seed=4)[0]
+        with override_settings(EVACUATION_ZONE_COUNT=4):
+            self.assertEqual(build_zones(disaster)['zones'], 4)
+        with override_settings(EVACUATION_ZONE_COUNT=2):
+            build_zones(disaster)
+            self.assertEqual([zone[0] for zone in self.zones(disaster)], [1, 2])
+            self.assertEqual([zone[3] for zone in self.zones(disaster)], self.expected(disaster))
+
+
+class HotSnapshotTests(TestCase):
+    """Snapshot rebuilds with and without a job worker."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = self.settings(HOT_SNAPSHOT_PATH=directory.name, HOT_SNAPSHOT_MAX_AGE=60, JOB_QUEUE_EAGER=False)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.snapshot = HotSnapshot()
+        random_disasters(5)
+        self.assertEqual(self.snapshot.get().counts["disasters"], 5)
+
+    def change(self):
+        random_disasters(1, seed=3)
+        self.snapshot.invalidate()
+
+    def age(self, seconds):
+        """Pretend the build and its queued job are ``seconds`` older."""
+        current = self.snapshot.path / "CURRENT"
+        state = json.loads(current.read_text())
+        state["built_at"] -= seconds
+        current.write_text(json.dumps(state))
+        Job.objects.filter(kind="hot_snapshot").update(run_at=timezone.now() - timedelta(seconds=seconds))
+
+    def test_stale_build_is_served_while_the_job_is_fresh(self):
+        self.change()
+        self.assertEqual(self.snapshot.get().counts["disasters"], 5)
+        self.assertTrue(Job.objects.filter(kind="hot_snapshot", status="queued").exists())
+        self.assertEqual(self.snapshot.get().counts["disasters"], 5)
+
+    def test_worker_rebuilds_in_the_background(self):
+        self.change()
+        self.snapshot.get()
+        self.assertEqual(run_next("worker-a", kinds=["hot_snapshot"]).status, "done")
+        self.assertEqual(self.snapshot.get().counts["disasters"], 6)
+
+    def test_request_rebuilds_when_no_worker_took_the_job(self):
+        self.change()
+        self.snapshot.get()
+        self.age(120)
+        self.assertEqual(self.snapshot.get().counts["disasters"], 6)
+
+    def test_claimed_job_is_left_to_its_worker(self):
+        self.change()
+        self.snapshot.get()
+        self.age(120)
+        claim("worker-a", kinds=["hot_snapshot"])
+        self.assertEqual(self.snapshot.get().counts["disasters"], 5)
+
+
+class EventStreamTests(TestCase):
+    """Rows committing after a higher id are still handed out, once."""
+
+    def setUp(self):
+        self.hub = EventHub()
+        self.subscription = Subscription(None, 100)
+        self.hub.subscriptions.add(self.subscription)
+
+    def publish(self, *ids):
+        StreamEvent.objects.bulk_create(StreamEvent(id=event_id, kind="disaster") for event_id in ids)
+
+    def poll(self, now=0.0):
+        self.hub.deliver(events_after(self.hub.last_id, holes=list(self.hub.holes)), now)
+        received = []
+        while not self.subscription.queue.empty():
+            received.append(self.subscription.queue.get_nowait().id)
+        return received
+
+    def test_late_commit_is_delivered_once(self):
+        self.publish(1, 2, 5)
+        self.assertEqual(self.poll(), [1, 2, 5])
+        self.assertEqual(set(self.hub.holes), {3, 4})
+        self.publish(4, 6)
+        self.assertEqual(self.poll(), [4, 6])
+        self.assertEqual(self.poll(), [])
+        self.assertEqual(set(self.hub.holes), {3})
+
+    def test_holes_expire(self):
+        self.publish(1, 3)
+        self.poll(now=0.0)
+        with self.settings(STREAM_LATE_COMMIT_S=10):
+            self.poll(now=11.0)
+        self.assertEqual(self.hub.holes, {})
+        self.publish(2)
+        self.assertEqual(self.poll(now=12.0), [])
+
+    def test_replay_reads_the_cursor_holes(self):
+        self.publish(1, 2, 4, 5, 6)
+        last_id, holes = parse_cursor(format_cursor(4, [3]))
+        self.assertEqual((last_id, holes), (4, [3]))
+        self.assertEqual([event.id for event in replay(None, last_id, 6, holes)], [5, 6])
+        self.publish(3)
+        self.assertEqual([event.id for event in replay(None, last_id, 6, holes)], [3, 5, 6])
@@ -1,5 +1,7 @@
 import math
 
+import numpy as np
+
 UTTARAKHAND_BOUNDS = {
     "min_lat": 28.43,
     "max_lat": 31.46,
@@ -30,4 +32,157 @@ def haversine(lat1, lon1, lat2, lon2):
 
     c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
 
-    return R * c  # distance in km
\ No newline at end of file
+    return R * c  # distance in km
+
+# ---------------------------------------------------------------------------
+# vectorized variants for scoring many points at once
+# ---------------------------------------------------------------------------
+
+def haversine_array(lat1, lon1, lat2, lon2):
+    """Distances in km between points given as arrays (or scalars).
+
+    The arguments broadcast like any NumPy expression: one point against
+    an array, matching entries of two arrays, or ``[:, None]`` against a
+    row for a matrix. Every vectorized distance goes through here.
+    """
+    lat1 = np.asarray(lat1, dtype=np.float64)
+    lon1 = np.asarray(lon1, dtype=np.float64)
+    lat2 = np.asarray(lat2, dtype=np.float64)
+    lon2 = np.asarray(lon2, dtype=np.float64)
+
+    d_lat = np.radians(lat2 - lat1)
+    d_lon = np.radians(lon2 - lon1)
+
+    a = (
+        np.sin(d_lat / 2) ** 2
+        + np.cos(np.radians(lat1))
+        * np.cos(np.radians(lat2))
+        * np.sin(d_lon / 2) ** 2
+    )
+
+    return 6371 * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def haversine_many(lat, lon, lats, lons):
+    """Distances in km from one point to arrays of points."""
+    return haversine_array(lat, lon, lats, lons)
+
+
+def haversine_matrix(lats1, lons1, lats2, lons2):
+    """Pairwise distances in km; row ``i`` is point ``i`` of the first set."""
+    return haversine_array(
+        np.asarray(lats1, dtype=np.float64)[:, None], np.asarray(lons1, dtype=np.float64)[:, None],
+        lats2, lons2,
+    )
+
+
+def pairs_within(lats1, lons1, lats2, lons2, radius_km):
+    """Spatial join: ``(i, j, distance_km)`` for every pair within the radius.
+
+    The second set is bucketed into a lat/lon grid whose cells are at least
+    ``radius_km`` across, so each point of the first set is only compared
+    with the 3x3 block of cells around it. Work grows with the number of
+    nearby pairs instead of ``len(first) * len(second)``.
+    """
+    lats1 = np.asarray(lats1, dtype=np.float64)
+    lons1 = np.asarray(lons1, dtype=np.float64)
+    lats2 = np.asarray(lats2, dtype=np.float64)
+    lons2 = np.asarray(lons2, dtype=np.float64)
+    empty = np.empty(0, dtype=np.int64)
+    if not len(lats1) or not len(lats2):
+        return empty, empty, np.empty(0)
+
+    # cell height covers the radius in latitude; the width covers it at the
+    # most poleward latitude involved and divides 360 so columns wrap
+    height = math.degrees(radius_km / 6371)
+    pole = min(max(np.abs(lats1).max(), np.abs(lats2).max()) + height, 90)
+    cos_pole = math.cos(math.radians(pole))
+    columns = 1
+    if radius_km / 6371 < math.pi / 2 and math.sin(radius_km / 6371) < cos_pole:
+        # otherwise the radius reaches over a pole and spans every longitude
+        width = math.degrees(math.asin(math.sin(radius_km / 6371) / cos_pole))
+        columns = int(360 // width) if width > 0 else 1
+    if columns < 3:
+        columns = 1
+    width = 360 / columns
+
+    def cells(lats, lons):
+        rows = np.floor((lats + 90) / height).astype(np.int64)
+        cols = np.floor((lons + 180) / width).astype(np.int64) % columns
+        return rows, cols
+
+    rows2, cols2 = cells(lats2, lons2)
+    keys2 = rows2 * columns + cols2
+    order = np.argsort(keys2, kind="stable")
+    sorted_keys = keys2[order]
+
+    rows1, cols1 = cells(lats1, lons1)
+    firsts, seconds = [], []
+    for step_row in (-1, 0, 1):
+        for step_col in ((-1, 0, 1) if columns > 1 else (0,)):
+            keys = (rows1 + step_row) * columns + (cols1 + step_col) % columns
+            starts = np.searchsorted(sorted_keys, keys, side="left")
+            counts = np.searchsorted(sorted_keys, keys, side="right") - starts
+
+            # expand every [start, start + count) range into explicit pairs
+            first = np.repeat(np.arange(len(lats1)), counts)
+            offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            firsts.append(first)
+            seconds.append(order[np.repeat(starts, counts) + offsets])
+
+    first = np.concatenate(firsts)
+    second = np.concatenate(seconds)
+    distances = haversine_array(lats1[first], lons1[first], lats2[second], lons2[second])
+    keep = distances <= radius_km
+    return first[keep], second[keep], distances[keep]
+
+
+def as_columns(rows, count):
+    """Split ``values_list`` rows into ``count`` float64 column arrays."""
+    array = np.array(list(rows), dtype=np.float64).reshape(-1, count)
+    return [array[:, i] for i in range(count)]
+
+
+
+# ---------------------------------------------------------------------------
+# geohash cells
+#
+# Interleaved lon/lat bisection bits, five per base32 character. Nearby
+# points share prefixes, so a cell is one range scan over an ordinary
+# string index on any database.
+# ---------------------------------------------------------------------------
+
+GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_PRECISION = 9  # ~4.8 m x 4.8 m cells
+
+
+def geohash_encode(lat, lon, precision=GEOHASH_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    value = bits = 0
+    even = True
+
+    while len(chars) < precision:
+        interval, coord = (lon_range, lon) if even else (lat_range, lat)
+        mid = (interval[0] + interval[1]) / 2
+        if coord >= mid:
+            value = value * 2 + 1
+            interval[0] = mid
+        else:
+            value *= 2
+            interval[1] = mid
+
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_BASE32[value])
+            value = bits = 0
+
+    return "".join(chars)
+
+
+def geohash_cell_size(precision):
+    """``(height, width)`` in degrees of a cell of the given precision."""
+    bits = 5 * precision
+    return 180 / 2 ** (bits // 2), 360 / 2 ** ((bits + 1) // 2)
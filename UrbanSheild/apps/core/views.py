@@ -1,18 +1,39 @@
 from django.shortcuts import render
+from django.conf import settings
 from django.utils import timezone
+from django.db import transaction
+from django.db.models import Q
+from django.contrib.auth.models import User
+from django.utils.dateparse import parse_datetime
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from asgiref.sync import sync_to_async
 
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.views import APIView
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
 
-from apps.core.utils import haversine, UTTARAKHAND_BOUNDS, is_within_uttarakhand
+from apps.core.utils import UTTARAKHAND_BOUNDS, is_within_uttarakhand
 
+import math
 import requests
 
-from apps.core.services.dijkstra_route_service import compute_smart_route
-from apps.core.services.evacuation_service import compute_evacuation_route, check_user_in_danger_zone
+from apps.core.services.dijkstra_route_service import (
+    compute_smart_route, compute_batch_routes, ROUTING_ALGORITHMS
+)
+from apps.core.services.route_cache import route_cache
+from apps.core.services.spatial_query import radius_counts
+from apps.core.services.hot_snapshot import hot_snapshot
+from apps.core.services.alert_service import queue_user_alerts
+from apps.core.services.job_queue import enqueue
+from apps.core.services.evacuation_service import cached_plan, plan_cell, plan_version, queue_plan
+from apps.core.services.zone_service import build_zones
+from apps.core.services.event_stream import parse_cursor, stream
+from apps.core.services.location_gate import location_gate, store_fixes
 from apps.core.models import UserLocation, UserAlertPreference, DisasterAlert, EvacuationZone
 from apps.core.serializers import (
     UserLocationSerializer, UserAlertPreferenceSerializer, 
@@ -28,9 +49,11 @@ from apps.traffic.models import TrafficIncident
 class RouteViewSet(viewsets.ViewSet):
     """Expose routing endpoints used by the front end.
 
-    Currently the only implemented action is ``smart_route`` which accepts a
-    start/end coordinate pair and returns a route that attempts to avoid
-    congestion and ongoing disasters by leveraging the Dijkstra service.
+    ``smart_route`` accepts a start/end coordinate pair and returns a route
+    that attempts to avoid congestion and ongoing disasters by leveraging the
+    Dijkstra service. Pass ``?algorithm=astar`` to use the A* engine instead.
+    ``batch`` routes many pairs at once for the dispatch desk and
+    ``cache_stats`` exposes the route cache counters for monitoring.
     """
 
     @action(detail=False, methods=["get"])
@@ -47,9 +70,76 @@ class RouteViewSet(viewsets.ViewSet):
                 status=400,
             )
 
-        result = compute_smart_route((start_lat, start_lon), (end_lat, end_lon))
+        algorithm = params.get("algorithm", "dijkstra")
+        if algorithm not in ROUTING_ALGORITHMS:
+            return Response(
+                {"error": f"algorithm must be one of: {', '.join(ROUTING_ALGORITHMS)}"},
+                status=400,
+            )
+
+        result = compute_smart_route(
+            (start_lat, start_lon), (end_lat, end_lon), algorithm=algorithm
+        )
         return Response(result)
 
+    @action(detail=False, methods=["post"])
+    def batch(self, request):
+        """Route a list of start/end pairs against a single graph build.
+
+        Expects ``{"pairs": [{"start_lat", "start_lon", "end_lat",
+        "end_lon"}, ...], "algorithm": "dijkstra"}``. Pairs that are invalid
+        or fail to route get an ``error`` entry in their slot of ``results``.
+        """
+        pairs = request.data.get("pairs")
+        if not isinstance(pairs, list) or not pairs:
+            return Response({"error": "pairs must be a non-empty list"}, status=400)
+
+        max_pairs = getattr(settings, "ROUTE_BATCH_MAX_PAIRS", 100)
+        if len(pairs) > max_pairs:
+            return Response(
+                {"error": f"at most {max_pairs} pairs can be routed per batch"},
+                status=400,
+            )
+
+        algorithm = request.data.get("algorithm", "dijkstra")
+        if algorithm not in ROUTING_ALGORITHMS:
+            return Response(
+                {"error": f"algorithm must be one of: {', '.join(ROUTING_ALGORITHMS)}"},
+                status=400,
+            )
+
+        results = [None] * len(pairs)
+        routable = []
+        for index, pair in enumerate(pairs):
+            try:
+                start = (float(pair["start_lat"]), float(pair["start_lon"]))
+                end = (float(pair["end_lat"]), float(pair["end_lon"]))
+            except (TypeError, ValueError, KeyError):
+                results[index] = {
+                    "error": "start_lat/start_lon/end_lat/end_lon must be provided and numeric"
+                }
+                continue
+            routable.append((index, (start, end)))
+
+        graph_version, routes = compute_batch_routes(
+            [pair for _, pair in routable], algorithm=algorithm
+        )
+        for (index, _), route in zip(routable, routes):
+            results[index] = route
+
+        return Response({
+            "algorithm": algorithm,
+            "graph_version": graph_version,
+            "results": [
+                {"index": index, **result} for index, result in enumerate(results)
+            ],
+        })
+
+    @action(detail=False, methods=["get"])
+    def cache_stats(self, request):
+        """Hit/miss/eviction counters of the route cache."""
+        return Response(route_cache.stats())
+
 
 class UserLocationViewSet(viewsets.ViewSet):
     """Handle user GPS location tracking and updates"""
@@ -68,25 +158,128 @@ class UserLocationViewSet(viewsets.ViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        location, created = UserLocation.objects.update_or_create(
-            user=request.user,
-            defaults={
+        # repeated fixes are coalesced and alerts only re-checked after a
+        # real move, see location_gate
+        now = timezone.now()
+        location = UserLocation.objects.filter(user=request.user).first()
+        write, evaluate = location_gate.check(location, latitude, longitude, now)
+
+        if write:
+            fields = {
                 'latitude': latitude,
                 'longitude': longitude,
                 'accuracy': float(accuracy) if accuracy else None,
-                'is_active': True
+                'is_active': True,
+                'fix_time': now,
             }
-        )
+            if evaluate:
+                fields.update(
+                    alerts_checked_at=now,
+                    alerts_checked_latitude=latitude,
+                    alerts_checked_longitude=longitude,
+                )
+            location, created = UserLocation.objects.update_or_create(
+                user=request.user,
+                defaults=fields
+            )
+        else:
+            # the newest fix of the window is written when it closes
+            location_gate.defer(location, latitude, longitude, float(accuracy) if accuracy else None, now)
 
-        # Trigger alert check for nearby disasters
-        self._check_nearby_disasters(request.user, (latitude, longitude))
+        if evaluate:
+            # Trigger alert check for nearby disasters
+            self._check_nearby_disasters(request.user, (latitude, longitude))
 
         serializer = UserLocationSerializer(location)
         return Response({
-            'message': 'Location updated successfully',
-            'data': serializer.data
+            'message': 'Location updated successfully' if write else 'Location update deferred (coalesced)',
+            'data': serializer.data,
+            'alerts_checked': evaluate,
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["post"])
+    def batch_update(self, request):
+        """Store GPS fixes buffered by vehicles and field devices.
+
+        Expects ``{"fixes": [{"latitude", "longitude", "timestamp",
+        "accuracy", "user_id"}, ...]}`` with ``accuracy`` optional and
+        ``user_id`` defaulting to the caller; only staff (service) accounts
+        may send fixes for other users. The newest fix of each user is
+        stored and alerts are checked once per user. Invalid fixes get an
+        ``error`` entry in ``errors`` and the rest are still stored.
+        """
+        fixes = request.data.get("fixes")
+        if not isinstance(fixes, list) or not fixes:
+            return Response({"error": "fixes must be a non-empty list"}, status=400)
+
+        max_fixes = getattr(settings, "LOCATION_BATCH_MAX_FIXES", 1000)
+        if len(fixes) > max_fixes:
+            return Response(
+                {"error": f"at most {max_fixes} fixes can be sent per batch"},
+                status=400,
+            )
+
+        errors, parsed = [], []
+        for index, fix in enumerate(fixes):
+            try:
+                user_id = int(fix.get("user_id", request.user.id))
+                latitude = float(fix["latitude"])
+                longitude = float(fix["longitude"])
+                accuracy = float(fix["accuracy"]) if fix.get("accuracy") else None
+                timestamp = parse_datetime(str(fix["timestamp"]))
+            except (TypeError, ValueError, KeyError, AttributeError):
+                errors.append({
+                    "index": index,
+                    "error": "latitude/longitude/timestamp must be provided and valid"
+                })
+                continue
+            if timestamp is None:
+                errors.append({"index": index, "error": "timestamp must be ISO 8601"})
+                continue
+            if not (
+                math.isfinite(latitude) and math.isfinite(longitude)
+                and -90 <= latitude <= 90 and -180 <= longitude <= 180
+            ) or (accuracy is not None and not math.isfinite(accuracy)):
+                errors.append({"index": index, "error": "latitude/longitude/accuracy out of range"})
+                continue
+            if user_id != request.user.id and not request.user.is_staff:
+                errors.append({"index": index, "error": "only service accounts may send fixes for other users"})
+                continue
+            if timezone.is_naive(timestamp):
+                timestamp = timezone.make_aware(timestamp)
+            parsed.append((index, user_id, (latitude, longitude, accuracy, timestamp)))
+
+        users = User.objects.in_bulk({user_id for _, user_id, _ in parsed})
+        latest, superseded = {}, 0
+        for index, user_id, fix in parsed:
+            if user_id not in users:
+                errors.append({"index": index, "error": "unknown user"})
+                continue
+            if user_id in latest:
+                superseded += 1
+            if user_id not in latest or fix[3] > latest[user_id][3]:
+                latest[user_id] = fix
+
+        # points superseded within the batch never reach the gate
+        location_gate.coalesce(superseded)
+        with transaction.atomic():
+            stats, evaluated = store_fixes(latest, timezone.now())
+            for user_id, latitude, longitude in evaluated:
+                self._check_nearby_disasters(users[user_id], (latitude, longitude))
+
+        return Response({
+            "received": len(fixes),
+            "users": len(latest),
+            **stats,
+            "alerts_checked": len(evaluated),
+            "errors": sorted(errors, key=lambda error: error["index"]),
         }, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=["get"])
+    def gate_stats(self, request):
+        """Counters of written, coalesced and alert-checked GPS fixes."""
+        return Response(location_gate.stats())
+
     @action(detail=False, methods=["get"])
     def get_location(self, request):
         """Get user's current location"""
@@ -101,49 +294,8 @@ class UserLocationViewSet(viewsets.ViewSet):
             )
 
     def _check_nearby_disasters(self, user, user_location):
-        """Check if user is near any active disasters and create alerts"""
-        try:
-            prefs = UserAlertPreference.objects.get(user=user)
-        except UserAlertPreference.DoesNotExist:
-            # Create default preferences if not exist
-            prefs = UserAlertPreference.objects.create(
-                user=user,
-                alert_radius_km=5,
-                min_severity=5,
-                disaster_types=['flood', 'fire', 'earthquake', 'cyclone', 'heatwave']
-            )
-
-        if not prefs.alert_enabled:
-            return
-
-        # Find nearby active disasters
-        active_disasters = Disaster.objects.filter(status='active')
-
-        for disaster in active_disasters:
-            # Skip if alert already sent
-            if DisasterAlert.objects.filter(user=user, disaster=disaster).exists():
-                continue
-
-            # Check if within alert radius
-            if check_user_in_danger_zone(
-                user_location, 
-                (disaster.latitude, disaster.longitude),
-                radius_km=prefs.alert_radius_km
-            ):
-                # Check disaster type and severity
-                if (disaster.disaster_type in prefs.disaster_types and 
-                    disaster.severity >= prefs.min_severity):
-                    
-                    # Compute evacuation route
-                    route_data = compute_evacuation_route(user_location, disaster)
-
-                    # Create alert record
-                    DisasterAlert.objects.create(
-                        user=user,
-                        disaster=disaster,
-                        distance_km=route_data.get('distance_km', 0),
-                        evacuation_route=route_data
-                    )
+        """Queue the alert check for this location; returns immediately."""
+        queue_user_alerts(user, *user_location)
 
 
 class UserAlertPreferenceViewSet(viewsets.ViewSet):
@@ -168,6 +320,8 @@ class UserAlertPreferenceViewSet(viewsets.ViewSet):
             
             if serializer.is_valid():
                 serializer.save()
+                # re-check alerts on the next fix even if the user stays put
+                UserLocation.objects.filter(user=request.user).update(alerts_checked_at=None)
                 return Response(serializer.data, status=status.HTTP_200_OK)
             else:
                 return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -213,24 +367,48 @@ class DisasterAlertViewSet(viewsets.ViewSet):
 
     @action(detail=False, methods=["post"])
     def get_evacuation_route(self, request):
-        """Get evacuation route for a specific disaster"""
+        """Get evacuation route for a specific disaster.
+
+        Routes are shared per origin cell (see evacuation_service), so a
+        neighbour's request usually answers this one straight away. A cell
+        without a plan is planned by a background job; until it finishes
+        the response is ``202`` with ``status: pending`` and the client
+        asks again.
+        """
         disaster_id = request.data.get('disaster_id')
+        multi_target = request.data.get('mode') == 'multi'
         try:
             user_loc = UserLocation.objects.get(user=request.user)
             disaster = Disaster.objects.get(id=disaster_id)
-            
-            route_data = compute_evacuation_route(
-                (user_loc.latitude, user_loc.longitude),
-                disaster
-            )
-            
-            return Response(route_data, status=status.HTTP_200_OK)
-        except (UserLocation.DoesNotExist, Disaster.DoesNotExist) as e:
+        except (UserLocation.DoesNotExist, Disaster.DoesNotExist, ValueError) as e:
             return Response(
                 {"error": str(e)},
                 status=status.HTTP_404_NOT_FOUND
             )
 
+        cell = plan_cell(user_loc.latitude, user_loc.longitude)
+        version = plan_version(disaster)
+        plan = cached_plan(disaster, cell, multi_target, version)
+        if plan is None:
+            job = queue_plan(disaster, cell, multi_target, version)
+            # in eager mode the job has already run
+            plan = cached_plan(disaster, cell, multi_target, version)
+
+        if plan is not None:
+            if not multi_target:
+                # the default route is also kept on the user's alert
+                DisasterAlert.objects.filter(
+                    user=request.user, disaster=disaster, evacuation_route__isnull=True
+                ).update(evacuation_route=plan)
+            return Response(plan, status=status.HTTP_200_OK)
+        job.refresh_from_db()
+        if job.status == 'failed':
+            return Response(
+                {"error": "Could not compute evacuation route"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        return Response({"status": "pending", "job": job.id}, status=status.HTTP_202_ACCEPTED)
+
 
 class EvacuationZoneViewSet(viewsets.ModelViewSet):
     """Manage evacuation zones for disasters"""
@@ -251,6 +429,25 @@ class EvacuationZoneViewSet(viewsets.ModelViewSet):
         serializer = EvacuationZoneSerializer(zones, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=["post"])
+    def build(self, request):
+        """Generate a disaster's zones from its severity and count the
+        tracked users in each (critical disasters get this automatically)"""
+        try:
+            disaster = Disaster.objects.get(id=request.data.get('disaster_id'))
+        except (Disaster.DoesNotExist, ValueError) as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        stats = build_zones(disaster)
+        zones = EvacuationZone.objects.filter(disaster=disaster).order_by('zone_number')
+        return Response({
+            **stats,
+            "results": EvacuationZoneSerializer(zones, many=True).data,
+        })
+
 
 # ---------------------------------------------------------------------------
 # simple search/geocode endpoints used by the React frontend
@@ -305,7 +502,11 @@ class SearchView(APIView):
 
 
 class SearchInfoView(APIView):
-    """Return counts of traffic & disasters within a radius around a point."""
+    """Return counts of traffic & disasters within a radius around a point.
+
+    ``?breakdown=true`` adds per-type disaster counts and the number of
+    blocked roads, computed in the same aggregate queries.
+    """
     permission_classes = [AllowAny]
 
     def get(self, request):
@@ -316,19 +517,90 @@ class SearchInfoView(APIView):
             return Response({"error": "invalid coordinates"}, status=400)
 
         radius_km = float(request.query_params.get("radius", 10))
+        breakdown = request.query_params.get("breakdown") in ("1", "true")
+
+        snapshot = hot_snapshot.get()
+        if snapshot is not None:
+            return Response(self.counts_from_snapshot(snapshot, lat, lon, radius_km, breakdown))
+
+        traffic_breakdowns = {}
+        disaster_breakdowns = {}
+        if breakdown:
+            traffic_breakdowns["blocked"] = Q(is_blocked=True)
+            for disaster_type, _ in Disaster.DISASTER_TYPES:
+                disaster_breakdowns[disaster_type] = Q(disaster_type=disaster_type)
+
+        traffic = radius_counts(TrafficIncident.objects.all(), lat, lon, radius_km, **traffic_breakdowns)
+        disasters = radius_counts(Disaster.objects.all(), lat, lon, radius_km, **disaster_breakdowns)
+
+        data = {
+            "traffic_count": traffic["count"],
+            "disaster_count": disasters["count"],
+        }
+        if breakdown:
+            data["blocked_road_count"] = traffic["blocked"]
+            data["disaster_type_counts"] = {
+                disaster_type: disasters[disaster_type] for disaster_type, _ in Disaster.DISASTER_TYPES
+            }
 
-        tcount = 0
-        for t in TrafficIncident.objects.all():
-            if haversine(lat, lon, t.latitude, t.longitude) <= radius_km:
-                tcount += 1
+        return Response(data)
+
+    @staticmethod
+    def counts_from_snapshot(snapshot, lat, lon, radius_km, breakdown):
+        traffic, _ = snapshot.within("traffic", lat, lon, radius_km)
+        disasters, _ = snapshot.within("disasters", lat, lon, radius_km)
+
+        data = {
+            "traffic_count": len(traffic),
+            "disaster_count": len(disasters),
+        }
+        if breakdown:
+            data["blocked_road_count"] = int(snapshot.column("traffic", "is_blocked")[traffic].sum())
+            types = snapshot.column("disasters", "disaster_type")[disasters]
+            data["disaster_type_counts"] = {
+                disaster_type: int((types == disaster_type).sum()) for disaster_type, _ in Disaster.DISASTER_TYPES
+            }
+        return data
 
-        dcount = 0
-        for d in Disaster.objects.all():
-            if haversine(lat, lon, d.latitude, d.longitude) <= radius_km:
-                dcount += 1
 
-        return Response({
-            "traffic_count": tcount,
-            "disaster_count": dcount,
-        })
+# ---------------------------------------------------------------------------
+# server-sent events for alerts and map changes (served through config.asgi)
+# ---------------------------------------------------------------------------
+
+def _token_user_id(token):
+    auth = JWTAuthentication()
+    return auth.get_user(auth.get_validated_token(token)).id
+
+
+async def event_stream(request):
+    """Stream ``alert`` events for the user and ``disaster``/``traffic`` changes.
 
+    EventSource cannot send headers, so the JWT access token comes as
+    ``?token=``; without one only the public map events are sent. A
+    reconnecting client resumes after ``Last-Event-ID`` (or
+    ``?last_event_id=``).
+    """
+    if not isinstance(request, ASGIRequest):
+        # a WSGI worker would be held for the life of the connection
+        return JsonResponse({"error": "event stream requires the ASGI server"}, status=503)
+
+    user_id = None
+    token = request.GET.get("token")
+    if token:
+        try:
+            user_id = await sync_to_async(_token_user_id)(token)
+        except AuthenticationFailed:
+            return JsonResponse({"error": "invalid token"}, status=401)
+
+    last_event_id, holes = None, ()
+    cursor = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+    if cursor:
+        try:
+            last_event_id, holes = parse_cursor(cursor)
+        except ValueError:
+            pass
+
+    response = StreamingHttpResponse(stream(user_id, last_event_id, holes), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -3,6 +3,8 @@ from django.utils import timezone
 from datetime import timedelta
 
 from apps.disasters.models import Disaster
+from apps.core.services.hot_snapshot import hot_snapshot
+from apps.core.services.event_stream import publish_changes
 
 
 class Command(BaseCommand):
@@ -14,18 +16,26 @@ class Command(BaseCommand):
         # Archive active disasters older than 24 hours
         cutoff_active = now - timedelta(hours=24)
 
-        active_updated = Disaster.objects.filter(
+        active = Disaster.objects.filter(
             status='active',
             created_at__lte=cutoff_active
-        ).update(status='archived')
+        )
+        expired = list(active.values_list('id', flat=True))
+        active_updated = active.update(status='archived')
 
         # Archive critical disasters older than 48 hours
         cutoff_critical = now - timedelta(hours=48)
 
-        critical_updated = Disaster.objects.filter(
+        critical = Disaster.objects.filter(
             status='critical',
             created_at__lte=cutoff_critical
-        ).update(status='archived')
+        )
+        expired += critical.values_list('id', flat=True)
+        critical_updated = critical.update(status='archived')
+
+        if active_updated or critical_updated:
+            hot_snapshot.invalidate()
+            publish_changes('disaster', expired)
 
         self.stdout.write(
             self.style.SUCCESS(
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.2 on 2026-10-17 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('disasters', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='disaster',
+            index=models.Index(fields=['latitude', 'longitude'], name='disaster_lat_lon_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-17 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('disasters', '0002_disaster_disaster_lat_lon_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='disaster',
+            name='geohash',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=12),
+        ),
+    ]
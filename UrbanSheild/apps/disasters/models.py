@@ -1,8 +1,8 @@
 from django.db import models
-from django.core.mail import send_mail
 
-from apps.core.utils import haversine
-from apps.authorities.models import Authority
+from apps.core.services.spatial_query import within_radius
+from apps.core.services.knn_index import authority_index
+from apps.core.services.job_queue import enqueue
 
 
 class Disaster(models.Model):
@@ -25,6 +25,7 @@ class Disaster(models.Model):
     disaster_type = models.CharField(max_length=20, choices=DISASTER_TYPES)
     latitude = models.FloatField()
     longitude = models.FloatField()
+    geohash = models.CharField(max_length=12, default='', editable=False, db_index=True)
     severity = models.IntegerField()
     confidence_score = models.FloatField(default=1.0)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
@@ -32,6 +33,11 @@ class Disaster(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     resolved_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['latitude', 'longitude'], name='disaster_lat_lon_idx'),
+        ]
+
     def __str__(self):
         return f"{self.disaster_type} - {self.status}"
 
@@ -58,47 +64,45 @@ class Disaster(models.Model):
             created_at__gte=recent_time
         )
 
-        cluster_count = 0
-
-        for report in nearby_reports:
-            distance = haversine(
-                self.latitude,
-                self.longitude,
-                report.latitude,
-                report.longitude
-            )
-            if distance <= 3:  # within 3 km
-                cluster_count += 1
+        cluster_count = within_radius(nearby_reports, self.latitude, self.longitude, 3).count()  # within 3 km
 
         if cluster_count >= 5:
-            Disaster.objects.filter(
+            cluster = Disaster.objects.filter(
                 disaster_type=self.disaster_type,
                 created_at__gte=recent_time
-            ).update(status='critical')
+            )
+            escalated = list(cluster.exclude(status='critical').values_list('id', flat=True))
+            cluster.update(status='critical')
+
+            # queryset updates bypass the signals that refresh the map snapshot
+            # and push alerts (and zones) for escalated disasters
+            from apps.core.services.hot_snapshot import hot_snapshot
+            from apps.core.services.alert_service import queue_fan_out
+            from apps.core.services.event_stream import publish_changes
+            from apps.core.services.zone_service import queue_zones
+            hot_snapshot.invalidate()
+            queue_fan_out(escalated, status='critical')
+            queue_zones(escalated)
+            publish_changes('disaster', escalated)
 
         # -----------------------------
         # AUTO ESCALATION (ONLY ONCE)
         # -----------------------------
         if self.status == 'critical' and not EscalationLog.objects.filter(disaster=self).exists():
 
-            nearest_authority = None
-            min_distance = float('inf')
+            nearest_authority = next(iter(authority_index.nearest(self.latitude, self.longitude)), None)
 
-            for authority in Authority.objects.all():
-                distance = haversine(
-                    self.latitude,
-                    self.longitude,
-                    authority.latitude,
-                    authority.longitude
+            if nearest_authority:
+                log = EscalationLog.objects.create(
+                    disaster=self,
+                    authority_name=nearest_authority.name,
+                    email_sent=False
                 )
-                if distance < min_distance:
-                    min_distance = distance
-                    nearest_authority = authority
 
-            if nearest_authority:
-                send_mail(
-                    subject=f"Emergency Alert - {self.disaster_type.upper()}",
-                    message=f"""
+                # sent by a job worker, which marks the log as sent
+                enqueue("send_mail", {
+                    "subject": f"Emergency Alert - {self.disaster_type.upper()}",
+                    "message": f"""
 Disaster Type: {self.disaster_type}
 Severity: {self.severity}
 Location: {self.latitude}, {self.longitude}
@@ -107,15 +111,9 @@ Status: CRITICAL
 Cluster detected in region.
 Immediate action required.
 """,
-                    from_email=None,
-                    recipient_list=[nearest_authority.email],
-                )
-
-                EscalationLog.objects.create(
-                    disaster=self,
-                    authority_name=nearest_authority.name,
-                    email_sent=True
-                )
+                    "recipient_list": [nearest_authority.email],
+                    "escalation_log_id": log.id,
+                }, key=f"escalation-mail:{log.id}")
 
 
 class EscalationLog(models.Model):
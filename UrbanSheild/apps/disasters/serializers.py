@@ -5,7 +5,7 @@ from .models import Disaster, EscalationLog
 class DisasterSerializer(serializers.ModelSerializer):
     class Meta:
         model = Disaster
-        fields = '__all__'
+        exclude = ['geohash']
 
 
 class EscalationLogSerializer(serializers.ModelSerializer):
@@ -1,25 +1,33 @@
+import numpy as np
 from rest_framework import viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.exceptions import ValidationError
 
-from django.core.mail import send_mail
 from django.conf import settings
 
 from .models import Disaster, EscalationLog
 from .serializers import DisasterSerializer, EscalationLogSerializer
 
 from apps.shelters.models import Shelter
-from apps.authorities.models import Authority
 from apps.traffic.models import TrafficIncident
 
 from apps.shelters.serializers import ShelterSerializer
 from apps.authorities.serializers import AuthoritySerializer
 
-from apps.core.utils import haversine, UTTARAKHAND_BOUNDS, is_within_uttarakhand
+from apps.core.utils import (
+    haversine_many, pairs_within, as_columns,
+    UTTARAKHAND_BOUNDS, is_within_uttarakhand,
+)
+from apps.core.services.spatial_query import within_radius
+from apps.core.services.knn_index import authority_index
+from apps.core.services.hot_snapshot import snapshot_list
+from apps.core.services.alert_service import queue_fan_out
+from apps.core.services.zone_service import queue_zones
+from apps.core.services.job_queue import enqueue
 from apps.core.services.earthquake_service import fetch_earthquakes_uttarakhand
 from apps.core.services.weather_service import fetch_uttarakhand_weather_disasters
-from apps.core.services.dijkstra_route_service import find_best_route
+from apps.core.services.dijkstra_route_service import find_best_route, ROUTING_ALGORITHMS
 from apps.core.services.escalation_service import escalate_disaster
 
 
@@ -44,11 +52,17 @@ class DisasterViewSet(viewsets.ModelViewSet):
         except (TypeError, ValueError):
             return queryset
 
-        in_radius_ids = [
-            d.id for d in queryset
-            if haversine(lat, lon, d.latitude, d.longitude) <= radius_km
-        ]
-        return queryset.filter(id__in=in_radius_ids).order_by("-created_at")
+        order_by = "distance_km" if self.request.query_params.get("ordering") == "distance" else "-created_at"
+        return within_radius(queryset, lat, lon, radius_km, order_by=order_by)
+
+    # ----------------------------------------
+    # ⚡ Serve the list from the shared snapshot
+    # ----------------------------------------
+    def list(self, request, *args, **kwargs):
+        rows = snapshot_list("disasters", request.query_params)
+        if rows is None:
+            return super().list(request, *args, **kwargs)
+        return Response(rows)
 
     # ----------------------------------------
     # 🔒 Prevent creation outside Uttarakhand
@@ -92,49 +106,33 @@ class DisasterViewSet(viewsets.ModelViewSet):
             longitude__lte=UTTARAKHAND_BOUNDS["max_lon"],
         )
 
-        for shelter in shelters:
-            distance = haversine(lat, lon, shelter.latitude, shelter.longitude)
-
-            if distance < 1:
-                distance += 5
-
-            congestion_penalty = 0
+        s_ids, s_lats, s_lons = as_columns(shelters.values_list("id", "latitude", "longitude"), 3)
+        if len(s_ids):
+            distances = haversine_many(lat, lon, s_lats, s_lons)
+            distances = np.where(distances < 1, distances + 5, distances)
 
-            for traffic in traffic_points:
-                traffic_distance = haversine(
-                    shelter.latitude,
-                    shelter.longitude,
-                    traffic.latitude,
-                    traffic.longitude,
-                )
-
-                if traffic_distance < 2:
-                    congestion_penalty += traffic.congestion_level
-                    if traffic.is_blocked:
-                        congestion_penalty += 20
-
-            route_score = distance + congestion_penalty
-
-            if route_score < best_route_score:
-                best_route_score = route_score
-                nearest_shelter = shelter
-                shelter_distance = distance
+            # every traffic point within 2 km of a shelter adds its
+            # congestion, plus 20 when the road is blocked; the spatial join
+            # only visits traffic in the grid cells around each shelter
+            t_lats, t_lons, congestion, blocked = as_columns(
+                traffic_points.values_list("latitude", "longitude", "congestion_level", "is_blocked"), 4
+            )
+            shelter_at, traffic_at, traffic_distances = pairs_within(s_lats, s_lons, t_lats, t_lons, 2)
+            near = traffic_distances < 2
+            congestion_penalty = np.bincount(
+                shelter_at[near],
+                weights=(congestion + 20 * blocked)[traffic_at[near]],
+                minlength=len(s_ids),
+            )
 
-        nearest_authority = None
-        min_authority_distance = float("inf")
+            route_scores = distances + congestion_penalty
+            best = int(route_scores.argmin())
 
-        authorities = Authority.objects.filter(
-            latitude__gte=UTTARAKHAND_BOUNDS["min_lat"],
-            latitude__lte=UTTARAKHAND_BOUNDS["max_lat"],
-            longitude__gte=UTTARAKHAND_BOUNDS["min_lon"],
-            longitude__lte=UTTARAKHAND_BOUNDS["max_lon"],
-        )
+            best_route_score = float(route_scores[best])
+            nearest_shelter = Shelter.objects.get(id=int(s_ids[best]))
+            shelter_distance = float(distances[best])
 
-        for authority in authorities:
-            distance = haversine(lat, lon, authority.latitude, authority.longitude)
-            if distance < min_authority_distance:
-                min_authority_distance = distance
-                nearest_authority = authority
+        nearest_authority = next(iter(authority_index.nearest(lat, lon, bounds=UTTARAKHAND_BOUNDS)), None)
 
         return Response({
             "disaster": DisasterSerializer(disaster).data,
@@ -156,32 +154,22 @@ class DisasterViewSet(viewsets.ModelViewSet):
 
         lat, lon = disaster.latitude, disaster.longitude
 
-        authorities = Authority.objects.filter(
-            latitude__gte=UTTARAKHAND_BOUNDS["min_lat"],
-            latitude__lte=UTTARAKHAND_BOUNDS["max_lat"],
-            longitude__gte=UTTARAKHAND_BOUNDS["min_lon"],
-            longitude__lte=UTTARAKHAND_BOUNDS["max_lon"],
-        )
-
-        nearest_authority = None
-        min_distance = float("inf")
-
-        for authority in authorities:
-            distance = haversine(lat, lon, authority.latitude, authority.longitude)
-            if distance < min_distance:
-                min_distance = distance
-                nearest_authority = authority
+        nearest_authority = next(iter(authority_index.nearest(lat, lon, bounds=UTTARAKHAND_BOUNDS)), None)
 
         if not nearest_authority:
             return Response({"error": "No authority found"}, status=400)
 
         recipient = getattr(settings, "EMAIL_TEST_RECIPIENT", None) or nearest_authority.email
 
-        email_sent = False
-        try:
-            send_mail(
-                subject=f"Emergency Alert - {disaster.disaster_type.upper()}",
-                message=f"""
+        # the log starts unsent; the mail job marks it once SMTP accepts it
+        log = EscalationLog.objects.create(
+            disaster=disaster,
+            authority_name=nearest_authority.name,
+            email_sent=False,
+        )
+        enqueue("send_mail", {
+            "subject": f"Emergency Alert - {disaster.disaster_type.upper()}",
+            "message": f"""
 Disaster Type: {disaster.disaster_type}
 Severity: {disaster.severity}
 Location: {lat}, {lon}
@@ -189,24 +177,21 @@ Status: {disaster.status}
 
 Immediate action recommended.
 """,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[recipient],
-                fail_silently=False,
-            )
-            email_sent = True
-        except Exception:
-            email_sent = False
+            "from_email": settings.DEFAULT_FROM_EMAIL,
+            "recipient_list": [recipient],
+            "escalation_log_id": log.id,
+        }, key=f"escalation-mail:{log.id}")
 
-        EscalationLog.objects.create(
-            disaster=disaster,
-            authority_name=nearest_authority.name,
-            email_sent=email_sent,
-        )
+        # users near the disaster hear about it along with the authority
+        alert_job, = queue_fan_out([disaster.id])
+        zones_job, = queue_zones([disaster.id])
 
         return Response({
             "message": "Escalation triggered successfully",
             "authority_notified": nearest_authority.name,
-            "email_sent": email_sent
+            "email_queued": True,
+            "alert_job": alert_job.id,
+            "zones_job": zones_job.id,
         })
 
     # ----------------------------------------
@@ -225,7 +210,24 @@ Immediate action recommended.
     # ----------------------------------------
     @action(detail=True, methods=["get"])
     def smart_route(self, request, pk=None):
-        return Response(find_best_route(pk))
+        algorithm = request.query_params.get("algorithm", "dijkstra")
+        if algorithm not in ROUTING_ALGORITHMS:
+            return Response(
+                {"error": f"algorithm must be one of: {', '.join(ROUTING_ALGORITHMS)}"},
+                status=400,
+            )
+
+        # mode=multi routes to every active shelter in one search and keeps
+        # the cheapest by graph cost, settling up to k shelters
+        multi_target = request.query_params.get("mode") == "multi"
+        try:
+            k = max(1, int(request.query_params.get("k", 1)))
+        except (TypeError, ValueError):
+            return Response({"error": "k must be an integer"}, status=400)
+
+        return Response(find_best_route(
+            pk, algorithm=algorithm, multi_target=multi_target, k=k
+        ))
 
 
 class EscalationLogViewSet(viewsets.ModelViewSet):
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-17 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shelters', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shelter',
+            name='geohash',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=12),
+        ),
+    ]
@@ -6,6 +6,7 @@ class Shelter(models.Model):
     name = models.CharField(max_length=255)
     latitude = models.FloatField()
     longitude = models.FloatField()
+    geohash = models.CharField(max_length=12, default='', editable=False, db_index=True)
 
     capacity = models.IntegerField()
     current_occupancy = models.IntegerField(default=0)
@@ -13,6 +14,7 @@ class Shelter(models.Model):
     contact = models.CharField(max_length=20)
 
     is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # Lets the nearest-row indexes spot edits
 
     def __str__(self):
         return self.name
\ No newline at end of file
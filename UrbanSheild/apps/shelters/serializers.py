@@ -5,4 +5,4 @@ from .models import Shelter
 class ShelterSerializer(serializers.ModelSerializer):
     class Meta:
         model = Shelter
-        fields = '__all__'
\ No newline at end of file
+        exclude = ['geohash']
\ No newline at end of file
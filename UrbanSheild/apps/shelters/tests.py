@@ -1,3 +1,86 @@
-from django.test import TestCase
+import random
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+
+from apps.core.services.knn_index import KDTree, shelter_index, unit_vectors
+from apps.core.utils import haversine
+from .models import Shelter
+
+
+class KDTreeTests(SimpleTestCase):
+    """k-nearest queries against sorted brute-force distances."""
+
+    def test_matches_sorted_distances(self):
+        rng = np.random.default_rng(1)
+        lats, lons = rng.uniform(29, 31.5, 2000), rng.uniform(77.5, 81, 2000)
+        points = unit_vectors(lats, lons)
+        tree = KDTree(points)
+
+        for _ in range(50):
+            query = unit_vectors([rng.uniform(29, 31.5)], [rng.uniform(77.5, 81)])[0]
+            k = int(rng.integers(1, 40))
+            squared = ((points - query) ** 2).sum(axis=1)
+            expected = sorted(range(len(points)), key=lambda i: (squared[i], i))[:k]
+            self.assertEqual([index for _, index in tree.query(query, k)], expected)
+
+    def test_small_and_empty_trees(self):
+        self.assertEqual(KDTree(np.empty((0, 3))).query(np.zeros(3), 3), [])
+        points = unit_vectors([30, 30.1], [78, 78.1])
+        self.assertEqual([index for _, index in KDTree(points).query(points[1], 5)], [1, 0])
+
+
+class NearestShelterTests(TestCase):
+
+    def setUp(self):
+        rng = random.Random(2)
+        for i in range(40):
+            Shelter.objects.create(
+                name=f"Shelter {i}", latitude=rng.uniform(29, 31), longitude=rng.uniform(78, 80),
+                capacity=100, contact="1", is_active=rng.random() < 0.7,
+            )
+        shelter_index.invalidate()
+
+    def expected(self, lat, lon, k):
+        return sorted(
+            (haversine(lat, lon, shelter.latitude, shelter.longitude), shelter.id)
+            for shelter in Shelter.objects.filter(is_active=True)
+        )[:k]
+
+    def test_nearest_matches_haversine(self):
+        for lat, lon in [(30, 79), (29.1, 78.2), (31.5, 80.5)]:
+            found = shelter_index.nearest(lat, lon, 5, is_active=True)
+            expected = self.expected(lat, lon, 5)
+            self.assertEqual([shelter.id for shelter in found], [pk for _, pk in expected])
+            for shelter, (distance, _) in zip(found, expected):
+                self.assertAlmostEqual(shelter.distance_km, distance)
+
+    def test_rows_changed_elsewhere_are_replaced(self):
+        shelter_index.nearest(30, 79, 3, is_active=True)
+        closest = [pk for _, pk in self.expected(30, 79, 2)]
+
+        # queryset writes reach no signal, as when another worker made them
+        Shelter.objects.filter(id=closest[0]).update(is_active=False)
+        Shelter.objects.filter(id=closest[1]).delete()
+
+        found = shelter_index.nearest(30, 79, 3, is_active=True)
+        self.assertEqual([shelter.id for shelter in found], [pk for _, pk in self.expected(30, 79, 3)])
+
+    def test_rows_moved_or_added_elsewhere_are_found(self):
+        shelter_index.nearest(30, 79, 3, is_active=True)
+        moved = Shelter.objects.filter(is_active=True).exclude(
+            id__in=[pk for _, pk in self.expected(30, 79, 3)]
+        ).first()
+
+        # saved by another worker: this process's index gets no signal
+        with mock.patch.object(shelter_index, "invalidate"):
+            moved.latitude, moved.longitude = 30.001, 79.001
+            moved.save()
+        Shelter.objects.bulk_create([Shelter(
+            name="Added", latitude=29.999, longitude=78.999, capacity=10, contact="1",
+        )])
+
+        found = shelter_index.nearest(30, 79, 3, is_active=True)
+        self.assertEqual([shelter.id for shelter in found], [pk for _, pk in self.expected(30, 79, 3)])
+        self.assertIn(moved.id, [shelter.id for shelter in found])
@@ -3,7 +3,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from .models import Shelter
 from .serializers import ShelterSerializer
-from apps.core.utils import haversine
+from apps.core.services.knn_index import shelter_index
 
 
 class ShelterViewSet(viewsets.ModelViewSet):
@@ -21,20 +21,31 @@ class ShelterViewSet(viewsets.ModelViewSet):
         lat = float(lat)
         lon = float(lon)
 
-        nearest_shelter = None
-        min_distance = float('inf')
+        k = request.query_params.get('k')
+        if k is not None:
+            # top-k variant: every shelter with its distance, closest first
+            try:
+                k = max(1, min(int(k), 50))
+            except ValueError:
+                return Response({"error": "k must be an integer"}, status=400)
 
-        for shelter in Shelter.objects.filter(is_active=True):
-            distance = haversine(lat, lon, shelter.latitude, shelter.longitude)
-            if distance < min_distance:
-                min_distance = distance
-                nearest_shelter = shelter
+            return Response({
+                "results": [
+                    {
+                        "shelter": ShelterSerializer(shelter).data,
+                        "distance_km": round(shelter.distance_km, 2),
+                    }
+                    for shelter in shelter_index.nearest(lat, lon, k, is_active=True)
+                ]
+            })
 
-        if nearest_shelter:
+        found = shelter_index.nearest(lat, lon, is_active=True)
+
+        if found:
+            nearest_shelter = found[0]
             return Response({
                 "shelter": ShelterSerializer(nearest_shelter).data,
-                "distance_km": round(min_distance, 2)
+                "distance_km": round(nearest_shelter.distance_km, 2)
             })
 
         return Response({"message": "No shelter found"})
-
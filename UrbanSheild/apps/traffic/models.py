@@ -5,12 +5,18 @@ class TrafficIncident(models.Model):
 
     latitude = models.FloatField()
     longitude = models.FloatField()
+    geohash = models.CharField(max_length=12, default='', editable=False, db_index=True)
 
     congestion_level = models.IntegerField()  # 1-10
     is_blocked = models.BooleanField(default=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['latitude', 'longitude'], name='traffic_lat_lon_idx'),
+        ]
+
     def __str__(self):
         return f"Congestion {self.congestion_level} - Blocked: {self.is_blocked}"
     
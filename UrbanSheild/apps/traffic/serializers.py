@@ -5,4 +5,4 @@ from .models import TrafficIncident
 class TrafficIncidentSerializer(serializers.ModelSerializer):
     class Meta:
         model = TrafficIncident
-        fields = '__all__'
\ No newline at end of file
+        exclude = ['geohash']
\ No newline at end of file
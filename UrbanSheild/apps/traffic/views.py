@@ -6,7 +6,9 @@ from rest_framework.permissions import AllowAny
 from .models import TrafficIncident
 from .serializers import TrafficIncidentSerializer
 
-from apps.core.utils import UTTARAKHAND_BOUNDS, haversine
+from apps.core.utils import UTTARAKHAND_BOUNDS
+from apps.core.services.spatial_query import within_radius
+from apps.core.services.hot_snapshot import snapshot_list
 from apps.core.services.smart_traffic_service import fetch_real_uttarakhand_traffic
 
 
@@ -30,11 +32,16 @@ class TrafficIncidentViewSet(viewsets.ModelViewSet):
         except (TypeError, ValueError):
             return queryset
 
-        in_radius_ids = [
-            t.id for t in queryset
-            if haversine(lat, lon, t.latitude, t.longitude) <= radius_km
-        ]
-        return queryset.filter(id__in=in_radius_ids)
+        # id order, as before radius queries moved into SQL
+        order_by = "distance_km" if self.request.query_params.get("ordering") == "distance" else "id"
+        return within_radius(queryset, lat, lon, radius_km, order_by=order_by)
+
+    # ⚡ Serve the list from the shared snapshot
+    def list(self, request, *args, **kwargs):
+        rows = snapshot_list("traffic", request.query_params, newest_first=False)
+        if rows is None:
+            return super().list(request, *args, **kwargs)
+        return Response(rows)
 
     # 🚦 Fetch real traffic from TomTom (Uttarakhand only)
     @action(detail=False, methods=["get"])
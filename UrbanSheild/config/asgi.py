@@ -3,6 +3,10 @@ ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The server-sent event stream at /api/stream/ only runs under an ASGI server,
+e.g. ``uvicorn config.asgi:application``; each open stream is a coroutine
+rather than a blocked worker thread.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
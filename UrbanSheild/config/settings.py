@@ -153,3 +153,99 @@ DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 # Developer-friendly fallback: if no creds present, log emails to console
 if DEBUG and (not EMAIL_HOST_USER or not EMAIL_HOST_PASSWORD):
     EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
+
+# Routing: the shared traffic/disaster graph is patched by model signals and
+# fully reloaded from the database once it is older than this many seconds.
+# Its nodes are packed into CSR arrays under ROUTING_GRAPH_PATH that all
+# workers mmap (None keeps them in process memory); later changes are laid
+# over them until more than ROUTING_GRAPH_OVERLAY_MAX nodes have changed,
+# then the arrays are repacked in the background.
+ROUTING_GRAPH_MAX_AGE = 300
+ROUTING_GRAPH_PATH = BASE_DIR / 'data' / 'routing_graph'
+ROUTING_GRAPH_OVERLAY_MAX = 64
+
+# Batch routing (POST /api/route/batch/)
+ROUTE_BATCH_MAX_PAIRS = 100
+ROUTE_BATCH_WORKERS = 8
+
+# Offline road network written by `manage.py import_road_network`; used by
+# routes requested with algorithm=road
+ROAD_NETWORK_PATH = BASE_DIR / 'data' / 'road_network'
+ROAD_OVERLAY_TRAFFIC_RADIUS_KM = 0.5
+ROAD_OVERLAY_BLOCKED_PENALTY_S = 3600
+
+# Route cache: coordinates are snapped to this grid (degrees, ~110 m) and
+# entries live for ROUTE_CACHE_TTL seconds or until the routing graph
+# changes; a TTL of 0 disables caching
+ROUTE_CACHE_TTL = 300
+ROUTE_CACHE_GRID_DEG = 0.001
+ROUTE_CACHE_MAX_ENTRIES = 1024
+
+# OSRM geometry client; point OSRM_BASE_URL at a local OSRM container or at
+# `manage.py run_fake_osrm` to avoid the public demo server
+OSRM_BASE_URL = os.getenv("OSRM_BASE_URL", "http://router.project-osrm.org")
+OSRM_MAX_CONCURRENCY = 8
+OSRM_TIMEOUT = 10
+OSRM_RETRIES = 2
+OSRM_CACHE_SIZE = 2048
+OSRM_CACHE_PRECISION = 5
+
+# Nearest shelter/authority k-d trees are rebuilt after a local change or,
+# to pick up writes from other workers, once older than this many seconds
+KNN_INDEX_MAX_AGE = 300
+
+# Columnar snapshot of map rows shared by all workers through mmap-ed .npy
+# files; rebuilt by a background job on change or once older than
+# HOT_SNAPSHOT_MAX_AGE seconds, serving the previous build meanwhile. When
+# no `run_jobs` worker picks the job up, a request rebuilds it instead once
+# the served build is older than HOT_SNAPSHOT_MAX_AGE.
+# Set HOT_SNAPSHOT_PATH to None to read straight from the database.
+HOT_SNAPSHOT_PATH = BASE_DIR / 'data' / 'hot_snapshot'
+HOT_SNAPSHOT_MAX_AGE = 60
+
+# Background jobs (mail, OSRM routing, alert fan-out) are stored in the Job
+# table and run by `manage.py run_jobs`. Failed jobs are retried up to
+# JOB_MAX_ATTEMPTS times, JOB_RETRY_BACKOFF * 2**n seconds apart; a running
+# job is reclaimed once its worker has held it for JOB_LOCK_TIMEOUT seconds.
+# Set JOB_QUEUE_EAGER=1 to run jobs in the web process without workers.
+JOB_QUEUE_EAGER = os.getenv("JOB_QUEUE_EAGER", "0") == "1"
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BACKOFF = 5
+JOB_RETRY_MAX_DELAY = 600
+JOB_LOCK_TIMEOUT = 300
+
+# Server-sent event stream (/api/stream/): each process polls the event
+# table every STREAM_POLL_INTERVAL seconds for all of its clients. A client
+# buffers at most STREAM_QUEUE_SIZE events before it is made to reconnect
+# and replay (up to STREAM_REPLAY_LIMIT) from its last event id; events are
+# kept for STREAM_EVENT_RETENTION seconds. Ids skipped over by a poll are
+# re-read for STREAM_LATE_COMMIT_S seconds in case their transaction
+# commits after a later one.
+STREAM_POLL_INTERVAL = 1.0
+STREAM_QUEUE_SIZE = 100
+STREAM_REPLAY_LIMIT = 1000
+STREAM_EVENT_RETENTION = 3600
+STREAM_LATE_COMMIT_S = 10
+STREAM_HEARTBEAT = 15
+
+# GPS updates (user-location/update_location/): fixes within
+# LOCATION_WRITE_WINDOW_S of the user's last write are held back on the row
+# and the newest of them is stored by a run_jobs worker when the window
+# closes (with JOB_QUEUE_EAGER and no worker the next fix replaces it), and
+# alerts are re-checked only after moving LOCATION_EVAL_MIN_DISTANCE_M
+# metres and LOCATION_EVAL_MIN_INTERVAL_S seconds since the last check
+LOCATION_WRITE_WINDOW_S = 5
+LOCATION_EVAL_MIN_DISTANCE_M = 100
+LOCATION_EVAL_MIN_INTERVAL_S = 30
+# Most fixes accepted in one user-location/batch_update/ request
+LOCATION_BATCH_MAX_FIXES = 1000
+
+# Shared evacuation plans: one route per EVACUATION_PLAN_GRID_DEG cell
+# (~550 m) per disaster, planned ahead for up to
+# EVACUATION_PLAN_PRECOMPUTE_MAX cells of the alerted users
+EVACUATION_PLAN_GRID_DEG = 0.005
+EVACUATION_PLAN_PRECOMPUTE_MAX = 100
+
+# Evacuation zones of critical disasters: EVACUATION_ZONE_COUNT rings, the
+# first max(2, severity / 2) km wide and each further one double the last
+EVACUATION_ZONE_COUNT = 3
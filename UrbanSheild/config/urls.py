@@ -9,7 +9,7 @@ from apps.traffic.views import TrafficIncidentViewSet
 from apps.core.views import (
     RouteViewSet, UserLocationViewSet, UserAlertPreferenceViewSet, 
     DisasterAlertViewSet, EvacuationZoneViewSet,
-    SearchView, SearchInfoView
+    SearchView, SearchInfoView, event_stream
 )
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
@@ -37,6 +37,8 @@ urlpatterns = [
     # custom search endpoints called by frontend search bar
     path('api/search/', SearchView.as_view(), name='search-geocode'),
     path('api/search/info/', SearchInfoView.as_view(), name='search-info'),
+    # server-sent alerts and map changes; needs the ASGI server (config.asgi)
+    path('api/stream/', event_stream, name='event-stream'),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 ]
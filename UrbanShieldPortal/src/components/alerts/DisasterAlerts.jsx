@@ -1,6 +1,7 @@
 import { useState, useEffect } from 'react'
 import { FaExclamationTriangle, FaTimes, FaMapMarkerAlt, FaArrowRight } from 'react-icons/fa'
 import api from '../../api/axios'
+import { useEventStream } from '../../hooks/useEventStream'
 import '../../styles/alerts.css'
 
 export default function DisasterAlerts({ hidden = false }) {
@@ -8,12 +9,23 @@ export default function DisasterAlerts({ hidden = false }) {
   const [loading, setLoading] = useState(false)
   const [selectedAlert, setSelectedAlert] = useState(null)
 
-  // Fetch active alerts on component mount and poll every 30 seconds
+  // New alerts arrive on the event stream; a reset means too much was
+  // missed while disconnected, so reload the list
+  const streamLive = useEventStream({
+    alert: (alert) => setAlerts(prev =>
+      prev.some(a => a.id === alert.id) ? prev : [alert, ...prev]
+    ),
+    reset: () => fetchAlerts(),
+  })
+
+  // Fetch active alerts on mount (and on every stream (re)connect); poll
+  // every 30 seconds only while the stream is down
   useEffect(() => {
     fetchAlerts()
+    if (streamLive) return
     const interval = setInterval(fetchAlerts, 30000)
     return () => clearInterval(interval)
-  }, [])
+  }, [streamLive])
 
   const fetchAlerts = async () => {
     setLoading(true)
@@ -40,9 +52,16 @@ export default function DisasterAlerts({ hidden = false }) {
 
   const handleGetEvacuationRoute = async (disasterId) => {
     try {
-      const res = await api.post('disaster-alert/get_evacuation_route/', {
-        disaster_id: disasterId
-      })
+      // the route is computed by a background job; 202 means ask again
+      let res
+      for (let attempt = 0; attempt < 20; attempt++) {
+        res = await api.post('disaster-alert/get_evacuation_route/', {
+          disaster_id: disasterId
+        })
+        if (res.status !== 202) break
+        await new Promise(resolve => setTimeout(resolve, 1500))
+      }
+      if (res.status === 202) throw new Error('Evacuation route is still being computed')
       setSelectedAlert({
         ...selectedAlert,
         evacuation_route: res.data.evacuation_route
@@ -1,4 +1,4 @@
-import { useCallback, useEffect, useState } from "react"
+import { useCallback, useEffect, useRef, useState } from "react"
 import {
   MapContainer,
   TileLayer,
@@ -31,6 +31,7 @@ import L from "leaflet"
 import "leaflet.heat"
 
 import api from "../../api/axios"
+import { useEventStream } from "../../hooks/useEventStream"
 import "../../styles/map-controls.css"
 // import DisasterLegend from "./DisasterLegend"
 
@@ -513,25 +514,43 @@ export default function MapView({ searchLocation, clearSearch }) {
   ])
   const visibleDisasters = disasters.filter(d => isInSearchRadius(d.latitude, d.longitude))
 
-  // polling side‑effects
+  // 📡 reload a layer when the event stream reports changes to it; bursts
+  // of events (bulk imports) are folded into one reload
+  const reloadTimers = useRef({})
+  const reloadSoon = (layer, reload) => {
+    clearTimeout(reloadTimers.current[layer])
+    reloadTimers.current[layer] = setTimeout(reload, 1000)
+  }
+  useEffect(() => () => Object.values(reloadTimers.current).forEach(clearTimeout), [])
+
+  const streamLive = useEventStream({
+    traffic: () => showTraffic && reloadSoon("traffic", fetchTrafficData),
+    disaster: () => showDisasters && reloadSoon("disasters", fetchDisasterData),
+    reset: () => {
+      if (showTraffic) reloadSoon("traffic", fetchTrafficData)
+      if (showDisasters) reloadSoon("disasters", fetchDisasterData)
+    },
+  })
+
+  // polling side‑effects; only a fallback while the event stream is down
   useEffect(() => {
     let interval
     if (showTraffic) {
       // initial load and repeat every 10 minutes
       fetchTrafficData()
-      interval = setInterval(() => fetchTrafficData(), 10 * 60 * 1000)
+      if (!streamLive) interval = setInterval(() => fetchTrafficData(), 10 * 60 * 1000)
     }
     return () => clearInterval(interval)
-  }, [showTraffic, fetchTrafficData])
+  }, [showTraffic, fetchTrafficData, streamLive])
 
   useEffect(() => {
     let interval
     if (showDisasters) {
       fetchDisasterData()
-      interval = setInterval(() => fetchDisasterData(), 10 * 60 * 1000)
+      if (!streamLive) interval = setInterval(() => fetchDisasterData(), 10 * 60 * 1000)
     }
     return () => clearInterval(interval)
-  }, [showDisasters, fetchDisasterData])
+  }, [showDisasters, fetchDisasterData, streamLive])
 
   // 🔥 Disaster icon logic with flame symbol and colored backdrop (consistent with reference screenshot)
   const getIcon = (type, severity) => {
@@ -0,0 +1,61 @@
+import { useEffect, useRef, useState } from 'react'
+import api from '../api/axios'
+
+const EVENTS = ['alert', 'disaster', 'traffic', 'reset']
+
+// one EventSource per tab, shared by every component using the hook
+let source = null
+const subscribers = new Set()
+
+function notify() {
+  subscribers.forEach(subscriber => subscriber.onState(source?.readyState === EventSource.OPEN))
+}
+
+function connect() {
+  const url = new URL('stream/', api.defaults.baseURL)
+  const token = localStorage.getItem('access_token')
+  if (token) url.searchParams.set('token', token)
+
+  // the browser reconnects on its own and sends Last-Event-ID, so the
+  // server replays whatever was missed; a 4xx/5xx closes it for good
+  source = new EventSource(url)
+  source.onopen = notify
+  source.onerror = notify
+  EVENTS.forEach(name => {
+    source.addEventListener(name, (event) => {
+      const data = JSON.parse(event.data)
+      subscribers.forEach(subscriber => subscriber.handlers.current[name]?.(data))
+    })
+  })
+}
+
+/**
+ * Subscribe to the server-sent event stream (/api/stream/)
+ * `handlers` maps event names (alert, disaster, traffic, reset) to callbacks
+ * taking the event data. Returns whether the stream is live; callers keep
+ * their polling for when it is not (no EventSource, or no ASGI server).
+ */
+export function useEventStream(handlers) {
+  const handlersRef = useRef(handlers)
+  handlersRef.current = handlers
+  const [live, setLive] = useState(false)
+
+  useEffect(() => {
+    if (typeof EventSource === 'undefined') return
+
+    const subscriber = { handlers: handlersRef, onState: setLive }
+    subscribers.add(subscriber)
+    if (!source || source.readyState === EventSource.CLOSED) connect()
+    setLive(source.readyState === EventSource.OPEN)
+
+    return () => {
+      subscribers.delete(subscriber)
+      if (subscribers.size === 0) {
+        source.close()
+        source = null
+      }
+    }
+  }, [])
+
+  return live
+}